@@ -0,0 +1,179 @@
+import json
+import os
+import re
+import threading
+import numpy as np
+
+# Fixed allergen vocabulary - bit positions must never be reordered, only appended
+ALLERGENS = [
+    'milk',
+    'eggs',
+    'fish',
+    'shellfish',
+    'tree_nuts',
+    'peanuts',
+    'wheat',
+    'gluten',
+    'soy',
+    'sesame',
+    'coconut',
+    'corn',
+    'mustard',
+    'sulfites',
+    'other'
+]
+
+DIETARY_FLAGS = ['vegan', 'vegetarian']
+
+BITS = {name: 1 << position for position, name in enumerate(ALLERGENS + DIETARY_FLAGS)}
+
+# Free-text spellings seen on DineOnCampus and the Harvard API
+ALLERGEN_ALIASES = {
+    'milk': 'milk', 'dairy': 'milk', 'lactose': 'milk',
+    'egg': 'eggs', 'eggs': 'eggs',
+    'fish': 'fish',
+    'shellfish': 'shellfish', 'crustacean shellfish': 'shellfish', 'crustacean': 'shellfish', 'mollusks': 'shellfish',
+    'tree nut': 'tree_nuts', 'tree nuts': 'tree_nuts', 'treenuts': 'tree_nuts',
+    'peanut': 'peanuts', 'peanuts': 'peanuts',
+    'wheat': 'wheat',
+    'gluten': 'gluten',
+    'soy': 'soy', 'soybean': 'soy', 'soybeans': 'soy',
+    'sesame': 'sesame', 'sesame seeds': 'sesame',
+    'coconut': 'coconut',
+    'corn': 'corn',
+    'mustard': 'mustard',
+    'sulfite': 'sulfites', 'sulfites': 'sulfites'
+}
+
+# Allergens that imply another one for filtering purposes
+IMPLIED_ALLERGENS = {
+    'wheat': ['gluten']
+}
+
+def normalize_allergen(name):
+    """Map a free-text allergen name onto the fixed vocabulary ('other' if unknown)"""
+    key = re.sub(r'[^a-z ]', '', name.lower()).strip()
+    key = re.sub(r'^contains ', '', key)
+    if not key:
+        return None
+    return ALLERGEN_ALIASES.get(key, 'other')
+
+def encode_names(names):
+    """Bitmask for a list of vocabulary names"""
+    mask = 0
+    for name in names:
+        if name not in BITS:
+            raise ValueError(f"Unknown allergen or dietary flag: {name}")
+        mask |= BITS[name]
+    return mask
+
+def encode_item(item):
+    """Bitmask of a cleaned item's allergens and dietary flags"""
+    nutrition = item.get('nutrition') or {}
+    allergens = item.get('allergens') or nutrition.get('allergens') or []
+
+    mask = 0
+    for allergen in allergens:
+        canonical = normalize_allergen(allergen)
+        if canonical is None:
+            continue
+        mask |= BITS[canonical]
+        for implied in IMPLIED_ALLERGENS.get(canonical, []):
+            mask |= BITS[implied]
+
+    for flag in DIETARY_FLAGS:
+        if item.get(flag, nutrition.get(flag)):
+            mask |= BITS[flag]
+
+    return mask
+
+class AllergenIndex:
+    """Per-item allergen bitmasks, kept in a numpy array so a filter is one vectorized pass"""
+
+    def __init__(self):
+        self.masks = []
+        self.items = []
+        # masks as uint32, grown by doubling; only the first len(self.masks) entries are used
+        self.mask_array = np.zeros(1024, dtype=np.uint32)
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.masks)
+
+    def append_masks(self, masks):
+        start, end = len(self.masks), len(self.masks) + len(masks)
+        if end > len(self.mask_array):
+            grown = np.zeros(max(end, 2 * len(self.mask_array)), dtype=np.uint32)
+            grown[:start] = self.mask_array[:start]
+            self.mask_array = grown
+        self.mask_array[start:end] = masks
+        self.masks.extend(masks)
+
+    def add_items(self, items, university_key=None, meal_type=None):
+        """Index one meal's cleaned items - called as each meal is cleaned"""
+        masks = [encode_item(item) for item in items]
+        with self.lock:
+            start = len(self.masks)
+            self.append_masks(masks)
+            self.items.extend({
+                'university': university_key or item.get('university'),
+                'meal_type': meal_type or item.get('meal_type'),
+                'station_name': item.get('station_name'),
+                'food_name': item.get('food_name')
+            } for item in items)
+            return list(range(start, len(self.masks)))
+
+    def filter(self, exclude=(), require=(), university=None, meal_type=None):
+        """Item ids free of every excluded allergen and carrying every required flag
+
+        e.g. filter(exclude=['peanuts', 'gluten'], require=['vegetarian'])
+        """
+        exclude_mask = np.uint32(encode_names(exclude))
+        require_mask = np.uint32(encode_names(require))
+        with self.lock:
+            masks = self.mask_array[:len(self.masks)]
+            selected = ((masks & exclude_mask) == 0) & ((masks & require_mask) == require_mask)
+            item_ids = np.flatnonzero(selected).tolist()
+
+        if university is not None or meal_type is not None:
+            item_ids = [
+                i for i in item_ids
+                if (university is None or self.items[i]['university'] == university)
+                and (meal_type is None or self.items[i]['meal_type'] == meal_type)
+            ]
+
+        return item_ids
+
+    @staticmethod
+    def matches(mask, exclude_mask=0, require_mask=0):
+        """Single-item check using precomputed masks from encode_names"""
+        return (mask & exclude_mask) == 0 and (mask & require_mask) == require_mask
+
+    def describe(self, item_id):
+        """Readable allergens and flags for one indexed item"""
+        mask = self.masks[item_id]
+        return dict(self.items[item_id], tags=[name for name, bit in BITS.items() if mask & bit])
+
+    def save(self, file_path='data/indexes/allergen_index.json'):
+        """Persist masks and item metadata"""
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with self.lock:
+            payload = {'vocabulary': list(BITS.keys()), 'masks': self.masks, 'items': self.items}
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False)
+        print(f"Saved allergen index with {len(self.masks)} items to {file_path}")
+        return file_path
+
+    @classmethod
+    def load(cls, file_path='data/indexes/allergen_index.json'):
+        """Load a saved index"""
+        with open(file_path, 'r', encoding='utf-8') as f:
+            payload = json.load(f)
+
+        if payload.get('vocabulary') != list(BITS.keys()):
+            raise ValueError(f"Allergen vocabulary changed since {file_path} was written, rebuild the index")
+
+        index = cls()
+        index.append_masks(payload['masks'])
+        index.items = payload['items']
+        return index
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Item Memory Benchmark
+Memory held by N cleaned items as plain dicts vs FoodItem records, plus JSON round-trip times
+
+Usage: python benchmarks/bench_item_memory.py [item_count]
+"""
+
+import gc
+import glob
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from food_item import dumps_items, loads_items
+
+def build_payload(item_count):
+    """JSON text of a synthetic backfill made by repeating every cleaned item"""
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'cleaned_data')
+    seed_items = []
+    for file_path in sorted(glob.glob(os.path.join(root, '*', 'food_items_*.json'))):
+        with open(file_path, 'r', encoding='utf-8') as f:
+            seed_items.extend(json.load(f))
+
+    if not seed_items:
+        raise SystemExit("No cleaned data found to build the payload from")
+
+    return json.dumps([seed_items[i % len(seed_items)] for i in range(item_count)], ensure_ascii=False).encode('utf-8')
+
+def measure(label, load, payload):
+    """Bytes still allocated once the parsed items are built, and the parse time"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    items = load(payload)
+    elapsed = time.perf_counter() - start
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:>10} {held / 1024 / 1024:>9.1f} MB {held / len(items):>9.0f} B/item {elapsed:>8.3f} s load")
+    return items
+
+def main():
+    item_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    payload = build_payload(item_count)
+    print(f"Payload: {item_count} items, {len(payload) / 1024 / 1024:.1f} MB of JSON")
+
+    dicts = measure('dicts', json.loads, payload)
+    start = time.perf_counter()
+    json.dumps(dicts, indent=2, ensure_ascii=False)
+    print(f"{'dicts':>10} {time.perf_counter() - start:>8.3f} s dump (json)")
+    del dicts
+
+    records = measure('FoodItem', loads_items, payload)
+    start = time.perf_counter()
+    dumps_items(records)
+    print(f"{'FoodItem':>10} {time.perf_counter() - start:>8.3f} s dump (orjson)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Meal Planner Benchmark
+Plan latency over a synthetic day of N items per meal period, built by resampling the cleaned
+data with jittered nutrition, for a few target profiles. Cold is the first plan for a profile and
+filter (candidate sets built, full search for every meal period); repeat is the same request
+again, answered from the planner's memoized meals.
+
+Usage: python benchmarks/bench_meal_planner.py [items_per_meal] [max_items]
+"""
+
+import glob
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from meal_planner import MealPlanner
+
+PROFILES = [
+    {'calories': 700, 'protein_g': 40, 'carbs_g': 80, 'total_fat_g': 25},
+    {'calories': 500, 'protein_g': 35},
+    {'calories': 900, 'protein_g': 50, 'carbs_g': 110, 'total_fat_g': 30, 'dietary_fiber_g': 10},
+    {'calories': 400, 'carbs_g': 45, 'sodium_mg': 600}
+]
+
+FILTERS = [((), ()), (('milk',), ()), (('peanuts', 'tree_nuts'), ('vegetarian',))]
+
+# The stored cleaned snapshots carry no allergen data, so the synthetic menu gets some at these rates
+ALLERGEN_RATES = {'milk': 0.35, 'wheat': 0.3, 'eggs': 0.15, 'soy': 0.15, 'tree_nuts': 0.04, 'peanuts': 0.03}
+VEGETARIAN_RATE = 0.4
+
+def build_day(items_per_meal):
+    """items_per_meal distinct dishes per meal, resampled from every cleaned file"""
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'cleaned_data')
+    seed_items = []
+    for file_path in sorted(glob.glob(os.path.join(root, '*', 'all_food_items_cleaned.json'))):
+        with open(file_path, 'r', encoding='utf-8') as f:
+            seed_items.extend(item for item in json.load(f) if (item.get('nutrition') or {}).get('calories'))
+
+    if not seed_items:
+        raise SystemExit("No cleaned data found to build the menu from")
+
+    rng = random.Random(7)
+    items = []
+    for meal_type in ('breakfast', 'lunch', 'dinner'):
+        for i in range(items_per_meal):
+            seed = rng.choice(seed_items)
+            factor = rng.uniform(0.7, 1.3)
+            nutrition = {key: round(value * factor, 1) if isinstance(value, (int, float)) else value
+                         for key, value in seed['nutrition'].items()}
+            allergens = seed.get('allergens') or [name for name, rate in ALLERGEN_RATES.items() if rng.random() < rate]
+            items.append(dict(seed, meal_type=meal_type, food_name=f"{seed['food_name']} #{i}", nutrition=nutrition,
+                              allergens=allergens, vegetarian=seed.get('vegetarian', rng.random() < VEGETARIAN_RATE)))
+    return items
+
+def main():
+    items_per_meal = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    max_items = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    items = build_day(items_per_meal)
+
+    start = time.perf_counter()
+    planner = MealPlanner(items, 'bench', '2025-01-01')
+    print(f"Menu: {items_per_meal} items x 3 meals, index built in {(time.perf_counter() - start) * 1000:.1f} ms")
+    print(f"{'profile':>8} {'filter':>26} {'cold ms':>8} {'repeat p50':>11} {'repeat max':>11}  best score")
+
+    cold_times = []
+    worst_repeat = 0.0
+    for profile_index, targets in enumerate(PROFILES):
+        for exclude, require in FILTERS:
+            start = time.perf_counter()
+            plans = planner.plan(targets, exclude=exclude, require=require, k=5, max_items=max_items)
+            cold = (time.perf_counter() - start) * 1000
+            cold_times.append(cold)
+
+            repeat = []
+            for _ in range(5):
+                start = time.perf_counter()
+                planner.plan(targets, exclude=exclude, require=require, k=5, max_items=max_items)
+                repeat.append((time.perf_counter() - start) * 1000)
+
+            worst_repeat = max(worst_repeat, max(repeat))
+            best = min((meals[0]['score'] for meals in plans.values() if meals), default=float('nan'))
+            label = ','.join(exclude + tuple(f'+{name}' for name in require)) or '-'
+            print(f"{profile_index:>8} {label:>26} {cold:>8.1f} {statistics.median(repeat):>11.1f} {max(repeat):>11.1f}  {best:.5f}")
+
+    print(f"Cold plan (3 meal periods, k=5, up to {max_items} items): p50 {statistics.median(cold_times):.1f} ms, "
+          f"max {max(cold_times):.1f} ms ({max(cold_times) / 3:.1f} ms per meal period)")
+    print(f"Repeated plan: max {worst_repeat:.2f} ms")
+
+if __name__ == "__main__":
+    main()
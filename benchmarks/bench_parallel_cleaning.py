@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Cleaning Scaling Benchmark
+Times FoodDataCleaner on a synthetic corpus with 1, 2, 4 and 8 worker processes
+
+Usage: python benchmarks/bench_parallel_cleaning.py [item_count] [chunk_size]
+"""
+
+import concurrent.futures
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from clean_data import FoodDataCleaner
+
+def build_corpus(item_count):
+    """Synthetic corpus made by repeating every scraped DineOnCampus item"""
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'scraped_data')
+    seed_items = []
+    for file_path in sorted(glob.glob(os.path.join(root, '*', 'food_items_*.json'))):
+        if os.sep + 'harvard' + os.sep in file_path:
+            continue
+        with open(file_path, 'r', encoding='utf-8') as f:
+            seed_items.extend(json.load(f))
+
+    if not seed_items:
+        raise SystemExit("No scraped data found to build the corpus from")
+
+    return [seed_items[i % len(seed_items)] for i in range(item_count)]
+
+def time_serial(corpus):
+    start = time.perf_counter()
+    FoodDataCleaner.clean_items(corpus, 'lunch')
+    return time.perf_counter() - start
+
+def time_pool(corpus, workers, chunk_size):
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        # Warm the pool so worker start-up isn't counted as cleaning time
+        list(pool.map(abs, range(workers * 4)))
+
+        start = time.perf_counter()
+        FoodDataCleaner.clean_items(corpus, 'lunch', executor=pool, chunk_size=chunk_size)
+        return time.perf_counter() - start
+
+def main():
+    item_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    chunk_size = int(sys.argv[2]) if len(sys.argv) > 2 else 256
+
+    corpus = build_corpus(item_count)
+    print(f"Corpus: {len(corpus)} items, chunk size {chunk_size}, {os.cpu_count()} CPUs")
+
+    serial = time_serial(corpus)
+    print(f"{'workers':>8} {'seconds':>9} {'items/s':>10} {'speedup':>8}")
+    print(f"{'serial':>8} {serial:>9.3f} {len(corpus) / serial:>10.0f} {1.0:>8.2f}")
+
+    for workers in (1, 2, 4, 8):
+        elapsed = time_pool(corpus, workers, chunk_size)
+        print(f"{workers:>8} {elapsed:>9.3f} {len(corpus) / elapsed:>10.0f} {serial / elapsed:>8.2f}")
+
+if __name__ == "__main__":
+    main()
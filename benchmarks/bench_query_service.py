@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Query Service Load Test
+Starts the menu query service in-process and hammers it from keep-alive client threads
+
+Usage: python benchmarks/bench_query_service.py [requests_per_client] [clients] [--url http://host:port]
+"""
+
+import http.client
+import os
+import random
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from query_service import MenuQueryService
+
+QUERIES = [
+    '/items?limit=20',
+    '/items?meal=lunch&max_calories=500',
+    '/items?min_protein_g=15&exclude=milk,eggs',
+    '/items?require=vegetarian&meal=dinner&limit=100',
+    '/items?exclude=peanuts,tree_nuts,gluten&max_sodium_mg=600',
+    '/items?university=umassd&offset=20&limit=20',
+    '/stats'
+]
+
+def client(host, port, count, latencies, errors):
+    connection = http.client.HTTPConnection(host, port)
+    etags = {}
+    for _ in range(count):
+        path = random.choice(QUERIES)
+        # Half the requests revalidate, as a caching client would
+        headers = {'If-None-Match': etags[path]} if path in etags and random.random() < 0.5 else {}
+        start = time.perf_counter()
+        connection.request('GET', path, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - start)
+        if response.status not in (200, 304):
+            errors.append(response.status)
+        if response.getheader('ETag'):
+            etags[path] = response.getheader('ETag')
+    connection.close()
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--url')]
+    per_client = int(args[0]) if args else 2000
+    clients = int(args[1]) if len(args) > 1 else 8
+    url = next((arg.split('=', 1)[1] for arg in sys.argv[1:] if arg.startswith('--url=')), None)
+
+    server = None
+    if url:
+        host, port = urlsplit(url).hostname, urlsplit(url).port
+    else:
+        root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+        service = MenuQueryService(os.path.join(root, 'data', 'cleaned_data'))
+        server = service.make_server('127.0.0.1', 0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address
+
+    latencies = []
+    errors = []
+    threads = [threading.Thread(target=client, args=(host, port, per_client, latencies, errors)) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1000
+
+    print(f"{len(latencies)} requests from {clients} clients in {elapsed:.2f}s: {len(latencies) / elapsed:.0f} req/s, {len(errors)} errors")
+    print(f"latency ms  p50 {percentile(50):.2f}  p95 {percentile(95):.2f}  p99 {percentile(99):.2f}  max {latencies[-1] * 1000:.2f}")
+
+    if server:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,14 @@
 import json
+import os
+
+# Relative to this script, so the check runs from any checkout
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'scraped_data')
 
 files = ['breakfast', 'lunch', 'dinner']
 total_items = 0
 
 for meal in files:
-    data = json.load(open(f'C:/My Projects/NutriGrove/NutriGrove-Scraper/data/scraped_data/northwestern/food_items_{meal}.json'))
+    data = json.load(open(os.path.join(DATA_DIR, 'northwestern', f'food_items_{meal}.json')))
     stations = set([item['station_name'] for item in data])
     print(f'{meal.title()}: {len(data)} items across {len(stations)} stations')
     total_items += len(data)
@@ -16,11 +20,10 @@ print("\n" + "="*50)
 print("COMPARISON WITH OTHER UNIVERSITIES:")
 print("="*50)
 
-import os
 universities = ['umassd', 'wpi', 'northeastern', 'babson', 'fitchburg', 'lasell']
 
 for uni in universities:
-    uni_path = f'C:/My Projects/NutriGrove/NutriGrove-Scraper/data/scraped_data/{uni}'
+    uni_path = os.path.join(DATA_DIR, uni)
     if os.path.exists(uni_path):
         uni_total = 0
         for meal in files:
@@ -33,7 +36,7 @@ for uni in universities:
         print(f'{uni}: No data found')
 
 # Check Harvard
-harvard_path = 'C:/My Projects/NutriGrove/NutriGrove-Scraper/data/scraped_data/harvard'
+harvard_path = os.path.join(DATA_DIR, 'harvard')
 if os.path.exists(harvard_path):
     harvard_total = 0
     for meal in files:
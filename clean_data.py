@@ -1,24 +1,60 @@
-import json
 import re
 import os
-from dotenv import load_dotenv
-from supabase import create_client
-from database import SupabaseUploader
+from datetime import datetime
+from food_item import FoodItem, Nutrition, load_items, save_items
+from run_manifest import RunManifest
+from university_config import UniversityConfig
 
 class FoodDataCleaner:
 
-    def __init__(self, university_key='umassd'):
-        """Initialize Supabase connection"""
-        load_dotenv()
-        url = os.getenv("SUPABASE_URL")
-        key = os.getenv("SUPABASE_ANON_KEY")
+    # Nutrient patterns with their units
+    NUTRIENT_PATTERNS = {
+        'protein_g': r'Protein \(g\)\s+([\d.]+|less than \d+ gram)',
+        'carbs_g': r'Total Carbohydrates \(g\)\s+([\d.]+|less than \d+ gram)', 
+        'sugar_g': r'Sugar \(g\)\s+([\d.]+|less than \d+ gram|\d+)',
+        'total_fat_g': r'Total Fat \(g\)\s+([\d.]+)',
+        'saturated_fat_g': r'Saturated Fat \(g\)\s+([\d.]+)',
+        'trans_fat_g': r'Trans Fat \(g\)\s+([\d.]+|-)',
+        'cholesterol_mg': r'Cholesterol \(mg\)\s+([\d.]+|less than \d+ milligrams)',
+        'dietary_fiber_g': r'Dietary Fiber \(g\)\s+([\d.]+|less than \d+ gram)',
+        'sodium_mg': r'Sodium \(mg\)\s+([\d.]+)',
+        'potassium_mg': r'Potassium \(mg\)\s+([\d.]+|-)',
+        'calcium_mg': r'Calcium \(mg\)\s+([\d.]+)',
+        'iron_mg': r'Iron \(mg\)\s+([\d.]+)',
+        'vitamin_d_iu': r'Vitamin D \(IU\)\s+([\d.]+\+?|0\+?|-)',
+        'vitamin_c_mg': r'Vitamin C \(mg\)\s+([\d.]+\+?|0\+?|-)',
+        'vitamin_a_re': r'Vitamin A \(RE\)\s+([\d.]+|-)'
+    }
 
-        if not url or not key:
-            raise ValueError("Missing Supabase credentials in .env file")
-
-        self.supabase = create_client(url, key)
+    def __init__(self, university_key='umassd', allergen_index=None, identity_index=None, dining_hall=None, date=None):
+        """Cleaning is database-free - uploads go through SupabaseUploader"""
         self.university_key = university_key
+        self.date = date or datetime.today().strftime('%Y-%m-%d')
+        self.dining_hall = dining_hall or (UniversityConfig.get_university_config(university_key) or {}).get('dining_hall')
+        self.scraped_dir = UniversityConfig.data_dir('scraped_data', university_key, dining_hall)
+        self.cleaned_dir = UniversityConfig.data_dir('cleaned_data', university_key, dining_hall)
+        self.allergen_index = allergen_index
+        self.identity_index = identity_index
+        self.run_manifest = RunManifest()
+        self.manifest_hall = None if UniversityConfig.is_primary_hall(university_key, dining_hall) else dining_hall
     
+    @staticmethod
+    def split_nutrient_value(value):
+        """Split a cleaned nutrient value into (number, is_less_than), e.g. "<1" -> (1.0, True)"""
+        if isinstance(value, bool) or value is None:
+            return None, False
+        if isinstance(value, (int, float)):
+            return float(value), False
+        if isinstance(value, str) and value.startswith('<'):
+            try:
+                return float(value[1:]), True
+            except ValueError:
+                return None, True
+        try:
+            return float(value), False
+        except (TypeError, ValueError):
+            return None, False
+
     @staticmethod
     def extract_nutrition_info(text):
         """Extract structured nutrition information from messy text"""
@@ -40,27 +76,8 @@ class FoodDataCleaner:
         if calories_match:
             nutrition['calories'] = int(calories_match.group(1))
         
-        # Define nutrient patterns with their units
-        nutrient_patterns = {
-            'protein_g': r'Protein \(g\)\s+([\d.]+|less than \d+ gram)',
-            'carbs_g': r'Total Carbohydrates \(g\)\s+([\d.]+|less than \d+ gram)', 
-            'sugar_g': r'Sugar \(g\)\s+([\d.]+|less than \d+ gram|\d+)',
-            'total_fat_g': r'Total Fat \(g\)\s+([\d.]+)',
-            'saturated_fat_g': r'Saturated Fat \(g\)\s+([\d.]+)',
-            'trans_fat_g': r'Trans Fat \(g\)\s+([\d.]+|-)',
-            'cholesterol_mg': r'Cholesterol \(mg\)\s+([\d.]+|less than \d+ milligrams)',
-            'dietary_fiber_g': r'Dietary Fiber \(g\)\s+([\d.]+|less than \d+ gram)',
-            'sodium_mg': r'Sodium \(mg\)\s+([\d.]+)',
-            'potassium_mg': r'Potassium \(mg\)\s+([\d.]+|-)',
-            'calcium_mg': r'Calcium \(mg\)\s+([\d.]+)',
-            'iron_mg': r'Iron \(mg\)\s+([\d.]+)',
-            'vitamin_d_iu': r'Vitamin D \(IU\)\s+([\d.]+\+?|0\+?|-)',
-            'vitamin_c_mg': r'Vitamin C \(mg\)\s+([\d.]+\+?|0\+?|-)',
-            'vitamin_a_re': r'Vitamin A \(RE\)\s+([\d.]+|-)'
-        }
-        
         # Extract each nutrient
-        for nutrient, pattern in nutrient_patterns.items():
+        for nutrient, pattern in FoodDataCleaner.NUTRIENT_PATTERNS.items():
             match = re.search(pattern, text, re.IGNORECASE)
             if match:
                 value = match.group(1).strip()
@@ -106,20 +123,53 @@ class FoodDataCleaner:
         
         return nutrition
     
-    def clean_food_data(self):
+    @staticmethod
+    def clean_item(item, meal_type):
+        """Clean one scraped item (no file or database access, safe to run in worker processes)"""
+        # Extract structured nutrition info
+        nutrition_info = FoodDataCleaner.extract_nutrition_info(item['nutritional_info'])
+
+        # Create cleaned item with meal type
+        return FoodItem(
+            meal_type=meal_type,
+            station_name=item['station_name'],
+            food_name=item['food_name'],
+            nutrition=Nutrition.from_dict(nutrition_info)
+        )
+
+    @staticmethod
+    def clean_items(data, meal_type, executor=None, chunk_size=256):
+        """Clean a list of scraped items, in chunks on a process pool when one is given"""
+        if executor is None:
+            return clean_batch(data, meal_type)
+
+        futures = [
+            executor.submit(clean_batch, data[start:start + chunk_size], meal_type)
+            for start in range(0, len(data), chunk_size)
+        ]
+
+        # Results are collected in submission order so the output matches the scraped order
+        cleaned_items = []
+        for future in futures:
+            cleaned_items.extend(future.result())
+        return cleaned_items
+
+    def clean_food_data(self, executor=None, chunk_size=256):
         """ Main function to clean all food data files (currently active method)"""
 
         # Create output directory for this university
-        os.makedirs(f'data/cleaned_data/{self.university_key}', exist_ok=True)
+        os.makedirs(self.cleaned_dir, exist_ok=True)
 
         # File paths with meal types (university-specific)
         file_configs = [
-            {"path": f"data/scraped_data/{self.university_key}/food_items_breakfast.json", "meal_type": "breakfast"},
-            {"path": f"data/scraped_data/{self.university_key}/food_items_lunch.json", "meal_type": "lunch"},
-            {"path": f"data/scraped_data/{self.university_key}/food_items_dinner.json", "meal_type": "dinner"}
+            {"path": f"{self.scraped_dir}/food_items_breakfast.json", "meal_type": "breakfast"},
+            {"path": f"{self.scraped_dir}/food_items_lunch.json", "meal_type": "lunch"},
+            {"path": f"{self.scraped_dir}/food_items_dinner.json", "meal_type": "dinner"}
         ]
         
         all_cleaned_data = []
+        cleaned_paths = []
+        failed = []
         
         for config in file_configs:
             file_path = config["path"]
@@ -127,32 +177,33 @@ class FoodDataCleaner:
             
             try:
                 # Load the JSON data
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+                data = load_items(file_path)
                 
                 cleaned_items = []
                 
-                for item in data:
-                    # Extract structured nutrition info
-                    nutrition_info = FoodDataCleaner.extract_nutrition_info(item['nutritional_info'])
-                    
-                    # Create cleaned item with meal type
-                    cleaned_item = {
-                        'meal_type': meal_type,
-                        'station_name': item['station_name'],
-                        'food_name': item['food_name'],
-                        'nutrition': nutrition_info
-                    }
+                # CPU-bound regex work - runs in worker processes when an executor is given
+                for cleaned_item in FoodDataCleaner.clean_items(data, meal_type, executor, chunk_size):
+                    if self.dining_hall:
+                        cleaned_item['dining_hall'] = self.dining_hall
+
+                    # Tag with the canonical food id shared across days and universities
+                    if self.identity_index is not None:
+                        self.identity_index.tag_item(cleaned_item)
                     
                     cleaned_items.append(cleaned_item)
                     all_cleaned_data.append(cleaned_item)
+
+                # Index allergens incrementally as each meal is cleaned
+                if self.allergen_index is not None:
+                    self.allergen_index.add_items(cleaned_items, self.university_key, meal_type)
                 
                 # Save individual cleaned file
                 filename = os.path.basename(file_path)
-                output_path = f'data/cleaned_data/{self.university_key}/{filename}'
+                output_path = f'{self.cleaned_dir}/{filename}'
                 
-                with open(output_path, 'w', encoding='utf-8') as f:
-                    json.dump(cleaned_items, f, indent=2, ensure_ascii=False)
+                save_items(output_path, cleaned_items)
+                self.run_manifest.record('cleaned', self.university_key, self.date, output_path, cleaned_items, meal_type, self.manifest_hall)
+                cleaned_paths.append(output_path)
                 
                 print(f"Cleaned and saved: {output_path}")
                 print(f"Processed {len(cleaned_items)} {meal_type} items")
@@ -161,21 +212,27 @@ class FoodDataCleaner:
                 print(f"File not found: {file_path}")
             except Exception as e:
                 print(f"Error processing {file_path}: {str(e)}")
+                failed.append(meal_type)
+
+        # A failed meal (or worker pool) would leave a partial combined file that uploads as a truncated day
+        if failed:
+            raise RuntimeError(f"Cleaning failed for {self.university_key} ({', '.join(failed)}); combined file not written")
+        if not cleaned_paths:
+            print(f"No scraped files to clean for {self.university_key}")
+            return []
         
         """Remember that I am not deleting all the data from the db cuz there's already a cron job at the db side (supabase) """
 
         # Save combined cleaned data for this university
-        combined_output_path = f'data/cleaned_data/{self.university_key}/all_food_items_cleaned.json'
-        with open(combined_output_path, 'w', encoding='utf-8') as f:
-            json.dump(all_cleaned_data, f, indent=2, ensure_ascii=False)
+        combined_output_path = f'{self.cleaned_dir}/all_food_items_cleaned.json'
+        save_items(combined_output_path, all_cleaned_data)
+        self.run_manifest.record('cleaned', self.university_key, self.date, combined_output_path, all_cleaned_data, dining_hall=self.manifest_hall)
 
         print(f"Cleaned data saved for {self.university_key}: {combined_output_path}")
 
-        # Return list of all cleaned files for this university
-        cleaned_files = [combined_output_path]
-        for config in file_configs:
-            output_path = f'data/cleaned_data/{self.university_key}/{os.path.basename(config["path"])}'
-            if os.path.exists(output_path):
-                cleaned_files.append(output_path)
+        # Only files written by this run - older per-meal files may belong to another date
+        return [combined_output_path] + cleaned_paths
 
-        return cleaned_files
\ No newline at end of file
+def clean_batch(items, meal_type):
+    """Clean a batch of scraped items - module-level so process pools can pickle it"""
+    return [FoodDataCleaner.clean_item(item, meal_type) for item in items]
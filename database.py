@@ -1,21 +1,127 @@
+import hashlib
 import json
 import os
+import threading
 from dotenv import load_dotenv
 from supabase import create_client, Client
+from supabase_mirror import get_shared_mirror
 
-class SupabaseUploader:
-    def __init__(self, database_name="cleaned_data"):
-        load_dotenv()
+# Deleting more than this share of a snapshot in one upload needs allow_mass_delete=True
+MAX_DELETE_FRACTION = 0.25
+
+# One client (and so one HTTP connection pool) shared by every upload task in the process
+_shared_client = None
+_client_lock = threading.Lock()
+_client_stats = {'clients_created': 0, 'client_reuses': 0, 'requests': 0}
+
+def get_shared_client():
+    """Lazily create the process-wide Supabase client (thread-safe)"""
+    global _shared_client
+
+    if _shared_client is None:
+        with _client_lock:
+            if _shared_client is None:
+                load_dotenv()
+
+                url = os.getenv("SUPABASE_URL")
+                key = os.getenv("SUPABASE_ANON_KEY")
+
+                if not url or not key:
+                    print("Error: Missing Supabase credentials in .env file")
+                    exit()
+
+                _shared_client = create_client(url, key)
+                _client_stats['clients_created'] += 1
+                return _shared_client
+
+    with _client_lock:
+        _client_stats['client_reuses'] += 1
+    return _shared_client
+
+def record_request(count=1):
+    with _client_lock:
+        _client_stats['requests'] += count
+
+def client_stats():
+    """Client creation/reuse and request counts, plus open pooled connections when available"""
+    with _client_lock:
+        stats = dict(_client_stats)
+
+    try:
+        # httpx keeps its pool on the transport; not public API, so best-effort only
+        pool = _shared_client.postgrest.session._transport._pool
+        stats['pooled_connections'] = len(pool.connections)
+    except Exception:
+        stats['pooled_connections'] = None
+
+    return stats
+
+def print_client_stats():
+    stats = client_stats()
+    print(f"Database clients created: {stats['clients_created']}, reused: {stats['client_reuses']}, "
+          f"requests: {stats['requests']}, pooled connections: {stats['pooled_connections']}")
+
+def content_hash(item):
+    """Stable hash of an item's full content"""
+    encoded = json.dumps(item, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+def row_keys(items):
+    """Identity key per item: canonical food id (or name) + station + meal, numbered when repeated"""
+    keys = []
+    seen = {}
+    for item in items:
+        base = '|'.join([
+            str(item.get('food_id') or item.get('food_name', '')),
+            str(item.get('station_name', '')),
+            str(item.get('meal_type', ''))
+        ])
+        seen[base] = seen.get(base, 0) + 1
+        keys.append(base if seen[base] == 1 else f"{base}#{seen[base]}")
+    return keys
+
+def row_key_meal(key):
+    """Meal type of a row key ('food|station|meal' or 'food|station|meal#2')"""
+    return key.rsplit('|', 1)[-1].split('#')[0]
+
+def diff_items(items, snapshot):
+    """Split items into inserts, updates and deletes against the last uploaded snapshot
 
-        url = os.getenv("SUPABASE_URL")
-        key = os.getenv("SUPABASE_ANON_KEY")
+    Deletes are limited to meals present in items: a file that lost a whole meal must not
+    take that meal's uploaded rows with it.
+    """
+    inserts = []
+    updates = []
+    current_keys = set()
 
-        if not url or not key:
-            print("Error: Missing Supabase credentials in .env file")
-            exit()
+    for key, item in zip(row_keys(items), items):
+        current_keys.add(key)
+        digest = content_hash(item)
+        previous = snapshot.get(key)
+        if previous is None:
+            inserts.append((key, digest, item))
+        elif previous['hash'] != digest:
+            updates.append((key, digest, item))
 
-        self.supabase = create_client(url, key)
+    meals = {str(item.get('meal_type', '')) for item in items}
+    deletes = [key for key in snapshot if key not in current_keys and row_key_meal(key) in meals]
+    return inserts, updates, deletes
+
+class SupabaseUploader:
+    def __init__(self, database_name="cleaned_data", snapshot_dir='data/upload_snapshots', mirror=None):
+        self.supabase = get_shared_client()
         self.database_name = database_name
+        self.snapshot_dir = snapshot_dir
+        self.mirror = mirror or get_shared_mirror()
+
+    def mirror_call(self, method, *args, **kwargs):
+        """Write through to the local mirror; a mirror failure never fails the upload"""
+        if self.mirror is None:
+            return
+        try:
+            getattr(self.mirror, method)(self.database_name, *args, **kwargs)
+        except Exception as e:
+            print(f"Could not update local mirror of {self.database_name}: {str(e)}")
     
     def upload_json_file(self, file_path):
         # Load your cleaned JSON data
@@ -26,9 +132,92 @@ class SupabaseUploader:
         if isinstance(data, list):
             for item in data:
                 result = self.supabase.table(self.database_name).insert({"data": item}).execute()
+                record_request()
+                self.mirror_call('write_rows', result.data)
                 print(f"Inserted record with ID: {result.data[0]['id']}")
 
         # If your data is a single object, insert it
         else:
             result = self.supabase.table(self.database_name).insert({"data": data}).execute()
-            print(f"Inserted record with ID: {result.data[0]['id']}")
\ No newline at end of file
+            record_request()
+            self.mirror_call('write_rows', result.data)
+            print(f"Inserted record with ID: {result.data[0]['id']}")
+
+    def snapshot_path(self, university_key, date, label):
+        return os.path.join(self.snapshot_dir, self.database_name, university_key, date, f'{label}.json')
+
+    def load_snapshot(self, university_key, date, label):
+        """Last uploaded {row key: {'id', 'hash'}} for this university/date/file, {} if never uploaded here"""
+        path = self.snapshot_path(university_key, date, label)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {}
+
+    def save_snapshot(self, university_key, date, label, snapshot):
+        path = self.snapshot_path(university_key, date, label)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+    def upload_items_incremental(self, items, university_key, date, label, allow_mass_delete=False):
+        """Send only inserts, updates and deletes since the last upload of the same data
+
+        An empty item list is refused, and deleting more than MAX_DELETE_FRACTION of the
+        snapshot is skipped unless allow_mass_delete=True - both usually mean a truncated file.
+        """
+        if not items:
+            raise ValueError(f"Refusing to upload an empty item list for {university_key} {date} {label}")
+
+        snapshot = self.load_snapshot(university_key, date, label)
+        inserts, updates, deletes = diff_items(items, snapshot)
+        print(f"Upload diff for {university_key} {date} {label}: "
+              f"{len(inserts)} inserts, {len(updates)} updates, {len(deletes)} deletes, "
+              f"{len(items) - len(inserts) - len(updates)} unchanged")
+
+        if deletes and len(deletes) > MAX_DELETE_FRACTION * len(snapshot) and not allow_mass_delete:
+            print(f"Skipping {len(deletes)} of {len(snapshot)} deletes for {university_key} {date} {label}: "
+                  f"more than {MAX_DELETE_FRACTION:.0%} of the uploaded rows (pass allow_mass_delete=True to apply)")
+            deletes = []
+
+        try:
+            if inserts:
+                # One batched request; PostgREST returns rows in insertion order
+                result = self.supabase.table(self.database_name).insert([{"data": item} for _, _, item in inserts]).execute()
+                record_request()
+                for (key, digest, _), row in zip(inserts, result.data):
+                    snapshot[key] = {'id': row['id'], 'hash': digest}
+                    row['row_key'], row['content_hash'] = key, digest
+                self.mirror_call('write_rows', result.data, university_key, date, label)
+
+            for key, digest, item in updates:
+                self.supabase.table(self.database_name).update({"data": item}).eq('id', snapshot[key]['id']).execute()
+                record_request()
+                snapshot[key] = {'id': snapshot[key]['id'], 'hash': digest}
+                self.mirror_call('write_rows', [{'id': snapshot[key]['id'], 'data': item, 'row_key': key, 'content_hash': digest}],
+                                 university_key, date, label)
+
+            if deletes:
+                self.supabase.table(self.database_name).delete().in_('id', [snapshot[key]['id'] for key in deletes]).execute()
+                record_request()
+                self.mirror_call('delete_rows', [snapshot[key]['id'] for key in deletes])
+                for key in deletes:
+                    del snapshot[key]
+        finally:
+            # Persist whatever succeeded so a retry only sends the remainder
+            self.save_snapshot(university_key, date, label, snapshot)
+
+        return {'inserted': len(inserts), 'updated': len(updates), 'deleted': len(deletes)}
+
+    def upload_json_file_incremental(self, file_path, university_key, date, dining_hall=None, allow_mass_delete=False):
+        """Diff-based upload of a cleaned JSON file, keyed by its file name (and hall, if not the primary one)"""
+        with open(file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        items = data if isinstance(data, list) else [data]
+        label = os.path.splitext(os.path.basename(file_path))[0]
+        if dining_hall:
+            label = f'{dining_hall}/{label}'
+        return self.upload_items_incremental(items, university_key, date, label, allow_mass_delete)
\ No newline at end of file
@@ -0,0 +1,225 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import unicodedata
+import numpy as np
+
+def split_food_name(food_name):
+    """Split DineOnCampus "Name\\nDescription" strings into (name, description)"""
+    if not food_name:
+        return '', ''
+    parts = food_name.strip().split('\n', 1)
+    name = parts[0].strip()
+    description = re.sub(r'\s+', ' ', parts[1]).strip() if len(parts) > 1 else ''
+    return name, description
+
+def normalize_name(name):
+    """Lowercase, strip accents/punctuation/parentheticals and collapse whitespace"""
+    text = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii').lower()
+    text = re.sub(r'\([^)]*\)', ' ', text)
+    text = text.replace('&', ' and ')
+    text = re.sub(r'[^a-z0-9 ]', ' ', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+def stable_hash(text, digest_size=8):
+    """Process-independent hash (unlike the builtin hash(), which is salted per run)"""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=digest_size).hexdigest()
+
+def singular(token):
+    """Crude singular form so 'eggs' and 'egg' compare equal"""
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+def singular_key(normalized):
+    """Normalized name with every word singular - what signatures are computed over"""
+    return ' '.join(singular(token) for token in normalized.split())
+
+def tokens_match(a, b):
+    """Same word, up to plural or a one-letter typo in a word of five letters or more"""
+    a, b = singular(a), singular(b)
+    if a == b:
+        return True
+    if min(len(a), len(b)) < 5 or abs(len(a) - len(b)) > 1:
+        return False
+    # One insertion, deletion or substitution
+    i = 0
+    while i < min(len(a), len(b)) and a[i] == b[i]:
+        i += 1
+    return a[i + 1:] == b[i + 1:] or a[i:] == b[i + 1:] or a[i + 1:] == b[i:]
+
+def same_words(normalized_a, normalized_b):
+    """Token containment both ways: every word of each name has a match in the other
+
+    Guards the MinHash merge, which on character n-grams alone folds 'roasted red pepper hummus'
+    into 'roasted red pepper'.
+    """
+    words_a, words_b = normalized_a.split(), normalized_b.split()
+    return (len(words_a) == len(words_b)
+            and all(any(tokens_match(a, b) for b in words_b) for a in words_a)
+            and all(any(tokens_match(b, a) for a in words_a) for b in words_b))
+
+def canonical_food_id(name):
+    """Exact canonical id from the normalized name"""
+    return f"f_{stable_hash(normalize_name(name))}"
+
+class MinHasher:
+    """MinHash signatures over character n-grams"""
+
+    PRIME = (1 << 31) - 1
+
+    def __init__(self, num_perm=64, ngram=3, seed=7):
+        self.num_perm = num_perm
+        self.ngram = ngram
+        # Fixed seed keeps signatures comparable between runs and processes
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, self.PRIME, size=num_perm).astype(np.uint64)
+        self.b = rng.randint(0, self.PRIME, size=num_perm).astype(np.uint64)
+
+    def shingles(self, normalized):
+        padded = f" {normalized} "
+        if len(padded) <= self.ngram:
+            return {padded}
+        return {padded[i:i + self.ngram] for i in range(len(padded) - self.ngram + 1)}
+
+    def signature(self, normalized):
+        hashes = np.array(
+            [int(stable_hash(s, 4), 16) % self.PRIME for s in self.shingles(normalized)],
+            dtype=np.uint64
+        )
+        # (a * h + b) mod p for every permutation/shingle pair, then min per permutation
+        permuted = (np.outer(self.a, hashes) + self.b[:, None]) % self.PRIME
+        return permuted.min(axis=1)
+
+    @staticmethod
+    def similarity(sig_a, sig_b):
+        """Estimated Jaccard similarity of two signatures"""
+        return float(np.mean(sig_a == sig_b))
+
+class FoodIdentityIndex:
+    """Assigns stable canonical food ids and merges near-duplicate names with MinHash LSH
+
+    Signatures are computed over singular words, and a merge needs both a MinHash similarity of
+    at least threshold and the same words (up to plurals and one-letter typos). Which spelling a merged group is named after depends on which
+    was seen first, so the index is persisted (CI caches it like the task costs).
+    """
+
+    def __init__(self, threshold=0.9, num_perm=64, bands=16):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm=num_perm)
+
+        self.aliases = {}       # normalized name -> canonical id
+        self.names = {}         # canonical id -> display name
+        self.normalized = {}    # canonical id -> normalized display name
+        self.signatures = {}    # canonical id -> MinHash signature
+        self.buckets = {}       # (band, band hash) -> [canonical ids]
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.names)
+
+    def band_keys(self, signature):
+        for band in range(self.bands):
+            chunk = signature[band * self.rows:(band + 1) * self.rows]
+            yield band, chunk.tobytes()
+
+    def candidates(self, signature):
+        """Ids sharing at least one LSH band - avoids comparing against every name"""
+        found = set()
+        for key in self.band_keys(signature):
+            found.update(self.buckets.get(key, ()))
+        return found
+
+    def register(self, food_id, name, signature):
+        self.names[food_id] = name
+        self.normalized[food_id] = normalize_name(name)
+        self.signatures[food_id] = signature
+        for key in self.band_keys(signature):
+            self.buckets.setdefault(key, []).append(food_id)
+
+    def resolve(self, food_name):
+        """Return (food_id, name, description) for a raw food_name"""
+        name, description = split_food_name(food_name)
+        normalized = normalize_name(name)
+
+        with self.lock:
+            food_id = self.aliases.get(normalized)
+            if food_id is not None:
+                return food_id, name, description
+
+            signature = self.hasher.signature(singular_key(normalized))
+            best_id = None
+            best_score = self.threshold
+            for candidate_id in sorted(self.candidates(signature)):
+                score = MinHasher.similarity(signature, self.signatures[candidate_id])
+                if score >= best_score and same_words(normalized, self.normalized[candidate_id]):
+                    best_id, best_score = candidate_id, score
+
+            if best_id is None:
+                best_id = canonical_food_id(name)
+                if best_id not in self.names:
+                    self.register(best_id, name, signature)
+
+            self.aliases[normalized] = best_id
+            return best_id, name, description
+
+    def tag_item(self, item):
+        """Add food_id, canonical_name and description to a cleaned item in place"""
+        food_id, name, description = self.resolve(item.get('food_name', ''))
+        item['food_id'] = food_id
+        item['canonical_name'] = self.names.get(food_id, name)
+        item['description'] = description
+        return item
+
+    def tag_items(self, items):
+        for item in items:
+            self.tag_item(item)
+        return items
+
+    def save(self, file_path='data/indexes/food_identity.json'):
+        """Persist aliases and signatures so ids stay stable across runs"""
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with self.lock:
+            payload = {
+                'threshold': self.threshold,
+                'bands': self.bands,
+                'num_perm': self.hasher.num_perm,
+                'aliases': self.aliases,
+                'names': self.names,
+                'signatures': {food_id: sig.tolist() for food_id, sig in self.signatures.items()}
+            }
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False)
+        print(f"Saved food identity index with {len(self.names)} foods to {file_path}")
+        return file_path
+
+    @classmethod
+    def load(cls, file_path='data/indexes/food_identity.json', threshold=0.9):
+        """Load a saved index, or start an empty one if the file doesn't exist yet
+
+        Aliases the current merge rule would not make (e.g. saved under a looser threshold)
+        are dropped, so those names resolve again.
+        """
+        if not os.path.exists(file_path):
+            return cls(threshold=threshold)
+
+        with open(file_path, 'r', encoding='utf-8') as f:
+            payload = json.load(f)
+
+        index = cls(threshold=threshold, num_perm=payload['num_perm'], bands=payload['bands'])
+        for food_id, name in payload['names'].items():
+            # Recomputed rather than read back, so older files get singular-word signatures too
+            index.register(food_id, name, index.hasher.signature(singular_key(normalize_name(name))))
+        index.aliases = {
+            normalized: food_id for normalized, food_id in payload['aliases'].items()
+            if food_id in index.names and (normalized == index.normalized[food_id]
+                                           or same_words(normalized, index.normalized[food_id]))
+        }
+        return index
@@ -0,0 +1,153 @@
+import sys
+import orjson
+
+# Nutrient keys in the order FoodDataCleaner.NUTRIENT_PATTERNS writes them
+NUTRIENT_KEYS = (
+    'protein_g', 'carbs_g', 'sugar_g', 'total_fat_g', 'saturated_fat_g', 'trans_fat_g',
+    'cholesterol_mg', 'dietary_fiber_g', 'sodium_mg', 'potassium_mg', 'calcium_mg',
+    'iron_mg', 'vitamin_d_iu', 'vitamin_c_mg', 'vitamin_a_re'
+)
+
+class SlotRecord:
+    """Dict-like access over __slots__ so records drop into code written for plain dicts
+
+    Slots left as None are omitted from the dict view, matching the cleaner, which only
+    writes the keys it found. Keys outside the slots go to a small `extras` dict.
+    """
+
+    __slots__ = ('extras',)
+    FIELDS = ()
+
+    def __init__(self, **fields):
+        for name in self.FIELDS:
+            setattr(self, name, None)
+        self.extras = None
+        for key, value in fields.items():
+            self[key] = value
+
+    def __getitem__(self, key):
+        if key in self.FIELDS:
+            value = getattr(self, key)
+            if value is not None:
+                return value
+        elif self.extras and key in self.extras:
+            return self.extras[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in self.FIELDS:
+            setattr(self, key, value)
+        else:
+            if self.extras is None:
+                self.extras = {}
+            self.extras[key] = value
+
+    def __contains__(self, key):
+        if key in self.FIELDS:
+            return getattr(self, key) is not None
+        return bool(self.extras) and key in self.extras
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        keys = [name for name in self.FIELDS if getattr(self, name) is not None]
+        if self.extras:
+            keys.extend(self.extras)
+        return keys
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def to_dict(self):
+        """The plain-dict JSON shape this record was built from"""
+        return {key: value.to_dict() if isinstance(value, SlotRecord) else value for key, value in self.items()}
+
+    def __eq__(self, other):
+        if isinstance(other, (SlotRecord, dict)):
+            return self.to_dict() == (other.to_dict() if isinstance(other, SlotRecord) else other)
+        return NotImplemented
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+    # __slots__ classes need explicit pickling support for process pools
+    def __getstate__(self):
+        return [getattr(self, name) for name in self.FIELDS] + [self.extras]
+
+    def __setstate__(self, state):
+        for name, value in zip(self.FIELDS, state):
+            setattr(self, name, value)
+        self.extras = state[-1]
+
+class Nutrition(SlotRecord):
+    """Cleaned nutrition facts: serving size, calories, one slot per nutrient, allergens and ingredients"""
+
+    FIELDS = ('serving_size', 'calories') + NUTRIENT_KEYS + ('allergens', 'ingredients')
+    __slots__ = FIELDS
+
+    # The same recipe text comes back every day a dish is served
+    INTERNED = ('serving_size', 'ingredients')
+
+    def __setitem__(self, key, value):
+        if key in self.INTERNED and isinstance(value, str):
+            value = sys.intern(value)
+        SlotRecord.__setitem__(self, key, value)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+class FoodItem(SlotRecord):
+    """One menu item, scraped (nutritional_info text) or cleaned (nutrition facts)"""
+
+    FIELDS = ('meal_type', 'station_name', 'food_name', 'nutritional_info', 'nutrition', 'dining_hall')
+    __slots__ = FIELDS
+
+    # Repeated labels are interned so a backfill holds one copy of each
+    INTERNED = ('meal_type', 'station_name', 'food_name', 'dining_hall')
+
+    def __setitem__(self, key, value):
+        if key in self.INTERNED and isinstance(value, str):
+            value = sys.intern(value)
+        elif key == 'nutrition' and isinstance(value, dict):
+            value = Nutrition.from_dict(value)
+        SlotRecord.__setitem__(self, key, value)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+def default(value):
+    """orjson hook for records nested anywhere in a payload"""
+    if isinstance(value, SlotRecord):
+        return value.to_dict()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+def dumps_items(items, indent=True):
+    """Serialize records (or plain dicts) to the existing JSON file format"""
+    option = orjson.OPT_INDENT_2 if indent else 0
+    return orjson.dumps([item.to_dict() if isinstance(item, SlotRecord) else item for item in items],
+                        default=default, option=option)
+
+def loads_items(data):
+    """Parse a JSON items file into FoodItem records"""
+    return [FoodItem.from_dict(item) for item in orjson.loads(data)]
+
+def save_items(file_path, items):
+    with open(file_path, 'wb') as f:
+        f.write(dumps_items(items))
+    return file_path
+
+def load_items(file_path):
+    with open(file_path, 'rb') as f:
+        return loads_items(f.read())
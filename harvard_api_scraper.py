@@ -1,36 +1,112 @@
 import requests
-import json
 import os
+import re
 from datetime import datetime
+from requests.adapters import HTTPAdapter
 from database import SupabaseUploader
+from food_item import FoodItem, save_items
+from orchestrator import classify_error, report_congestion
+from run_manifest import RunManifest
+from university_config import UniversityConfig
+
+def location_slug(name):
+    """Hall slug from an API location name, e.g. 'Annenberg Hall' -> 'annenberg-hall'"""
+    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-')
 
 class HarvardAPIScraper:
-    def __init__(self, date=None):
+    # Main undergraduate dining hall, used when the location list can't be fetched
+    ANNENBERG = {'id': 30, 'name': 'Annenberg Hall', 'slug': 'annenberg-hall'}
+
+    # Cleaned nutrient key -> (recipe JSON field, unit suffix to strip)
+    NUTRIENT_FIELDS = {
+        'protein_g': ('protein', 'g'),
+        'carbs_g': ('total_carbohydrates', 'g'),
+        'sugar_g': ('sugars', 'g'),
+        'total_fat_g': ('total_fat', 'g'),
+        'saturated_fat_g': ('saturated_fat', 'g'),
+        'trans_fat_g': ('trans_fat', 'g'),
+        'cholesterol_mg': ('cholesterol', 'mg'),
+        'dietary_fiber_g': ('dietary_fiber', 'g'),
+        'sodium_mg': ('sodium', 'mg')
+    }
+
+    # Grams per unit, for fields reported in a different mass unit than the schema's
+    MASS_UNITS = {'g': 1.0, 'mg': 1e-3, 'mcg': 1e-6, 'ug': 1e-6}
+
+    def __init__(self, date=None, identity_index=None, archive=None):
         self.base_url = "https://api.cs50.io/dining"
-        self.annenberg_id = 30  # Main undergraduate dining hall
+        self.annenberg_id = self.ANNENBERG['id']
         self.date = date or datetime.today().strftime('%Y-%m-%d')
+        self.identity_index = identity_index
+        self.archive = archive
         self.meal_types = {
             0: 'breakfast',
             1: 'lunch',
             2: 'dinner'
         }
 
+        # One pooled HTTP session for every location, meal and recipe request
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+        # Recipes repeat across houses, so each is fetched once per run
+        self.recipe_cache = {}
+
         # Create directories
         os.makedirs('data/scraped_data/harvard', exist_ok=True)
         os.makedirs('data/cleaned_data/harvard', exist_ok=True)
 
-    def get_menu_for_meal(self, meal_id):
-        """Get menu data for specific meal at Annenberg Hall"""
+    def fetch(self, url):
+        """GET through the pooled session; timeouts, 429 and 5xx are reported as congestion"""
         try:
-            # Get menu items for this meal and location
-            menu_url = f"{self.base_url}/menus?location={self.annenberg_id}&meal={meal_id}&date={self.date}"
-            response = requests.get(menu_url, timeout=30)
+            response = self.session.get(url, timeout=30)
             response.raise_for_status()
+            return response
+        except Exception as e:
+            report_congestion(classify_error(e), url)
+            raise
+
+    def get_locations(self):
+        """Dining locations from the API, filtered by the configured dining_halls"""
+        wanted = UniversityConfig.get_dining_halls('harvard')
+
+        try:
+            response = self.fetch(f"{self.base_url}/locations")
+            locations = [
+                {'id': location['id'], 'name': location['name'], 'slug': location_slug(location['name'])}
+                for location in response.json()
+                if location.get('id') is not None and location.get('name')
+            ]
+        except Exception as e:
+            print(f"Error fetching Harvard locations, using Annenberg only: {str(e)}")
+            return [self.ANNENBERG]
+
+        if wanted != 'all':
+            locations = [location for location in locations if location['slug'] in wanted]
+
+        return locations or [self.ANNENBERG]
+
+    def get_recipe(self, recipe_id):
+        """Recipe JSON (and its raw text for archiving), fetched once per run"""
+        if recipe_id not in self.recipe_cache:
+            recipe_url = f"{self.base_url}/recipes/{recipe_id}"
+            recipe_response = self.fetch(recipe_url)
+            self.recipe_cache[recipe_id] = (recipe_response.json(), recipe_response.text)
+        return self.recipe_cache[recipe_id]
+
+    def get_menu_for_meal(self, meal_id, location=None):
+        """Get menu data for specific meal at one location (Annenberg Hall by default)"""
+        location = location or self.ANNENBERG
+        try:
+            # Get menu items for this meal and location
+            menu_url = f"{self.base_url}/menus?location={location['id']}&meal={meal_id}&date={self.date}"
+            response = self.fetch(menu_url)
 
             menu_items = response.json()
             meal_name = self.meal_types[meal_id]
+            archived_recipes = {}
 
-            print(f"Found {len(menu_items)} menu items for {meal_name}")
+            print(f"Found {len(menu_items)} menu items for {meal_name} at {location['name']}")
 
             if not menu_items:
                 print(f"No menu items found for {meal_name}")
@@ -44,26 +120,11 @@ class HarvardAPIScraper:
 
             for recipe_id in recipe_ids:
                 try:
-                    recipe_url = f"{self.base_url}/recipes/{recipe_id}"
-                    recipe_response = requests.get(recipe_url, timeout=30)
-                    recipe_response.raise_for_status()
-
-                    recipe_data = recipe_response.json()
-
-                    # Convert Harvard API format to our standard format
-                    formatted_item = {
-                        'station_name': 'Annenberg Hall',
-                        'food_name': recipe_data.get('name', 'Unknown Item'),
-                        'nutritional_info': self.format_nutrition_info(recipe_data),
-                        'ingredients': recipe_data.get('ingredients', ''),
-                        'allergens': recipe_data.get('allergens', []),
-                        'vegan': recipe_data.get('vegan', False),
-                        'vegetarian': recipe_data.get('vegetarian', False),
-                        'recipe_id': recipe_id,
-                        'meal_type': meal_name,
-                        'date': self.date,
-                        'university': 'harvard'
-                    }
+                    recipe_data, recipe_text = self.get_recipe(recipe_id)
+                    if self.archive:
+                        archived_recipes[str(recipe_id)] = self.archive.put(recipe_text)
+
+                    formatted_item = self.build_item(recipe_data, recipe_id, meal_name, location)
 
                     detailed_items.append(formatted_item)
                     print(f"  -> Processed: {formatted_item['food_name']}")
@@ -72,86 +133,113 @@ class HarvardAPIScraper:
                     print(f"Error fetching recipe {recipe_id}: {str(e)}")
                     continue
 
+            if self.archive:
+                self.archive.write_manifest('harvard', self.date, meal_name, {
+                    'source': 'harvard_api',
+                    'url': menu_url,
+                    'location': location,
+                    'menu': self.archive.put(response.text),
+                    'recipes': archived_recipes
+                }, dining_hall=None if UniversityConfig.is_primary_hall('harvard', location['slug']) else location['slug'])
+
             return detailed_items
 
         except Exception as e:
             print(f"Error fetching menu for {self.meal_types.get(meal_id, 'unknown meal')}: {str(e)}")
             return []
 
-    def format_nutrition_info(self, recipe_data):
-        """Format nutrition information from Harvard API to readable text"""
-        nutrition_parts = []
-
-        # Add serving size
-        serving_size = recipe_data.get('serving_size', '')
+    def build_item(self, recipe_data, recipe_id, meal_name, location=None):
+        """Convert Harvard API recipe format to the same cleaned schema FoodDataCleaner produces"""
+        location = location or self.ANNENBERG
+        formatted_item = FoodItem(
+            meal_type=meal_name,
+            station_name=location['name'],
+            food_name=recipe_data.get('name', 'Unknown Item'),
+            nutrition=self.build_nutrition(recipe_data),
+            dining_hall=location['slug'],
+            vegan=recipe_data.get('vegan', False),
+            vegetarian=recipe_data.get('vegetarian', False),
+            recipe_id=recipe_id,
+            date=self.date,
+            university='harvard'
+        )
+
+        if self.identity_index is not None:
+            self.identity_index.tag_item(formatted_item)
+
+        return formatted_item
+
+    @staticmethod
+    def nutrient_value(value, unit):
+        """Typed nutrient value from an API field, e.g. {'amount': '5g'} -> 5.0, '1,200mg' as g -> 1.2, 'less than 500mg' -> '<0.5'"""
+        if isinstance(value, dict):
+            value = value.get('amount')
+        if value is None or isinstance(value, bool):
+            return None
+        if isinstance(value, (int, float)):
+            return float(value)
+
+        value = str(value).strip().lower()
+        if value == '-':
+            return 0
+        if not value:
+            return None
+        # Thousands separators: '1,200mg' is 1200mg, not 1
+        value = re.sub(r'(?<=\d),(?=\d{3}(?!\d))', '', value)
+
+        for prefix in ('less than', '<'):
+            if value.startswith(prefix):
+                # The bound is converted like any other amount, so '<500mg' as g is '<0.5'
+                bound = HarvardAPIScraper.nutrient_value(value[len(prefix):], unit)
+                return f"<{bound:g}" if isinstance(bound, float) else "<1"
+
+        # Only a unit right after the number counts; anything unparseable is kept as text
+        match = re.match(r'\+?\s*(\d*\.?\d+)\s*\+?\s*([a-z]*)', value)
+        if not match:
+            return value
+        amount, found = float(match.group(1)), match.group(2)
+        if not found or found == unit or (found == 'cal' and unit == 'kcal'):
+            return amount
+        mass_units = HarvardAPIScraper.MASS_UNITS
+        if found in mass_units and unit in mass_units:
+            return round(amount * mass_units[found] / mass_units[unit], 6)
+        return value
+
+    @staticmethod
+    def build_nutrition(recipe_data):
+        """Map recipe JSON straight into the cleaned nutrition dict - no text round trip"""
+        nutrition = {}
+
+        serving_size = recipe_data.get('serving_size')
         if serving_size:
-            nutrition_parts.append(f"Serving size: {serving_size}")
-
-        # Add calories
-        calories = recipe_data.get('calories')
-        if calories:
-            nutrition_parts.append(f"Calories {calories}")
-
-        # Add macronutrients
-        protein = recipe_data.get('protein', {})
-        if isinstance(protein, dict) and protein.get('amount'):
-            amount = str(protein['amount']).replace('g', '') if isinstance(protein['amount'], str) else protein['amount']
-            nutrition_parts.append(f"Protein (g) {amount}")
-
-        total_carbs = recipe_data.get('total_carbohydrates', {})
-        if isinstance(total_carbs, dict) and total_carbs.get('amount'):
-            amount = str(total_carbs['amount']).replace('g', '') if isinstance(total_carbs['amount'], str) else total_carbs['amount']
-            nutrition_parts.append(f"Total Carbohydrates (g) {amount}")
-
-        sugars = recipe_data.get('sugars')
-        if sugars:
-            amount = str(sugars).replace('g', '') if isinstance(sugars, str) and 'g' in str(sugars) else sugars
-            nutrition_parts.append(f"Sugar (g) {amount}")
-
-        total_fat = recipe_data.get('total_fat', {})
-        if isinstance(total_fat, dict) and total_fat.get('amount'):
-            amount = str(total_fat['amount']).replace('g', '') if isinstance(total_fat['amount'], str) else total_fat['amount']
-            nutrition_parts.append(f"Total Fat (g) {amount}")
-
-        sat_fat = recipe_data.get('saturated_fat', {})
-        if isinstance(sat_fat, dict) and sat_fat.get('amount'):
-            amount = str(sat_fat['amount']).replace('g', '') if isinstance(sat_fat['amount'], str) else sat_fat['amount']
-            nutrition_parts.append(f"Saturated Fat (g) {amount}")
-
-        trans_fat = recipe_data.get('trans_fat')
-        if trans_fat:
-            amount = str(trans_fat).replace('g', '') if isinstance(trans_fat, str) and 'g' in str(trans_fat) else trans_fat
-            nutrition_parts.append(f"Trans Fat (g) {amount}")
-
-        cholesterol = recipe_data.get('cholesterol', {})
-        if isinstance(cholesterol, dict) and cholesterol.get('amount'):
-            amount = str(cholesterol['amount']).replace('mg', '') if isinstance(cholesterol['amount'], str) else cholesterol['amount']
-            nutrition_parts.append(f"Cholesterol (mg) {amount}")
-
-        sodium = recipe_data.get('sodium', {})
-        if isinstance(sodium, dict) and sodium.get('amount'):
-            amount = str(sodium['amount']).replace('mg', '') if isinstance(sodium['amount'], str) else sodium['amount']
-            nutrition_parts.append(f"Sodium (mg) {amount}")
-
-        fiber = recipe_data.get('dietary_fiber', {})
-        if isinstance(fiber, dict) and fiber.get('amount'):
-            amount = str(fiber['amount']).replace('g', '') if isinstance(fiber['amount'], str) else fiber['amount']
-            nutrition_parts.append(f"Fiber (g) {amount}")
-
-        # Add ingredients if available
-        ingredients = recipe_data.get('ingredients', '')
-        if ingredients:
-            nutrition_parts.append(f"Ingredients: {ingredients}")
-
-        return " ".join(nutrition_parts) if nutrition_parts else "Nutrition info not available"
-
-    def save_to_file(self, food_data_list, meal_type):
-        """Save Harvard API data to local JSON file"""
+            nutrition['serving_size'] = str(serving_size).strip()
+
+        calories = HarvardAPIScraper.nutrient_value(recipe_data.get('calories'), 'kcal')
+        if isinstance(calories, float):
+            nutrition['calories'] = int(calories)
+
+        for nutrient, (field, unit) in HarvardAPIScraper.NUTRIENT_FIELDS.items():
+            value = HarvardAPIScraper.nutrient_value(recipe_data.get(field), unit)
+            if value is not None:
+                nutrition[nutrient] = value
+
+        allergens = recipe_data.get('allergens') or []
+        if isinstance(allergens, str):
+            allergens = allergens.split(',')
+        nutrition['allergens'] = [allergen.strip() for allergen in allergens if allergen and allergen.strip()]
+        nutrition['ingredients'] = recipe_data.get('ingredients') or ""
+
+        return nutrition
+
+    def save_to_file(self, food_data_list, meal_type, dining_hall=None):
+        """Save Harvard API data to local JSON file (partitioned by hall for non-primary halls)"""
         try:
-            file_path = f'data/scraped_data/harvard/food_items_{meal_type}.json'
+            data_dir = UniversityConfig.data_dir('scraped_data', 'harvard', dining_hall)
+            os.makedirs(data_dir, exist_ok=True)
+            file_path = f'{data_dir}/food_items_{meal_type}.json'
 
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(food_data_list, f, indent=2, ensure_ascii=False)
+            save_items(file_path, food_data_list)
+            RunManifest().record('scraped', 'harvard', self.date, file_path, food_data_list, meal_type, dining_hall)
             print(f"Saved {len(food_data_list)} {meal_type} items to {file_path}")
             return True
 
@@ -159,48 +247,47 @@ class HarvardAPIScraper:
             print(f"Error saving {meal_type} data: {e}")
             return False
 
-    def scrape_all_meals(self):
-        """Scrape all meals for Harvard Annenberg Hall"""
+    def scrape_all_meals(self, upload=True):
+        """Scrape all meals for every configured Harvard dining location (upload=False leaves the upload to the caller)"""
         print(f"Starting Harvard API scraping for {self.date}")
-        print(f"Location: Annenberg Hall (Main Undergraduate Dining)")
 
         all_items = []
         is_weekend = datetime.strptime(self.date, '%Y-%m-%d').weekday() >= 5
 
         try:
+            locations = self.get_locations()
+            print(f"Locations: {', '.join(location['name'] for location in locations)}")
+
             if is_weekend:
                 print("Weekend detected - scraping brunch and dinner only")
-                # On weekends, breakfast/lunch combined as brunch
-                brunch_items = self.get_menu_for_meal(0)  # Use breakfast endpoint for brunch
-                dinner_items = self.get_menu_for_meal(2)
-
-                if brunch_items:
-                    self.save_to_file(brunch_items, 'breakfast')
-                    all_items.extend(brunch_items)
-
-                if dinner_items:
-                    self.save_to_file(dinner_items, 'dinner')
-                    all_items.extend(dinner_items)
-
+                # On weekends, breakfast/lunch combined as brunch (breakfast endpoint)
+                meals = [(0, 'breakfast'), (2, 'dinner')]
             else:
                 print("Weekday detected - scraping all three meals")
-                for meal_id, meal_name in self.meal_types.items():
-                    meal_items = self.get_menu_for_meal(meal_id)
+                meals = list(self.meal_types.items())
+
+            for location in locations:
+                for meal_id, meal_name in meals:
+                    meal_items = self.get_menu_for_meal(meal_id, location)
                     if meal_items:
-                        self.save_to_file(meal_items, meal_name)
+                        self.save_to_file(meal_items, meal_name, location['slug'])
                         all_items.extend(meal_items)
 
             # Save combined data
             if all_items:
                 combined_path = f'data/cleaned_data/harvard/all_food_items_cleaned.json'
-                with open(combined_path, 'w', encoding='utf-8') as f:
-                    json.dump(all_items, f, indent=2, ensure_ascii=False)
+                save_items(combined_path, all_items)
+                RunManifest().record('cleaned', 'harvard', self.date, combined_path, all_items)
                 print(f"Saved combined Harvard data: {combined_path}")
 
+                if not upload:
+                    print(f"Successfully scraped {len(all_items)} Harvard items")
+                    return True
+
                 # Upload to database
                 print("Uploading Harvard data to database...")
                 uploader = SupabaseUploader('harvard_cleaned_data')
-                uploader.upload_json_file(combined_path)
+                uploader.upload_json_file_incremental(combined_path, 'harvard', self.date)
 
                 print(f"Successfully scraped and uploaded {len(all_items)} Harvard items")
                 return True
@@ -212,10 +299,10 @@ class HarvardAPIScraper:
             print(f"Error in Harvard scraping: {str(e)}")
             return False
 
-def scrape_harvard(date=None):
+def scrape_harvard(date=None, identity_index=None, archive=None, upload=True):
     """Standalone function to scrape Harvard dining data"""
-    scraper = HarvardAPIScraper(date)
-    return scraper.scrape_all_meals()
+    scraper = HarvardAPIScraper(date, identity_index=identity_index, archive=archive)
+    return scraper.scrape_all_meals(upload)
 
 if __name__ == "__main__":
     # Test the Harvard scraper
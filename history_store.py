@@ -0,0 +1,196 @@
+import hashlib
+import json
+import mmap
+import os
+import threading
+from datetime import date as date_cls, datetime, timedelta
+import numpy as np
+from food_item import default as encode_record
+
+MEAL_CODES = {'breakfast': 0, 'lunch': 1, 'dinner': 2}
+
+# One fixed-width index record per served item, packed so it can be viewed straight off the mmap
+INDEX_DTYPE = np.dtype([
+    ('date', '<u4'),        # date ordinal
+    ('university', '<u4'),
+    ('meal', 'u1'),
+    ('station', '<u4'),
+    ('food', '<u8'),
+    ('batch', '<u4'),       # append batch, so reruns of the same meal supersede older rows
+    ('offset', '<u8'),      # byte offset into the date's segment file
+    ('length', '<u4')
+])
+
+def key_hash(text, digest_size=4):
+    """Stable integer hash used for index keys"""
+    digest = hashlib.blake2b(str(text).encode('utf-8'), digest_size=digest_size).digest()
+    return int.from_bytes(digest, 'little')
+
+def food_key(item):
+    """Index key for an item - canonical food id when tagged, otherwise the raw name"""
+    return key_hash(item.get('food_id') or item.get('food_name', ''), 8)
+
+class MenuHistoryStore:
+    """Append-only local menu history: one JSONL segment per date plus a memory-mapped index"""
+
+    def __init__(self, root_dir='data/history'):
+        self.root_dir = root_dir
+        self.segment_dir = os.path.join(root_dir, 'segments')
+        self.index_path = os.path.join(root_dir, 'index.bin')
+        self.batches_path = os.path.join(root_dir, 'batches.json')
+        self.lock = threading.Lock()
+
+        os.makedirs(self.segment_dir, exist_ok=True)
+        self.batches = self.load_batches()
+
+        self._mmap = None
+        self._mmap_size = 0
+
+    def load_batches(self):
+        """Latest batch id and content hash per university|date|meal"""
+        if not os.path.exists(self.batches_path):
+            return {}
+        with open(self.batches_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def segment_path(self, date):
+        return os.path.join(self.segment_dir, f'{date}.jsonl')
+
+    def append_meal(self, university_key, date, meal_type, items, dining_hall=None):
+        """Append one meal's cleaned items; a rerun with identical content is a no-op"""
+        batch_key = f'{university_key}|{date}|{meal_type}'
+        if dining_hall:
+            batch_key += f'|{dining_hall}'
+        lines = [json.dumps(dict(item, university=university_key, date=date, meal_type=meal_type), ensure_ascii=False,
+                            default=encode_record)
+                 for item in items]
+        content_hash = hashlib.blake2b('\n'.join(lines).encode('utf-8'), digest_size=16).hexdigest()
+
+        with self.lock:
+            previous = self.batches.get(batch_key)
+            if previous and previous['content_hash'] == content_hash:
+                print(f"History unchanged for {batch_key}, skipping append")
+                return 0
+
+            # Taken from the index too: a crash between the index append and the batches.json rewrite
+            # leaves rows under an id batches.json never recorded, and reusing it would revive them
+            existing = self.index()
+            batch_id = 1 + max(max((b['batch'] for b in self.batches.values()), default=0),
+                               int(existing['batch'].max()) if len(existing) else 0)
+            del existing
+            date_ordinal = datetime.strptime(date, '%Y-%m-%d').date().toordinal()
+            university_hash = key_hash(university_key)
+            meal_code = MEAL_CODES.get(meal_type, 255)
+
+            records = np.zeros(len(items), dtype=INDEX_DTYPE)
+            with open(self.segment_path(date), 'ab') as segment:
+                for i, (item, line) in enumerate(zip(items, lines)):
+                    encoded = (line + '\n').encode('utf-8')
+                    records[i] = (
+                        date_ordinal, university_hash, meal_code, key_hash(item.get('station_name', '')),
+                        food_key(item), batch_id, segment.tell(), len(encoded) - 1
+                    )
+                    segment.write(encoded)
+
+            # Segment data is written before its index entries so the index never points past the data
+            with open(self.index_path, 'ab') as index_file:
+                index_file.write(records.tobytes())
+
+            self.batches[batch_key] = {'batch': batch_id, 'content_hash': content_hash}
+            temp_path = self.batches_path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.batches, f)
+            os.replace(temp_path, self.batches_path)
+
+        print(f"Appended {len(items)} items to history for {batch_key}")
+        return len(items)
+
+    def index(self):
+        """Structured view of the index file, remapped only when it has grown"""
+        if not os.path.exists(self.index_path):
+            return np.zeros(0, dtype=INDEX_DTYPE)
+
+        size = os.path.getsize(self.index_path)
+        size -= size % INDEX_DTYPE.itemsize
+        if size == 0:
+            return np.zeros(0, dtype=INDEX_DTYPE)
+
+        if self._mmap is None or size != self._mmap_size:
+            previous = self._mmap
+            with open(self.index_path, 'rb') as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mmap_size = size
+            if previous is not None:
+                try:
+                    previous.close()
+                except BufferError:
+                    # An index view handed out earlier still points into it; it goes when that view does
+                    pass
+
+        return np.frombuffer(self._mmap, dtype=INDEX_DTYPE, count=size // INDEX_DTYPE.itemsize)
+
+    def current_mask(self, records):
+        """Drop rows superseded by a later rerun of the same university/date/meal"""
+        latest = np.array([b['batch'] for b in self.batches.values()], dtype=np.uint32)
+        return np.isin(records['batch'], latest)
+
+    def read_records(self, records):
+        """Load the full items for a set of index rows, one seek per row"""
+        items = []
+        handles = {}
+        try:
+            for record in records:
+                day = date_cls.fromordinal(int(record['date'])).isoformat()
+                if day not in handles:
+                    handles[day] = open(self.segment_path(day), 'rb')
+                segment = handles[day]
+                segment.seek(int(record['offset']))
+                items.append(json.loads(segment.read(int(record['length'])).decode('utf-8')))
+        finally:
+            for handle in handles.values():
+                handle.close()
+        return items
+
+    def last_served(self, food_id, university_key=None):
+        """Most recent served item for a canonical food id (or raw food name), or None"""
+        records = self.index()
+        mask = (records['food'] == key_hash(food_id, 8)) & self.current_mask(records)
+        if university_key is not None:
+            mask &= records['university'] == key_hash(university_key)
+
+        matches = records[mask]
+        if len(matches) == 0:
+            return None
+
+        latest = matches[np.argmax(matches['date'])]
+        return self.read_records([latest])[0]
+
+    def station_history(self, university_key, station_name, days=30, end_date=None):
+        """Everything a station served in the last `days` days, oldest first"""
+        end = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else date_cls.today()
+        start = end - timedelta(days=days - 1)
+
+        records = self.index()
+        mask = (
+            (records['university'] == key_hash(university_key))
+            & (records['station'] == key_hash(station_name))
+            & (records['date'] >= start.toordinal())
+            & (records['date'] <= end.toordinal())
+            & self.current_mask(records)
+        )
+        matches = records[mask]
+        matches = matches[np.argsort(matches['date'], kind='stable')]
+        return self.read_records(matches)
+
+    def load_meal(self, university_key, date, meal_type, dining_hall=None):
+        """A stored meal's items, e.g. for warming caches without network access"""
+        batch_key = f'{university_key}|{date}|{meal_type}'
+        if dining_hall:
+            batch_key += f'|{dining_hall}'
+        batch = self.batches.get(batch_key)
+        if not batch:
+            return []
+
+        records = self.index()
+        matches = records[records['batch'] == batch['batch']]
+        return self.read_records(matches)
@@ -4,27 +4,73 @@ Scrapes food data from multiple universities in parallel
 """
 
 from multi_university_scraper import MultiUniversityScraper
+from orchestrator import parse_limits
+from sharding import parse_shard
 from datetime import datetime
+import argparse
 import sys
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scrape, clean and upload dining data for every university")
+    parser.add_argument('date', nargs='?', help="Date to scrape (YYYY-MM-DD, default: today)")
+    parser.add_argument('--shard', help="Scrape only shard i of N (e.g. 0/4) and stage outputs for --merge")
+    parser.add_argument('--merge', type=int, metavar='N', help="Verify and combine N shards, then clean and upload")
+    parser.add_argument('--shard-dir', default='data/shards', help="Where shard manifests and outputs are staged")
+    parser.add_argument('--modal-tabs', type=int, default=1, help="Browser tabs per scraper for harvesting nutrition modals")
+    parser.add_argument('--session-mode', action='store_true', help="Route the loaded app between meals instead of a full page load each")
+    parser.add_argument('--orchestrate', action='store_true', help="Run the asyncio pipeline with per-resource limits")
+    parser.add_argument('--limits', help="Per-resource limits for --orchestrate, e.g. browser=2,api=2,cpu=8,io=4,db=4")
+    parser.add_argument('--adaptive', action='store_true', help="With --orchestrate, tune each limit from latency and throttling")
+    args = parser.parse_args()
+
+    if args.merge is not None and args.merge < 1:
+        parser.error("--merge needs the number of shards (1 or more)")
+    if args.shard and args.merge is not None:
+        parser.error("--shard and --merge are separate steps")
+    if args.shard:
+        try:
+            args.shard = parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+    try:
+        args.limits = parse_limits(args.limits)
+    except ValueError as e:
+        parser.error(str(e))
+    return args
+
 def main():
+    args = parse_args()
+
     print("Starting Multi-University Food Data Scraping")
     print("=" * 60)
 
     try:
         # Use today's date or accept date from command line
-        if len(sys.argv) > 1:
-            date = sys.argv[1]
+        if args.date:
+            date = args.date
             print(f"Using provided date: {date}")
         else:
             date = datetime.today().strftime('%Y-%m-%d')
             print(f"Using today's date: {date}")
 
         # Initialize and run multi-university scraper
-        multi_scraper = MultiUniversityScraper(date)
+        multi_scraper = MultiUniversityScraper(date, session_mode=args.session_mode, shard=args.shard,
+                                               modal_tabs=args.modal_tabs)
+
+        if args.shard:
+            # Scrape-only step of a sharded run; success is judged after the merge
+            scraping_results = multi_scraper.run_shard(max_workers=4, shard_dir=args.shard_dir)
+            sys.exit(0 if all(r['success'] for r in scraping_results) else 1)
 
-        # Run complete pipeline with 4 parallel workers (adjust as needed)
-        results = multi_scraper.run_complete_pipeline(max_workers=4)
+        if args.merge is not None:
+            results = multi_scraper.run_merge(args.merge, max_workers=4, shard_dir=args.shard_dir)
+            if results is None:
+                sys.exit(1)
+        elif args.orchestrate:
+            results = multi_scraper.run_orchestrated_pipeline(limits=args.limits, adaptive=args.adaptive)
+        else:
+            # Run complete pipeline with 4 parallel workers (adjust as needed)
+            results = multi_scraper.run_complete_pipeline(max_workers=4)
 
         # Exit with success/failure code
         total_universities = len(results['scraping_results'])
@@ -0,0 +1,143 @@
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime
+import requests
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from university_config import UniversityConfig
+
+# Period names as shown by DineOnCampus -> the meal_type our files and tables use
+PERIOD_MEAL_TYPES = {
+    'breakfast': 'breakfast',
+    'brunch': 'breakfast',   # weekend brunch is stored as breakfast, as before
+    'lunch': 'lunch',
+    'dinner': 'dinner'
+}
+
+PERIOD_SELECTORS = [
+    "[role='tab']",
+    "[class*='period'] button",
+    "[class*='period'] a",
+    "select option",
+    ".nav-tabs a"
+]
+
+def period_slug(name):
+    """URL segment for a period name, e.g. 'Late Night' -> 'late-night'"""
+    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-')
+
+def default_periods(date):
+    """Fallback used when discovery fails - the old weekday/weekend guess"""
+    if datetime.strptime(date, '%Y-%m-%d').weekday() >= 5:
+        return [('breakfast', 'breakfast'), ('dinner', 'dinner')]
+    return [('breakfast', 'breakfast'), ('lunch', 'lunch'), ('dinner', 'dinner')]
+
+class MealPeriodDiscovery:
+    """Finds which meal periods a dining hall actually serves, cached per hall and weekday"""
+
+    API_URL = "https://api.dineoncampus.com/v1/location/{location_id}/periods"
+
+    def __init__(self, cache_path='data/indexes/meal_periods.json', max_age_days=7):
+        self.cache_path = cache_path
+        self.max_age = max_age_days * 24 * 3600
+        self.lock = threading.Lock()
+        self.cache = self.load_cache()
+
+    def load_cache(self):
+        if not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def save_cache(self):
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        temp_path = self.cache_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.cache, f, indent=2)
+        os.replace(temp_path, self.cache_path)
+
+    def cache_key(self, university_key, date, dining_hall=None):
+        config = UniversityConfig.get_university_config(university_key)
+        weekday = datetime.strptime(date, '%Y-%m-%d').strftime('%A').lower()
+        return f"{university_key}|{dining_hall or config.get('dining_hall', '')}|{weekday}"
+
+    def periods_for(self, university_key, date, scraper=None, dining_hall=None):
+        """List of (period slug, meal_type) to scrape for this hall on this date"""
+        key = self.cache_key(university_key, date, dining_hall)
+
+        with self.lock:
+            cached = self.cache.get(key)
+        if cached and time.time() - cached['discovered_at'] < self.max_age:
+            print(f"Using cached meal periods for {key}: {[slug for slug, _ in cached['periods']]}")
+            return [tuple(period) for period in cached['periods']]
+
+        names = []
+        config = UniversityConfig.get_university_config(university_key)
+        try:
+            location_id = config.get('location_ids', {}).get(dining_hall) if dining_hall else config.get('location_id')
+            if location_id:
+                names = self.discover_from_api(location_id, date)
+            elif scraper is not None:
+                names = self.discover_from_page(scraper, university_key, date, dining_hall)
+        except Exception as e:
+            print(f"Meal period discovery failed for {university_key}: {str(e)}")
+
+        periods = self.to_periods(names)
+        if not periods:
+            print(f"No meal periods discovered for {key}, falling back to defaults")
+            return default_periods(date)
+
+        print(f"Discovered meal periods for {key}: {[slug for slug, _ in periods]}")
+        with self.lock:
+            self.cache[key] = {'periods': periods, 'discovered_at': time.time()}
+            self.save_cache()
+        return [tuple(period) for period in periods]
+
+    @staticmethod
+    def to_periods(names):
+        """Keep periods we store, first occurrence per meal_type, in served order"""
+        periods = []
+        seen_meal_types = set()
+        for name in names:
+            slug = period_slug(name)
+            meal_type = PERIOD_MEAL_TYPES.get(slug)
+            if meal_type and meal_type not in seen_meal_types:
+                seen_meal_types.add(meal_type)
+                periods.append([slug, meal_type])
+        return periods
+
+    def discover_from_api(self, location_id, date):
+        """Period names from the DineOnCampus backing endpoint - no browser needed"""
+        response = requests.get(
+            self.API_URL.format(location_id=location_id),
+            params={'platform': 0, 'date': date},
+            timeout=30
+        )
+        response.raise_for_status()
+        return [period.get('name', '') for period in response.json().get('periods', [])]
+
+    def discover_from_page(self, scraper, university_key, date, dining_hall=None):
+        """Period names from the hall page's period list, without waiting for the full menu"""
+        scraper.driver.get(UniversityConfig.build_url(university_key, date, dining_hall=dining_hall))
+
+        if scraper.check_cloudflare_protection() and not scraper.wait_for_cloudflare():
+            return []
+
+        # The app is now booted, so session-mode scrapes can route in-page from here
+        scraper.app_loaded = True
+
+        def period_texts(driver):
+            for selector in PERIOD_SELECTORS:
+                texts = [el.text.strip() for el in driver.find_elements(By.CSS_SELECTOR, selector)]
+                texts = [text for text in texts if period_slug(text) in PERIOD_MEAL_TYPES]
+                if texts:
+                    return texts
+            return False
+
+        return WebDriverWait(scraper.driver, 20).until(period_texts)
@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+"""
+Meal Planner
+Best k meals (sets of up to max_items menu items) per meal period for a day's menu, scored
+against calorie/macro targets with the same squared relative miss as
+NutrientMatrix.score_combinations, but solved exactly by a vectorized branch and bound
+instead of enumerating every combination.
+
+Usage: python meal_planner.py umassd --target calories=700,protein_g=40 [--date 2025-10-19] [--meal lunch]
+                              [--exclude peanuts,milk] [--require vegetarian] [--k 5] [--max-items 3]
+"""
+
+import argparse
+import copy
+import glob
+import json
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+from allergen_index import BITS, encode_item
+from food_item import load_items
+from nutrient_matrix import NutrientMatrix
+
+MEAL_ORDER = ['breakfast', 'lunch', 'dinner']
+
+# Children generated per vectorized step; bounds memory and lets the threshold tighten between chunks
+CHUNK_SIZE = 500000
+
+# Rows the seeding dive starts from, and tries at each step from each partial set
+DIVE_STARTS = 128
+DIVE_WIDTH = 3
+
+# Meal results kept per planner; repeated requests for the same targets skip the search
+PLAN_CACHE_SIZE = 256
+
+def best_combinations(values, targets, weights, k=5, max_items=3):
+    """Exact top-k sets of 1..max_items distinct rows of values, lowest score first
+
+    values is (n, d), non-negative and sorted ascending by column 0. The score is
+    sum(w * ((total - target) / target) ** 2). Nutrients only add up, so an overshoot can
+    never shrink: that overshoot is the lower bound used to prune a partial set. On column 0
+    it also gives searchsorted windows of rows worth adding: rows come in ascending order, so
+    a set that will grow again gains at least its last row's column 0 once more.
+    Sets are grown level by level, every node of a level at once; a node is kept as
+    (parent node, last row), and only the winners are turned back into row tuples.
+    Returns [(score, (row, ...))].
+    """
+    n = len(values)
+    if n == 0:
+        return []
+    targets = np.asarray(targets, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+
+    # Scaled by sqrt(w) / target, a score is a plain squared distance to the scaled target
+    factor = np.sqrt(weights) / np.where(targets == 0, 1.0, targets)
+    values = values * factor
+    goal = targets * factor
+    primary = values[:, 0]
+
+    def score(sums):
+        miss = sums - goal
+        return np.einsum('ij,ij->i', miss, miss)
+
+    levels = []
+    top_scores = np.empty(0)
+    top_sets = []
+
+    def threshold():
+        return top_scores[-1] if len(top_scores) == k else np.inf
+
+    def set_rows(level, node):
+        rows = []
+        while level >= 0:
+            parents, last = levels[level]
+            rows.append(int(last[node]))
+            node = parents[node]
+            level -= 1
+        return tuple(reversed(rows))
+
+    def keep_best(scores, level, nodes, rows):
+        """Merge children (node of `level`, row) into the top k; level -1 means single rows"""
+        merge_best(scores, lambda b: (set_rows(level, nodes[b]) if level >= 0 else ()) + (int(rows[b]),))
+
+    def merge_best(scores, set_of):
+        """Merge scored sets into the top k; set_of(i) is the ascending row tuple of scores[i]"""
+        nonlocal top_scores, top_sets
+        better = np.flatnonzero(scores < threshold())
+        if len(better) == 0:
+            return
+        # A set found by the seeding dives is found again by the full pass; k spare slots cover the repeats
+        if len(better) > 2 * k:
+            better = better[np.argpartition(scores[better], 2 * k - 1)[:2 * k]]
+        known = set(top_sets)
+        new = []
+        for b in better:
+            rows_of_set = set_of(b)
+            if rows_of_set not in known:
+                known.add(rows_of_set)
+                new.append((scores[b], rows_of_set))
+        merged_scores = np.concatenate([top_scores, [s for s, _ in new]])
+        merged_sets = top_sets + [rows_of_set for _, rows_of_set in new]
+        order = np.argsort(merged_scores, kind='stable')[:k]
+        top_scores = merged_scores[order]
+        top_sets = [merged_sets[i] for i in order]
+
+    # Sparse tables of per-column minima/maxima over row ranges [i, i + 2 ** level): level-major,
+    # each level padded to n rows, so range lookups are single np.take calls
+    lows, highs = [values], [values]
+    while 2 ** len(lows) <= n:
+        width = 2 ** (len(lows) - 1)
+        lows.append(np.minimum(lows[-1][:-width], lows[-1][width:]))
+        highs.append(np.maximum(highs[-1][:-width], highs[-1][width:]))
+    lows = np.concatenate([np.pad(low, ((0, n - len(low)), (0, 0)), constant_values=np.inf) for low in lows])
+    highs = np.concatenate([np.pad(high, ((0, n - len(high)), (0, 0)), constant_values=-np.inf) for high in highs])
+
+    def reach(sums, start, stop, most=1):
+        """Lower bound on the score of a node plus 1..most rows of [start, stop) (non-empty ranges)
+
+        Nutrients only add up, so the total lands in [sums + column min, sums + most * column max]
+        of the range; the part of the goal outside that box is missed whatever rows are picked.
+        At most one side of the box can miss, so the miss is a plain maximum, built in place.
+        """
+        level = np.log2(stop - start).astype(np.int64)
+        first, second = level * n + start, level * n + stop - np.left_shift(1, level)
+        need = goal - sums
+        high = np.maximum(np.take(highs, first, axis=0), np.take(highs, second, axis=0))
+        high *= most
+        np.subtract(need, high, out=high)
+        miss = np.minimum(np.take(lows, first, axis=0), np.take(lows, second, axis=0))
+        miss -= need
+        np.maximum(miss, high, out=miss)
+        np.maximum(miss, 0.0, out=miss)
+        return np.einsum('ij,ij->i', miss, miss)
+
+    def extendable(sums, last, most):
+        """Mask of nodes that adding up to `most` more rows could still bring under the threshold"""
+        limit = threshold()
+        start = last + 1
+        stop = np.full(len(last), n)
+        if np.isfinite(limit) and factor[0] > 0:
+            room = goal[0] + np.sqrt(limit) - sums[:, 0]
+            stop = np.searchsorted(primary, room, side='right')
+            if most == 1:
+                # A single last row must also land within the slack from below
+                start = np.maximum(start, np.searchsorted(primary, room - 2 * np.sqrt(limit), side='left'))
+        alive = np.zeros(len(last), dtype=bool)
+        check = np.flatnonzero(stop > start)
+        alive[check] = reach(np.take(sums, check, axis=0), start[check], stop[check], most) < limit
+        return alive
+
+    def windows(last, sums, final, prune=True):
+        """Per node: [start, grow) rows whose child may grow again, [finish, stop) rows whose child only gets scored
+
+        Past the threshold's column-0 slack a child is useless; a child that grows again adds
+        at least its own last row twice, and a child that stops must land within the slack and
+        within reach of the goal on every column.
+        """
+        start = last + 1
+        limit = threshold()
+        if not np.isfinite(limit) or factor[0] <= 0:
+            stop = np.full(len(sums), n)
+            return start, (start if final else stop), start, stop
+        slack = np.sqrt(limit)
+        room = goal[0] + slack - sums[:, 0]
+        stop = np.searchsorted(primary, room, side='right')
+        finish = np.maximum(start, np.searchsorted(primary, room - 2 * slack, side='left'))
+        grow = start if final else np.minimum(np.searchsorted(primary, room / 2, side='right'), stop)
+        finish = np.maximum(finish, grow)
+
+        if not prune:
+            return start, grow, finish, stop
+
+        # Finishing windows nothing in which can reach the goal are emptied
+        check = np.flatnonzero(stop > finish)
+        hopeless = check[reach(np.take(sums, check, axis=0), finish[check], stop[check]) >= limit]
+        finish[hopeless] = stop[hopeless]
+        return start, grow, finish, stop
+
+    def child_sums(nodes, rows):
+        # np.take on axis 0 gathers whole rows several times faster than fancy indexing
+        return np.take(sums, nodes, axis=0) + np.take(values, rows, axis=0)
+
+    def expand(first, start, stop):
+        """(node, row) for every row in [start, stop) of each node, nodes numbered from first"""
+        counts = np.maximum(stop - start, 0)
+        total = int(counts.sum())
+        local = np.repeat(np.arange(len(counts)), counts)
+        rows = start[local] + (np.arange(total) - (np.cumsum(counts) - counts)[local])
+        return local + first, rows
+
+    last = np.arange(n)
+    parents = np.full(n, -1)
+    sums = values
+    keep_best(score(sums), -1, parents, last)
+
+    # Full-depth dive before any level is expanded: from the rows nearest (on every nutrient) an
+    # equal share of the goal, add the rows nearest an equal share of what is still missing. Its
+    # full sets give a threshold close to the final one, so the bounds prune the first levels
+    # about as hard as the last
+    norms = np.einsum('ij,ij->i', values, values)
+    distance = norms - 2 * values @ (goal / max_items)
+    starts = np.argsort(distance)[:DIVE_STARTS] if n > DIVE_STARTS else last
+    dive_sets, dive_sums = starts[:, None], np.take(values, starts, axis=0)
+    for depth in range(2, max_items + 1):
+        share = (goal - dive_sums) / (max_items - depth + 1)
+        distance = norms - 2 * share @ values.T
+        np.put_along_axis(distance, dive_sets, np.inf, axis=1)
+        width = min(DIVE_WIDTH, n - depth + 1)
+        picks = np.argpartition(distance, width - 1, axis=1)[:, :width]
+        dive_sets = np.column_stack([np.repeat(dive_sets, width, axis=0), picks.ravel()])
+        dive_sums = np.repeat(dive_sums, width, axis=0) + np.take(values, picks.ravel(), axis=0)
+        ordered = np.sort(dive_sets, axis=1)
+        merge_best(score(dive_sums), lambda b: tuple(int(row) for row in ordered[b]))
+
+    # Later levels only receive children that passed the same check when they were made
+    alive = extendable(sums, last, max_items - 1)
+    parents, last, sums = parents[alive], last[alive], np.compress(alive, sums, axis=0)
+
+    for depth in range(2, max_items + 1):
+        final = depth == max_items
+        levels.append((parents, last))
+        level = len(levels) - 1
+        if len(last) == 0:
+            break
+
+        # Primal dive: each node plus the rows nearest the calories it is missing tightens the threshold early
+        nearest = np.searchsorted(primary, goal[0] - sums[:, 0])
+        for offset in (-1, 0):
+            rows = np.clip(nearest + offset, 0, n - 1)
+            nodes = np.flatnonzero(rows > last)
+            keep_best(score(child_sums(nodes, rows[nodes])), level, nodes, rows[nodes])
+
+        # Chunks sized by the children they will generate, so the threshold also tightens between chunks
+        start, grow, finish, stop = windows(last, sums, final, prune=False)
+        expected = np.cumsum(np.maximum(grow - start, 0) + np.maximum(stop - finish, 0))
+        cuts = np.searchsorted(expected, np.arange(CHUNK_SIZE, int(expected[-1]), CHUNK_SIZE))
+        next_parents, next_last, next_sums = [], [], []
+
+        for chunk_start, chunk_stop in zip(np.r_[0, cuts], np.r_[cuts, len(last)]):
+            start, grow, finish, stop = windows(last[chunk_start:chunk_stop], sums[chunk_start:chunk_stop], final)
+
+            # Every node of the chunk expanded into its children in one shot
+            nodes, rows = expand(chunk_start, finish, stop)
+            if len(nodes):
+                keep_best(score(child_sums(nodes, rows)), level, nodes, rows)
+            if final:
+                continue
+
+            nodes, rows = expand(chunk_start, start, grow)
+            if len(nodes):
+                children = child_sums(nodes, rows)
+                keep_best(score(children), level, nodes, rows)
+                alive = extendable(children, rows, max_items - depth)
+                next_parents.append(nodes[alive])
+                next_last.append(rows[alive])
+                next_sums.append(np.compress(alive, children, axis=0))
+
+        if final or not next_parents:
+            break
+        parents, last, sums = np.concatenate(next_parents), np.concatenate(next_last), np.concatenate(next_sums)
+
+    return [(float(s), rows) for s, rows in zip(top_scores, top_sets)]
+
+class MealPlanner:
+    """One university-day of cleaned items, with candidate sets memoized per meal and filter
+    and the best meals per meal, filter and targets"""
+
+    def __init__(self, items, university_key=None, date=None):
+        self.university_key = university_key
+        self.date = date
+        self.items = items
+        self.matrix = NutrientMatrix.from_items(items, university_key, date)
+        self.allergen_masks = np.array([encode_item(item) for item in items], dtype=np.uint32)
+        self.candidate_cache = {}
+        self.plan_cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def load(cls, university_key, date=None, cleaned_dir='data/cleaned_data', history_store=None):
+        """A day's items from the menu history when it has that date, else the latest cleaned files"""
+        items = []
+        if date:
+            if history_store is None and os.path.exists(os.path.join('data', 'history', 'index.bin')):
+                from history_store import MenuHistoryStore
+                history_store = MenuHistoryStore()
+            if history_store is not None:
+                prefix = f'{university_key}|{date}|'
+                for batch_key in sorted(history_store.batches):
+                    if batch_key.startswith(prefix):
+                        parts = batch_key.split('|')
+                        items.extend(history_store.load_meal(university_key, date, parts[2], parts[3] if len(parts) > 3 else None))
+
+        if not items:
+            pattern = os.path.join(cleaned_dir, university_key, '**', 'all_food_items_cleaned.json')
+            for file_path in sorted(glob.glob(pattern, recursive=True)):
+                items.extend(item.to_dict() for item in load_items(file_path))
+
+        return cls(items, university_key, date)
+
+    def candidates(self, meal_type, nutrients, exclude_mask=0, require_mask=0):
+        """(item ids, values) usable for a meal: nutrients known, some calories, filters applied,
+        one row per food name, sorted by the first nutrient. Memoized per meal/filter/nutrients."""
+        key = (meal_type, tuple(nutrients), exclude_mask, require_mask)
+        with self.lock:
+            cached = self.candidate_cache.get(key)
+        if cached is not None:
+            return cached
+
+        columns = [self.matrix.column_index[nutrient] for nutrient in nutrients]
+        values = self.matrix.values[:, columns]
+        mask = self.matrix.group_mask('meal', meal_type)
+        mask &= ~np.isnan(values).any(axis=1) & (values >= 0).all(axis=1)
+        mask &= self.matrix.column('calories') > 0
+        if exclude_mask:
+            mask &= (self.allergen_masks & exclude_mask) == 0
+        if require_mask:
+            mask &= (self.allergen_masks & require_mask) == require_mask
+
+        # The same dish listed at several stations or halls would only produce duplicate plans
+        item_ids = []
+        seen = set()
+        for item_id in np.flatnonzero(mask):
+            name = self.matrix.food_names[item_id]
+            if name not in seen:
+                seen.add(name)
+                item_ids.append(item_id)
+        item_ids = np.array(item_ids, dtype=np.int64)
+
+        order = np.argsort(values[item_ids, 0], kind='stable')
+        cached = (item_ids[order], np.ascontiguousarray(values[item_ids[order]]))
+        with self.lock:
+            self.candidate_cache[key] = cached
+        return cached
+
+    def plan(self, targets, meal_types=None, exclude=(), require=(), weights=None, k=5, max_items=3):
+        """{meal: [{'score', 'totals', 'items'}]} - the k best meals per period, best first"""
+        unknown = [nutrient for nutrient in targets if nutrient not in self.matrix.column_index]
+        if unknown:
+            raise ValueError(f"Unknown nutrients: {', '.join(unknown)}")
+        exclude_mask = require_mask = 0
+        for name in exclude:
+            if name not in BITS:
+                raise ValueError(f"Unknown allergen or dietary flag: {name}")
+            exclude_mask |= BITS[name]
+        for name in require:
+            if name not in BITS:
+                raise ValueError(f"Unknown allergen or dietary flag: {name}")
+            require_mask |= BITS[name]
+
+        # Calories first: it is the column the search windows on
+        nutrients = sorted(targets, key=lambda nutrient: nutrient != 'calories')
+        target_vector = np.array([targets[nutrient] for nutrient in nutrients], dtype=np.float64)
+        weight_vector = np.array([(weights or {}).get(nutrient, 1.0) for nutrient in nutrients], dtype=np.float64)
+        if (weight_vector < 0).any():
+            raise ValueError("Nutrient weights must be non-negative")
+
+        if meal_types is None:
+            present = set(self.matrix.labels['meal'])
+            meal_types = [meal for meal in MEAL_ORDER if meal in present] + sorted(m for m in present - set(MEAL_ORDER) if m)
+
+        plans = {}
+        for meal_type in meal_types:
+            key = (meal_type, tuple(nutrients), target_vector.tobytes(), weight_vector.tobytes(),
+                   exclude_mask, require_mask, k, max_items)
+            with self.lock:
+                meals = self.plan_cache.get(key)
+                if meals is not None:
+                    self.plan_cache.move_to_end(key)
+            if meals is None:
+                item_ids, values = self.candidates(meal_type, nutrients, exclude_mask, require_mask)
+                meals = [{
+                    'score': round(score, 6),
+                    'totals': {nutrient: round(float(total), 2) for nutrient, total in zip(nutrients, values[list(rows)].sum(axis=0))},
+                    'items': [self.matrix.describe(item_ids[row]) for row in rows]
+                } for score, rows in best_combinations(values, target_vector, weight_vector, k, max_items)]
+                with self.lock:
+                    self.plan_cache[key] = meals
+                    if len(self.plan_cache) > PLAN_CACHE_SIZE:
+                        self.plan_cache.popitem(last=False)
+            # Callers get their own copy, so editing a plan can't change the memoized one
+            plans[meal_type] = copy.deepcopy(meals)
+        return plans
+
+_planners = {}
+_planners_lock = threading.Lock()
+
+def planner_for_day(university_key, date=None, cleaned_dir='data/cleaned_data'):
+    """Shared MealPlanner per university/date, rebuilt only when the cleaned files change"""
+    pattern = os.path.join(cleaned_dir, university_key, '**', 'all_food_items_cleaned.json')
+    signature = tuple((path, os.path.getmtime(path)) for path in sorted(glob.glob(pattern, recursive=True)))
+    key = (university_key, date, cleaned_dir)
+
+    with _planners_lock:
+        cached = _planners.get(key)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+    planner = MealPlanner.load(university_key, date, cleaned_dir)
+    with _planners_lock:
+        _planners[key] = (signature, planner)
+    return planner
+
+def parse_targets(text):
+    """'calories=700,protein_g=40' -> {'calories': 700.0, 'protein_g': 40.0}"""
+    targets = {}
+    for part in filter(None, text.split(',')):
+        name, _, value = part.partition('=')
+        try:
+            targets[name.strip()] = float(value)
+        except ValueError:
+            raise ValueError(f"Invalid target '{part}', expected nutrient=value")
+    return targets
+
+def main():
+    parser = argparse.ArgumentParser(description="Best meals for nutrient targets from a day's menu")
+    parser.add_argument('university')
+    parser.add_argument('--target', required=True, help="e.g. calories=700,protein_g=40,carbs_g=80")
+    parser.add_argument('--date', help="Menu date (from the menu history; default: latest cleaned files)")
+    parser.add_argument('--meal', help="Comma-separated meal periods (default: all)")
+    parser.add_argument('--exclude', default='', help="Allergens to avoid, e.g. peanuts,milk")
+    parser.add_argument('--require', default='', help="Dietary flags, e.g. vegetarian")
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--max-items', type=int, default=3)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    try:
+        targets = parse_targets(args.target)
+        planner = planner_for_day(args.university, args.date)
+        plans = planner.plan(targets, args.meal.split(',') if args.meal else None,
+                             list(filter(None, args.exclude.split(','))), list(filter(None, args.require.split(','))),
+                             k=args.k, max_items=args.max_items)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.json:
+        print(json.dumps(plans, indent=2))
+        return
+
+    for meal_type, meals in plans.items():
+        print(f"\n{meal_type.upper()}")
+        if not meals:
+            print("  No combination of known items")
+        for rank, meal in enumerate(meals, 1):
+            totals = ', '.join(f"{nutrient} {value:g}" for nutrient, value in meal['totals'].items())
+            print(f"  {rank}. score {meal['score']:.4f}  ({totals})")
+            for item in meal['items']:
+                print(f"       - {item['food_name']} [{item['station_name']}]")
+
+if __name__ == "__main__":
+    main()
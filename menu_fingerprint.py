@@ -0,0 +1,85 @@
+import hashlib
+import json
+import os
+from food_item import dumps_items, loads_items
+
+# One DOM read: [station, [food names]] per table, with the same station heuristic as Scraper.scrape_meal
+READ_MENU_SCRIPT = """
+const headingSelector = "h1, h2, h3, h4, h5, h6, .station-name, [class*='station'], [class*='title']";
+return Array.from(document.querySelectorAll('table')).map((table, index) => {
+    let station = null;
+    let parent = table;
+    for (let level = 0; level < 3 && !station && parent.parentElement; level++) {
+        parent = parent.parentElement;
+        for (const heading of parent.querySelectorAll(headingSelector)) {
+            const text = heading.innerText.trim();
+            if (text.length > 2) { station = text; break; }
+        }
+    }
+    const foods = Array.from(table.querySelectorAll('tr'))
+        .map(row => { const cell = row.querySelector('td'); return cell ? cell.innerText.trim() : ''; })
+        .filter(name => name && !['portion', 'calories'].includes(name.toLowerCase()));
+    return [station || `Station ${index + 1}`, foods];
+});
+"""
+
+NO_NUTRITION = "Nutrition info not available"
+
+def menu_fingerprint(menu):
+    """Hash of the ordered station and food names"""
+    encoded = json.dumps(menu, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+def row_key(station_name, food_name, seen):
+    """(station, food, n) so repeated names in one station keep their own modal text"""
+    base = (station_name, food_name)
+    seen[base] = seen.get(base, 0) + 1
+    return base + (seen[base],)
+
+class MenuFingerprintStore:
+    """Fingerprint and items of the last successful scrape of each meal, per date
+
+    Kept apart from the scraped_data files, which only hold the latest date.
+    """
+
+    def __init__(self, root_dir='data/fingerprints'):
+        self.root_dir = root_dir
+
+    def path(self, university_key, date, meal_type, dining_hall=None):
+        return os.path.join(self.root_dir, university_key, date, f"{dining_hall or 'main'}-{meal_type}")
+
+    def load(self, university_key, date, meal_type, dining_hall=None):
+        """(fingerprint, items) of the last successful scrape, or (None, [])"""
+        path = self.path(university_key, date, meal_type, dining_hall)
+        try:
+            with open(f'{path}.fingerprint', 'r', encoding='utf-8') as f:
+                fingerprint = f.read().strip()
+            with open(f'{path}.json', 'rb') as f:
+                return fingerprint, loads_items(f.read())
+        except FileNotFoundError:
+            return None, []
+        except Exception as e:
+            print(f"Ignoring unreadable menu fingerprint {path}: {str(e)}")
+            return None, []
+
+    def save(self, university_key, date, meal_type, fingerprint, items, dining_hall=None):
+        path = self.path(university_key, date, meal_type, dining_hall)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Items first: a fingerprint on disk always has its items next to it
+        for suffix, data in (('.json', dumps_items(items, indent=False)), ('.fingerprint', fingerprint.encode('utf-8'))):
+            temp_path = f'{path}{suffix}.{os.getpid()}.tmp'
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path + suffix)
+
+    @staticmethod
+    def known_rows(items):
+        """{(station, food, n): modal text} for rows whose nutrition was captured"""
+        known = {}
+        seen = {}
+        for item in items:
+            key = row_key(item['station_name'], item['food_name'], seen)
+            if item.get('nutritional_info') and item['nutritional_info'] != NO_NUTRITION:
+                known[key] = item['nutritional_info']
+        return known
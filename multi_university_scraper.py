@@ -1,24 +1,59 @@
 import asyncio
 import concurrent.futures
+import json
 from datetime import datetime
+import multiprocessing
 import os
 import time
 from scraper import Scraper
 from clean_data import FoodDataCleaner
-from database import SupabaseUploader
+from database import SupabaseUploader, print_client_stats
+from parquet_exporter import NutritionParquetExporter
+from allergen_index import AllergenIndex
+from food_identity import FoodIdentityIndex
+from history_store import MenuHistoryStore
+from snapshot_archive import SnapshotArchive
+from meal_discovery import MealPeriodDiscovery
+from orchestrator import PipelineOrchestrator
+from sharding import ALL, ShardManifest, TaskCostTable, assign_shards, merge_shards, plan_tasks, task_key
 from university_config import UniversityConfig
 
 class MultiUniversityScraper:
-    def __init__(self, date=None):
+    def __init__(self, date=None, archive_dir=None, session_mode=False, shard=None, modal_tabs=1):
         self.date = date or datetime.today().strftime('%Y-%m-%d')
-        self.is_weekend = datetime.today().weekday() >= 5  # Saturday=5, Sunday=6
+        self.is_weekend = datetime.strptime(self.date, '%Y-%m-%d').weekday() >= 5  # Saturday=5, Sunday=6
         self.universities = UniversityConfig.get_all_universities()
+        self.allergen_index = AllergenIndex()
+        self.identity_index = FoodIdentityIndex.load()
+        self.history_store = MenuHistoryStore()
+        self.meal_discovery = MealPeriodDiscovery()
+        self.session_mode = session_mode
+        self.modal_tabs = modal_tabs
+
+        # Per-task scrape timings feed the cost table that balances shards
+        self.cost_table = TaskCostTable()
+        self.task_timings = []
+
+        # shard=(index, count) scrapes only this runner's share of the university x hall x meal tasks
+        self.shard = shard
+        self.assigned_keys = None
+        if shard:
+            assignment, loads = assign_shards(plan_tasks(self.universities), shard[1], self.cost_table)
+            self.assigned_keys = {key for key, index in assignment.items() if index == shard[0]}
+            assigned_universities = {key.split('|')[0] for key in self.assigned_keys}
+            self.universities = {key: config for key, config in self.universities.items() if key in assigned_universities}
+            print(f"Shard {shard[0]}/{shard[1]}: {len(self.assigned_keys)} tasks, "
+                  f"estimated {loads[shard[0]]:.0f}s (shard loads: {', '.join(f'{load:.0f}s' for load in loads)})")
+
+        # Raw page/API snapshots for offline re-parsing (see reparse.py)
+        archive_dir = archive_dir or os.getenv('SNAPSHOT_ARCHIVE_DIR')
+        self.archive = SnapshotArchive(archive_dir) if archive_dir else None
         print(f"Initialized multi-university scraper for {self.date}")
         print(f"Weekend mode: {self.is_weekend}")
         print(f"Universities to scrape: {list(self.universities.keys())}")
 
-    def scrape_university(self, university_key):
-        """Scrape a single university - designed to run in parallel"""
+    def scrape_university(self, university_key, upload_api=True):
+        """Scrape a single university - designed to run in parallel (upload_api=False defers API uploads)"""
         print(f"\n{'='*60}")
         print(f"Starting scraper for {university_key}")
         print(f"{'='*60}")
@@ -33,21 +68,21 @@ class MultiUniversityScraper:
             if config and config.get('api_based', False):
                 print(f"Using API scraper for {university_key}")
                 from harvard_api_scraper import scrape_harvard
-                success = scrape_harvard(self.date)
+                start_time = time.time()
+                success = scrape_harvard(self.date, identity_index=self.identity_index, archive=self.archive, upload=upload_api)
+                self.record_timing(task_key(university_key, ALL, ALL), start_time, success)
             else:
-                # Use regular web scraper
-                scraper = Scraper(self.date, university_key)
-
-                # Scrape meals based on weekend/weekday
-                if self.is_weekend:
-                    print(f"Weekend detected for {university_key} - scraping brunch and dinner only")
-                    scraper.fetch_breakfast()  # This will contain brunch items
-                    scraper.fetch_dinner()
-                else:
-                    print(f"Weekday detected for {university_key} - scraping all three meals")
-                    scraper.fetch_breakfast()
-                    scraper.fetch_lunch()
-                    scraper.fetch_dinner()
+                # Use regular web scraper - one browser session for all of this university's halls
+                scraper = Scraper(self.date, university_key, archive=self.archive, session_mode=self.session_mode,
+                                  modal_tabs=self.modal_tabs)
+
+                tasks = self.build_scrape_tasks(university_key, scraper)
+                self.record_skipped_tasks(university_key, tasks)
+                print(f"Scraping {len(tasks)} hall/meal tasks for {university_key}")
+                for dining_hall, slug, meal_type in tasks:
+                    start_time = time.time()
+                    meal_success = scraper.scrape_meal(meal_type, slug, None if UniversityConfig.is_primary_hall(university_key, dining_hall) else dining_hall)
+                    self.record_timing(task_key(university_key, dining_hall, meal_type), start_time, meal_success)
 
                 success = True
 
@@ -67,7 +102,152 @@ class MultiUniversityScraper:
             'scraped_at': datetime.now().isoformat()
         }
 
-    def clean_and_upload_university_data(self, university_key):
+    def build_scrape_tasks(self, university_key, scraper):
+        """Fan a university out into (dining_hall, period slug, meal_type) tasks"""
+        tasks = []
+        for dining_hall in UniversityConfig.get_dining_halls(university_key):
+            # Only queue the periods this hall actually serves on the target date
+            periods = self.meal_discovery.periods_for(university_key, self.date, scraper, dining_hall)
+            tasks.extend((dining_hall, slug, meal_type) for slug, meal_type in periods)
+
+        if self.assigned_keys is not None:
+            tasks = [task for task in tasks if task_key(university_key, task[0], task[2]) in self.assigned_keys]
+        return tasks
+
+    def record_timing(self, key, start_time, success):
+        self.task_timings.append({'key': key, 'seconds': round(time.time() - start_time, 2), 'success': bool(success)})
+
+    def record_skipped_tasks(self, university_key, tasks):
+        """Planned meals that discovery found unserved cost nothing today - record that for the cost table"""
+        scheduled = {task_key(university_key, dining_hall, meal_type) for dining_hall, _, meal_type in tasks}
+        for task in plan_tasks([university_key]):
+            if task['key'] not in scheduled and (self.assigned_keys is None or task['key'] in self.assigned_keys):
+                self.task_timings.append({'key': task['key'], 'seconds': 0.0, 'success': True, 'skipped': True})
+
+    def update_task_costs(self, timings=None):
+        """Fold this run's timings into the cost table used to balance future shards"""
+        for timing in timings if timings is not None else self.task_timings:
+            self.cost_table.update(timing['key'], timing['seconds'])
+        self.cost_table.save()
+
+    def shard_output_files(self):
+        """Files this shard produced: the scraped file per task (plus Harvard's already-cleaned output)"""
+        files = []
+        for timing in self.task_timings:
+            if timing.get('skipped'):
+                continue
+            university_key, dining_hall, meal_type = timing['key'].split('|')
+            if meal_type == ALL:
+                for root, _, names in os.walk(UniversityConfig.data_dir('scraped_data', university_key)):
+                    files.extend(os.path.join(root, name) for name in names)
+                files.append(f"{UniversityConfig.data_dir('cleaned_data', university_key)}/all_food_items_cleaned.json")
+            else:
+                hall = None if UniversityConfig.is_primary_hall(university_key, dining_hall) else dining_hall
+                files.append(f"{UniversityConfig.data_dir('scraped_data', university_key, hall)}/food_items_{meal_type}.json")
+        return files
+
+    def run_shard(self, max_workers=4, shard_dir='data/shards'):
+        """Scrape this shard's tasks and stage the outputs for the merge step (no cleaning or upload)"""
+        start_time = time.time()
+        scraping_results = self.run_parallel_scraping(max_workers, upload_api=False)
+
+        manifest = ShardManifest(shard_dir, self.date, self.shard[0], self.shard[1])
+        manifest.write(self.assigned_keys, self.task_timings, self.shard_output_files())
+
+        successful_scrapes = sum(1 for r in scraping_results if r['success'])
+        print(f"Shard {self.shard[0]}/{self.shard[1]} finished in {time.time() - start_time:.2f} seconds: "
+              f"{successful_scrapes}/{len(scraping_results)} universities scraped")
+        return scraping_results
+
+    def run_merge(self, shard_count, max_workers=4, shard_dir='data/shards'):
+        """Verify and combine every shard's outputs, then clean and upload as a normal run would"""
+        manifests = merge_shards(shard_dir, self.date, shard_count, self.universities)
+        if manifests is None:
+            return None
+
+        timings = [timing for manifest in manifests for timing in manifest['timings']]
+        self.update_task_costs(timings)
+
+        scraped = {timing['key'].split('|')[0] for timing in timings if timing['success'] and not timing.get('skipped')}
+        scraping_results = [{'university': key, 'success': key in scraped} for key in self.universities]
+        processing_results = self.run_parallel_processing(max_workers)
+
+        # Shards leave API universities' cleaned files unuploaded; they go up only once the merge verified them
+        for university_key in sorted(scraped):
+            if UniversityConfig.get_university_config(university_key).get('api_based', False):
+                try:
+                    self.upload_api_data(university_key)
+                except Exception as e:
+                    print(f"Error uploading {university_key} data: {str(e)}")
+        print_client_stats()
+
+        return {
+            'scraping_results': scraping_results,
+            'processing_results': processing_results,
+            'successful_scrapes': sum(1 for r in scraping_results if r['success']),
+            'successful_processing': sum(1 for r in processing_results if r['processing_success']),
+            'date': self.date
+        }
+
+    def clean_university_data(self, university_key, cpu_executor=None, dining_hall=None):
+        """Clean a single university hall's scraped files (CPU stage, offloaded to cpu_executor)"""
+        hall = None if UniversityConfig.is_primary_hall(university_key, dining_hall) else dining_hall
+        print(f"\nCleaning data for {university_key}{f' ({hall})' if hall else ''}...")
+
+        # Initialize cleaner with university/hall-specific paths
+        cleaner = FoodDataCleaner(
+            university_key,
+            allergen_index=self.allergen_index,
+            identity_index=self.identity_index,
+            dining_hall=hall,
+            date=self.date
+        )
+        cleaned_files = cleaner.clean_food_data(executor=cpu_executor)
+
+        if cleaned_files:
+            self.record_history(university_key, hall, combined_path=cleaned_files[0])
+
+            # Columnar export for analytics - never blocks the upload
+            try:
+                NutritionParquetExporter().export_university(university_key, self.date, cleaned_files, dining_hall=hall)
+            except Exception as e:
+                print(f"Parquet export failed for {university_key}: {str(e)}")
+
+        return cleaned_files
+
+    def upload_university_data(self, university_key, cleaned_files, dining_hall=None):
+        """Upload a university hall's cleaned files (I/O stage)"""
+        hall = None if UniversityConfig.is_primary_hall(university_key, dining_hall) else dining_hall
+
+        # Get database name for this university
+        database_name = UniversityConfig.get_database_name(university_key)
+
+        print(f"Uploading data to database '{database_name}' for {university_key}...")
+
+        # Initialize uploader with university-specific database
+        uploader = SupabaseUploader(database_name)
+
+        # Upload each cleaned file
+        for file_path in cleaned_files:
+            if os.path.exists(file_path):
+                uploader.upload_json_file_incremental(file_path, university_key, self.date, hall)
+                print(f"Uploaded {file_path}")
+            else:
+                print(f"File not found: {file_path}")
+
+    def upload_api_data(self, university_key):
+        """Upload an API university's combined file, which its scraper already wrote in the cleaned schema"""
+        combined_path = f'data/cleaned_data/{university_key}/all_food_items_cleaned.json'
+        if not os.path.exists(combined_path):
+            return False
+
+        print(f"Uploading {university_key} data to database...")
+        SupabaseUploader(UniversityConfig.get_database_name(university_key)).upload_json_file_incremental(
+            combined_path, university_key, self.date
+        )
+        return True
+
+    def clean_and_upload_university_data(self, university_key, cpu_executor=None):
         """Clean and upload data for a single university"""
         try:
             # Check if this is Harvard (API-based) - skip cleaning as it's already uploaded
@@ -75,33 +255,24 @@ class MultiUniversityScraper:
             config = UniversityConfig.get_university_config(university_key)
             if config and config.get('api_based', False):
                 print(f"Skipping data cleaning for {university_key} - API data already processed and uploaded")
+                self.index_api_allergens(university_key)
+                self.record_history(university_key)
+                self.export_api_parquet(university_key)
                 return True
 
-            print(f"\nCleaning data for {university_key}...")
-
-            # Initialize cleaner with university-specific paths
-            cleaner = FoodDataCleaner(university_key)
-            cleaned_files = cleaner.clean_food_data()
+            processed_halls = 0
+            for dining_hall in UniversityConfig.get_dining_halls(university_key):
+                cleaned_files = self.clean_university_data(university_key, cpu_executor, dining_hall)
 
-            if not cleaned_files:
-                print(f"No cleaned data files found for {university_key}")
-                return False
-
-            # Get database name for this university
-            database_name = UniversityConfig.get_database_name(university_key)
-
-            print(f"Uploading data to database '{database_name}' for {university_key}...")
+                if not cleaned_files:
+                    print(f"No cleaned data files found for {university_key} ({dining_hall})")
+                    continue
 
-            # Initialize uploader with university-specific database
-            uploader = SupabaseUploader(database_name)
+                self.upload_university_data(university_key, cleaned_files, dining_hall)
+                processed_halls += 1
 
-            # Upload each cleaned file
-            for file_path in cleaned_files:
-                if os.path.exists(file_path):
-                    uploader.upload_json_file(file_path)
-                    print(f"Uploaded {file_path}")
-                else:
-                    print(f"File not found: {file_path}")
+            if not processed_halls:
+                return False
 
             print(f"Successfully processed data for {university_key}")
             return True
@@ -110,8 +281,70 @@ class MultiUniversityScraper:
             print(f"Error processing data for {university_key}: {str(e)}")
             return False
 
-    def run_parallel_scraping(self, max_workers=4):
-        """Run scraping for all universities in parallel"""
+    def index_api_allergens(self, university_key):
+        """Add already-cleaned API data (Harvard) to the allergen index"""
+        combined_path = f'data/cleaned_data/{university_key}/all_food_items_cleaned.json'
+        if not os.path.exists(combined_path):
+            return
+
+        try:
+            with open(combined_path, 'r', encoding='utf-8') as f:
+                self.allergen_index.add_items(json.load(f), university_key)
+        except Exception as e:
+            print(f"Could not index allergens for {university_key}: {str(e)}")
+
+    def export_api_parquet(self, university_key):
+        """Columnar export of API data, which is already in the cleaned schema"""
+        combined_path = f'data/cleaned_data/{university_key}/all_food_items_cleaned.json'
+        if not os.path.exists(combined_path):
+            return
+
+        try:
+            with open(combined_path, 'r', encoding='utf-8') as f:
+                items = self.items_for_date(json.load(f), combined_path)
+
+            partitions = {}
+            for item in items:
+                partitions.setdefault((item.get('meal_type', 'unknown'), item.get('dining_hall')), []).append(item)
+
+            exporter = NutritionParquetExporter()
+            for (meal_type, dining_hall), meal_items in partitions.items():
+                exporter.export_items(meal_items, university_key, self.date, meal_type, dining_hall)
+        except Exception as e:
+            print(f"Parquet export failed for {university_key}: {str(e)}")
+
+    def items_for_date(self, items, source):
+        """Drop items dated for another day (API files carry a date; a failed scrape leaves the last one's)"""
+        current = [item for item in items if item.get('date', self.date) == self.date]
+        if len(current) < len(items):
+            print(f"Skipping {len(items) - len(current)} items in {source} not dated {self.date}")
+        return current
+
+    def record_history(self, university_key, dining_hall=None, combined_path=None):
+        """Append the date's cleaned meals to the local menu history
+
+        combined_path is the combined file cleaning just wrote; without it (API universities)
+        the file on disk is used, keeping only items dated for this run.
+        """
+        combined_path = combined_path or f"{UniversityConfig.data_dir('cleaned_data', university_key, dining_hall)}/all_food_items_cleaned.json"
+        if not os.path.exists(combined_path):
+            return
+
+        try:
+            with open(combined_path, 'r', encoding='utf-8') as f:
+                items = self.items_for_date(json.load(f), combined_path)
+
+            meals = {}
+            for item in items:
+                meals.setdefault(item.get('meal_type', 'unknown'), []).append(item)
+
+            for meal_type, meal_items in meals.items():
+                self.history_store.append_meal(university_key, self.date, meal_type, meal_items, dining_hall)
+        except Exception as e:
+            print(f"Could not record history for {university_key}: {str(e)}")
+
+    def run_parallel_scraping(self, max_workers=4, upload_api=True):
+        """Run scraping for all universities in parallel (upload_api=False leaves API universities unuploaded)"""
         print(f"\nStarting parallel scraping with {max_workers} workers...")
 
         results = []
@@ -120,7 +353,7 @@ class MultiUniversityScraper:
         with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
             # Submit scraping jobs for all universities
             future_to_university = {
-                executor.submit(self.scrape_university, uni_key): uni_key
+                executor.submit(self.scrape_university, uni_key, upload_api): uni_key
                 for uni_key in self.universities.keys()
             }
 
@@ -141,16 +374,27 @@ class MultiUniversityScraper:
 
         return results
 
-    def run_parallel_processing(self, max_workers=4):
-        """Clean and upload data for all universities in parallel"""
-        print(f"\nStarting parallel data processing with {max_workers} workers...")
+    def run_parallel_processing(self, max_workers=4, cleaning_workers=None):
+        """Clean and upload data for all universities in parallel
+
+        Cleaning is CPU-bound regex work, so its item batches run in a process pool
+        (cleaning_workers defaults to the CPU count). The per-university threads only
+        coordinate and do the I/O-bound uploads.
+        """
+        print(f"\nStarting parallel data processing with {max_workers} upload workers...")
 
         processing_results = []
 
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # spawn rather than fork: the pool is started from a multi-threaded process
+        cpu_executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=cleaning_workers,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+
+        with cpu_executor, concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
             # Submit processing jobs for all universities
             future_to_university = {
-                executor.submit(self.clean_and_upload_university_data, uni_key): uni_key
+                executor.submit(self.clean_and_upload_university_data, uni_key, cpu_executor): uni_key
                 for uni_key in self.universities.keys()
             }
 
@@ -173,8 +417,98 @@ class MultiUniversityScraper:
                         'processed_at': datetime.now().isoformat()
                     })
 
+        self.allergen_index.save()
+        self.identity_index.save()
+
         return processing_results
 
+    async def orchestrate_university(self, orchestrator, university_key, cpu_executor):
+        """One university's scrape -> clean -> upload chain, each step in its own resource class"""
+        config = UniversityConfig.get_university_config(university_key)
+        scrape_result = {'university': university_key, 'success': False, 'scraped_at': datetime.now().isoformat()}
+        processing_result = {'university': university_key, 'processing_success': False}
+
+        try:
+            if config.get('api_based', False):
+                # The whole API scrape (every menu and recipe request) is one step
+                scrape_result = await orchestrator.run('api', self.scrape_university, university_key, upload_api=False)
+                if scrape_result['success']:
+                    await orchestrator.run('db', self.upload_api_data, university_key)
+                # Allergen index, history and parquet for data that is already cleaned - local I/O only
+                success = await orchestrator.run('io', self.clean_and_upload_university_data, university_key)
+            else:
+                scrape_result = await orchestrator.run('browser', self.scrape_university, university_key)
+
+                async def process_hall(dining_hall):
+                    cleaned_files = await orchestrator.run('cpu', self.clean_university_data, university_key, cpu_executor, dining_hall)
+                    if not cleaned_files:
+                        print(f"No cleaned data files found for {university_key} ({dining_hall})")
+                        return False
+                    await orchestrator.run('db', self.upload_university_data, university_key, cleaned_files, dining_hall)
+                    return True
+
+                halls = await asyncio.gather(*[process_hall(hall) for hall in UniversityConfig.get_dining_halls(university_key)])
+                success = any(halls)
+
+            processing_result['processing_success'] = success
+        except Exception as e:
+            print(f"Error processing {university_key}: {str(e)}")
+            processing_result['error'] = str(e)
+
+        processing_result['processed_at'] = datetime.now().isoformat()
+        return scrape_result, processing_result
+
+    async def orchestrate(self, orchestrator, cpu_executor):
+        return await asyncio.gather(*[
+            self.orchestrate_university(orchestrator, university_key, cpu_executor)
+            for university_key in self.universities
+        ])
+
+    def run_orchestrated_pipeline(self, limits=None, cleaning_workers=None, adaptive=False):
+        """Scrape, clean and upload every university from one asyncio orchestrator
+
+        Unlike run_complete_pipeline, there is no barrier between scraping and processing, and
+        browsers, API scrapes, cleaning, local I/O and uploads have separate limits (see orchestrator.py).
+        adaptive=True lets each limit move with latency and throttling, starting from last run's.
+        """
+        start_time = time.time()
+        orchestrator = PipelineOrchestrator(limits, adaptive=adaptive)
+        print(f"\nStarting orchestrated pipeline for {self.date} ({', '.join(self.universities.keys())})")
+        print(f"Resource limits: {', '.join(f'{name}={limit}' for name, limit in orchestrator.limits.items())}")
+
+        cpu_executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=cleaning_workers,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+        try:
+            with cpu_executor:
+                results = asyncio.run(self.orchestrate(orchestrator, cpu_executor))
+        finally:
+            orchestrator.shutdown()
+
+        scraping_results = [scrape_result for scrape_result, _ in results]
+        processing_results = [processing_result for _, processing_result in results]
+        self.update_task_costs()
+        self.allergen_index.save()
+        self.identity_index.save()
+
+        total_time = time.time() - start_time
+        successful_scrapes = sum(1 for r in scraping_results if r['success'])
+        successful_processing = sum(1 for r in processing_results if r['processing_success'])
+        print(f"\nOrchestrated pipeline finished in {total_time:.2f} seconds: "
+              f"{successful_scrapes}/{len(scraping_results)} scraped, {successful_processing}/{len(processing_results)} processed")
+        orchestrator.print_stats()
+        print_client_stats()
+
+        return {
+            'scraping_results': scraping_results,
+            'processing_results': processing_results,
+            'total_time': total_time,
+            'successful_scrapes': successful_scrapes,
+            'successful_processing': successful_processing,
+            'date': self.date
+        }
+
     def run_complete_pipeline(self, max_workers=4):
         """Run the complete scraping and processing pipeline"""
         start_time = time.time()
@@ -186,6 +520,7 @@ class MultiUniversityScraper:
 
         # Step 1: Parallel scraping
         scraping_results = self.run_parallel_scraping(max_workers)
+        self.update_task_costs()
 
         # Step 2: Parallel data cleaning and uploading
         processing_results = self.run_parallel_processing(max_workers)
@@ -218,6 +553,9 @@ class MultiUniversityScraper:
             status = "SUCCESS" if result['processing_success'] else "FAILED"
             print(f"  {status} {result['university']}")
 
+        print()
+        print_client_stats()
+
         print(f"\n{'='*80}")
 
         return {
@@ -0,0 +1,254 @@
+import itertools
+import json
+import os
+import numpy as np
+from clean_data import FoodDataCleaner
+
+class NutrientMatrix:
+    """Contiguous float matrix of cleaned nutrients for vectorized queries"""
+
+    NUTRIENTS = ['calories'] + list(FoodDataCleaner.NUTRIENT_PATTERNS.keys())
+    GROUP_KEYS = ('station', 'meal', 'university', 'date')
+
+    def __init__(self, values, less_than, food_names, labels, codes):
+        # values[i, j] is nutrient j of item i (NaN when missing)
+        self.values = np.ascontiguousarray(values, dtype=np.float64)
+        self.less_than = np.ascontiguousarray(less_than, dtype=bool)
+        self.item_ids = np.arange(len(self.values), dtype=np.int64)
+        self.food_names = food_names
+
+        # labels['station'] is the list of station names, codes['station'][i] indexes into it
+        self.labels = labels
+        self.codes = {key: np.asarray(codes[key], dtype=np.int32) for key in self.GROUP_KEYS}
+        self.column_index = {name: j for j, name in enumerate(self.NUTRIENTS)}
+
+    @classmethod
+    def from_items(cls, items, university_key=None, date=None):
+        """Build a matrix from lists of cleaned item dicts"""
+        return cls.from_batches([(items, university_key, date)])
+
+    @classmethod
+    def from_batches(cls, batches):
+        """Build one matrix from several (items, university_key, date) batches"""
+        rows = []
+        flags = []
+        food_names = []
+        labels = {key: [] for key in cls.GROUP_KEYS}
+        lookup = {key: {} for key in cls.GROUP_KEYS}
+        codes = {key: [] for key in cls.GROUP_KEYS}
+
+        def encode(key, value):
+            if value not in lookup[key]:
+                lookup[key][value] = len(labels[key])
+                labels[key].append(value)
+            codes[key].append(lookup[key][value])
+
+        for items, university_key, date in batches:
+            for item in items:
+                nutrition = item.get('nutrition') or {}
+                row = []
+                row_flags = []
+                for nutrient in cls.NUTRIENTS:
+                    value, less_than = FoodDataCleaner.split_nutrient_value(nutrition.get(nutrient))
+                    row.append(np.nan if value is None else value)
+                    row_flags.append(less_than)
+                rows.append(row)
+                flags.append(row_flags)
+                food_names.append(item.get('food_name'))
+
+                encode('station', item.get('station_name'))
+                encode('meal', item.get('meal_type'))
+                encode('university', university_key or item.get('university'))
+                encode('date', date or item.get('date'))
+
+        width = len(cls.NUTRIENTS)
+        values = np.array(rows, dtype=np.float64).reshape(-1, width)
+        less_than = np.array(flags, dtype=bool).reshape(-1, width)
+        return cls(values, less_than, food_names, labels, codes)
+
+    @classmethod
+    def from_cleaned_dir(cls, cleaned_dir='data/cleaned_data', university_keys=None, date=None):
+        """Load all_food_items_cleaned.json for each university"""
+        if university_keys is None:
+            university_keys = sorted(os.listdir(cleaned_dir)) if os.path.isdir(cleaned_dir) else []
+
+        batches = []
+        for university_key in university_keys:
+            file_path = os.path.join(cleaned_dir, university_key, 'all_food_items_cleaned.json')
+            if not os.path.exists(file_path):
+                continue
+            with open(file_path, 'r', encoding='utf-8') as f:
+                batches.append((json.load(f), university_key, date))
+
+        return cls.from_batches(batches)
+
+    @classmethod
+    def from_arrow(cls, table):
+        """Build from a table loaded by NutritionParquetExporter.load (no per-item Python work)"""
+        n = table.num_rows
+        values = np.full((n, len(cls.NUTRIENTS)), np.nan, dtype=np.float64)
+        less_than = np.zeros((n, len(cls.NUTRIENTS)), dtype=bool)
+
+        for j, nutrient in enumerate(cls.NUTRIENTS):
+            if nutrient in table.column_names:
+                values[:, j] = table.column(nutrient).to_numpy(zero_copy_only=False)
+                flag_column = f'{nutrient}_lt'
+                if flag_column in table.column_names:
+                    less_than[:, j] = table.column(flag_column).fill_null(False).to_numpy(zero_copy_only=False)
+
+        labels = {}
+        codes = {}
+        source_columns = {'station': 'station_name', 'meal': 'meal', 'university': 'university', 'date': 'date'}
+        for key, column_name in source_columns.items():
+            if column_name not in table.column_names:
+                labels[key] = [None]
+                codes[key] = np.zeros(n, dtype=np.int32)
+                continue
+            column = table.column(column_name).combine_chunks()
+            if not hasattr(column, 'dictionary'):
+                column = column.dictionary_encode()
+            labels[key] = column.dictionary.to_pylist()
+            codes[key] = column.indices.to_numpy(zero_copy_only=False)
+
+        food_names = table.column('food_name').to_pylist() if 'food_name' in table.column_names else [None] * n
+        return cls(values, less_than, food_names, labels, codes)
+
+    def __len__(self):
+        return len(self.values)
+
+    def column(self, nutrient):
+        """View of one nutrient column"""
+        return self.values[:, self.column_index[nutrient]]
+
+    def filter(self, mask=None, **ranges):
+        """Boolean mask for range filters, e.g. filter(calories=(None, 500), protein_g=(20, None))"""
+        result = np.ones(len(self), dtype=bool) if mask is None else mask.copy()
+
+        for nutrient, (low, high) in ranges.items():
+            column = self.column(nutrient)
+            # NaN comparisons are False, so items missing the nutrient drop out
+            if low is not None:
+                result &= column >= low
+            if high is not None:
+                result &= column <= high
+
+        return result
+
+    def group_mask(self, key, *names):
+        """Boolean mask selecting items whose station/meal/university/date is in names"""
+        wanted = [code for code, label in enumerate(self.labels[key]) if label in names]
+        return np.isin(self.codes[key], wanted)
+
+    def top_k_ratio(self, numerator, denominator, k=10, mask=None):
+        """Indices of the k items with the highest numerator/denominator, e.g. protein per calorie"""
+        top = self.column(numerator)
+        bottom = self.column(denominator)
+
+        valid = (bottom > 0) & ~np.isnan(top)
+        if mask is not None:
+            valid &= mask
+
+        candidates = np.flatnonzero(valid)
+        if len(candidates) == 0:
+            return candidates
+
+        ratios = top[candidates] / bottom[candidates]
+        k = min(k, len(candidates))
+        best = np.argpartition(-ratios, k - 1)[:k]
+        best = best[np.argsort(-ratios[best], kind='stable')]
+        return candidates[best]
+
+    def aggregate(self, by='station', nutrient='calories', func='mean', mask=None):
+        """Per-group sum/mean/count/min/max of a nutrient, returned as {label: value}"""
+        codes = self.codes[by]
+        column = self.column(nutrient)
+
+        present = ~np.isnan(column)
+        if mask is not None:
+            present &= mask
+
+        group_count = len(self.labels[by])
+        group_codes = codes[present]
+        group_values = column[present]
+
+        counts = np.bincount(group_codes, minlength=group_count)
+        if func == 'count':
+            result = counts.astype(np.float64)
+        elif func in ('sum', 'mean'):
+            result = np.bincount(group_codes, weights=group_values, minlength=group_count)
+            if func == 'mean':
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    result = result / counts
+        elif func in ('min', 'max'):
+            fill = np.inf if func == 'min' else -np.inf
+            result = np.full(group_count, fill)
+            reducer = np.minimum if func == 'min' else np.maximum
+            reducer.at(result, group_codes, group_values)
+            result[counts == 0] = np.nan
+        else:
+            raise ValueError(f"Unknown aggregate function: {func}")
+
+        return {
+            label: float(result[code])
+            for code, label in enumerate(self.labels[by])
+            if counts[code] > 0
+        }
+
+    def score_combinations(self, targets, size=2, mask=None, weights=None, k=10, max_candidates=200, chunk_size=100000):
+        """Score every `size`-item combination against nutrient targets, lower is better
+
+        targets is a dict like {'calories': 700, 'protein_g': 40}. The score is the weighted
+        sum of squared relative misses. Combinations are scored chunk_size at a time against a
+        running top k, so memory stays flat; time still grows as candidates ** size, so more
+        than max_candidates items (after the mask) raise ValueError rather than silently scoring
+        only part of the menu. Narrow the mask (e.g. to one meal) or use
+        meal_planner.best_combinations for whole menus.
+        """
+        nutrients = list(targets.keys())
+        target_vector = np.array([targets[n] for n in nutrients], dtype=np.float64)
+        weight_vector = np.array([(weights or {}).get(n, 1.0) for n in nutrients], dtype=np.float64)
+        columns = [self.column_index[n] for n in nutrients]
+
+        candidates = np.flatnonzero(mask) if mask is not None else self.item_ids
+        if len(candidates) > max_candidates:
+            raise ValueError(f"{len(candidates)} candidate items exceed max_candidates={max_candidates}; "
+                             f"narrow the mask or raise the cap")
+        if len(candidates) < size:
+            return []
+
+        sub = np.nan_to_num(self.values[np.ix_(candidates, columns)])
+        divisor = np.where(target_vector == 0, 1.0, target_vector)
+        combo_iter = itertools.combinations(range(len(candidates)), size)
+        best_scores = np.empty(0)
+        best_combos = np.empty((0, size), dtype=np.int32)
+
+        while True:
+            combos = np.fromiter(
+                itertools.chain.from_iterable(itertools.islice(combo_iter, chunk_size)),
+                dtype=np.int32
+            ).reshape(-1, size)
+            if not len(combos):
+                break
+
+            misses = (sub[combos].sum(axis=1) - target_vector) / divisor
+            scores = np.concatenate([best_scores, (misses ** 2 * weight_vector).sum(axis=1)])
+            combos = np.concatenate([best_combos, combos])
+            if len(scores) > k:
+                keep = np.argpartition(scores, k - 1)[:k]
+                scores, combos = scores[keep], combos[keep]
+            best_scores, best_combos = scores, combos
+
+        order = np.argsort(best_scores, kind='stable')
+        return [(tuple(int(i) for i in candidates[best_combos[b]]), float(best_scores[b])) for b in order]
+
+    def describe(self, index):
+        """Readable metadata for one item index"""
+        return {
+            'item_id': int(index),
+            'food_name': self.food_names[index],
+            'station_name': self.labels['station'][self.codes['station'][index]],
+            'meal_type': self.labels['meal'][self.codes['meal'][index]],
+            'university': self.labels['university'][self.codes['university'][index]],
+            'date': self.labels['date'][self.codes['date'][index]],
+            'nutrition': {n: (None if np.isnan(v) else float(v)) for n, v in zip(self.NUTRIENTS, self.values[index])}
+        }
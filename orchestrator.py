@@ -0,0 +1,302 @@
+import asyncio
+import concurrent.futures
+import json
+import os
+import threading
+import time
+
+# Concurrent steps per resource class. An API university's whole scrape is a single 'api' step,
+# so that limit counts concurrent API scrapes, not requests; 'io' is local index/history/export work
+DEFAULT_LIMITS = {
+    'browser': 2,
+    'api': 2,
+    'cpu': os.cpu_count() or 2,
+    'io': 4,
+    'db': 4
+}
+
+# Ceilings for adaptive limits: Chrome instances are memory-bound, cleaning is core-bound
+MAX_LIMITS = {
+    'browser': 4,
+    'api': 4,
+    'cpu': os.cpu_count() or 2,
+    'io': 8,
+    'db': 16
+}
+
+# Set per executor thread while a step runs, so report_congestion knows which step is calling
+_current_step = threading.local()
+
+def report_congestion(kind, detail=''):
+    """Tell the orchestrator the remote side pushed back: 'timeout', 'cloudflare', 'throttled' or 'server_error'
+
+    Safe to call from anywhere; outside an orchestrated step it does nothing.
+    """
+    signals = getattr(_current_step, 'signals', None)
+    if signals is not None and kind:
+        signals.append((kind, detail))
+
+def classify_error(error):
+    """Congestion kind of an exception (timeouts, 429, 5xx), or None when it says nothing about load"""
+    if 'timeout' in type(error).__name__.lower():
+        return 'timeout'
+
+    status = getattr(getattr(error, 'response', None), 'status_code', None)
+    if status is None and str(getattr(error, 'code', '')).isdigit():
+        status = int(error.code)
+    if status == 429:
+        return 'throttled'
+    if status is not None and 500 <= status < 600:
+        return 'server_error'
+    return None
+
+def step_name(fn, args, kwargs):
+    """Latency key for a step: the function plus its string arguments, e.g. 'upload_university_data:umassd:the-grove'"""
+    parts = [getattr(fn, '__name__', 'step')]
+    parts.extend(value for value in list(args) + list(kwargs.values()) if isinstance(value, str))
+    return ':'.join(parts)
+
+def run_step(fn, args, kwargs):
+    """Executor-side wrapper: run fn and collect the congestion signals it reports"""
+    _current_step.signals = []
+    try:
+        return fn(*args, **kwargs), _current_step.signals
+    except Exception as e:
+        e.congestion_signals = _current_step.signals
+        raise
+    finally:
+        _current_step.signals = None
+
+class AIMDController:
+    """Additive-increase/multiplicative-decrease limit for one resource class
+
+    The limit grows by one after a full window (limit) of healthy completions while the class
+    is saturated. Timeouts, Cloudflare challenges and 429/5xx cut it in half; only one cut per
+    window, since steps that started before the last cut cannot trigger another. Latency well
+    above the baseline of the same step (a function plus its university/hall) only holds growth
+    back: step durations also vary with the work itself, e.g. the size of an upload diff, so
+    they are not evidence enough to cut. The baseline drifts up toward the recent latency.
+
+    Most steps run once per run, so baselines ({step: [seconds, samples]}) come from earlier runs.
+    """
+
+    def __init__(self, name, limit, min_limit=1, max_limit=None, decrease=0.5, latency_tolerance=2.0,
+                 alpha=0.3, baseline_drift=0.1, baselines=None):
+        self.name = name
+        self.limit = limit
+        self.min_limit = min_limit
+        self.max_limit = max(max_limit or limit, limit)
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.alpha = alpha
+        self.baseline_drift = baseline_drift
+        self.healthy = 0
+        self.last_cut = 0.0
+        self.latency = {}
+        self.baseline = {step: seconds for step, (seconds, _) in (baselines or {}).items()}
+        self.samples = {step: samples for step, (_, samples) in (baselines or {}).items()}
+        self.decisions = []
+
+    def decide(self, new_limit, reason):
+        new_limit = max(self.min_limit, min(self.max_limit, new_limit))
+        if new_limit != self.limit:
+            print(f"Concurrency {self.name}: {self.limit} -> {new_limit} ({reason})")
+            self.decisions.append({'at': time.time(), 'from': self.limit, 'to': new_limit, 'reason': reason})
+            self.limit = new_limit
+        self.healthy = 0
+        return self.limit
+
+    def observe(self, step, started_at, seconds, signals, saturated):
+        """Update the limit after a step finished; returns the new limit"""
+        if signals:
+            if started_at < self.last_cut:
+                return self.limit
+            self.last_cut = time.monotonic()
+            kinds = sorted({kind for kind, _ in signals})
+            return self.decide(int(self.limit * self.decrease), f"{', '.join(kinds)}: {signals[0][1]}"[:120])
+
+        # Latency per step: different universities, halls and functions are not comparable
+        ewma = self.latency.get(step, seconds) * (1 - self.alpha) + seconds * self.alpha
+        self.latency[step] = ewma
+        self.samples[step] = self.samples.get(step, 0) + 1
+        baseline = self.baseline.get(step, ewma)
+        self.baseline[step] = min(ewma, baseline + (ewma - baseline) * self.baseline_drift)
+
+        if self.samples[step] >= 3 and ewma > self.baseline[step] * self.latency_tolerance:
+            return self.limit
+
+        # Only a class that is using its whole limit learns anything from growing it
+        if saturated:
+            self.healthy += 1
+            if self.healthy >= self.limit:
+                return self.decide(self.limit + 1, f"{self.healthy} healthy steps at the limit")
+        return self.limit
+
+    def baselines(self):
+        return {step: [round(seconds, 3), self.samples.get(step, 0)] for step, seconds in self.baseline.items()}
+
+class ConcurrencyLimitStore:
+    """Limits the adaptive controllers settled on and their per-step latency baselines, so the next run starts from them"""
+
+    def __init__(self, path='data/indexes/concurrency_limits.json'):
+        self.path = path
+        self.limits = {}
+        self.baselines = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.limits = json.load(f)
+                self.baselines = self.limits.pop('baselines', {})
+            except Exception as e:
+                print(f"Ignoring unreadable concurrency limits {path}: {str(e)}")
+
+    def get(self, name, default):
+        return self.limits.get(name, default)
+
+    def get_baselines(self, name):
+        return self.baselines.get(name, {})
+
+    def save(self, limits, baselines=None):
+        self.limits.update(limits)
+        for name, steps in (baselines or {}).items():
+            self.baselines.setdefault(name, {}).update(steps)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = f'{self.path}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(dict(self.limits, baselines=self.baselines), f, indent=2, sort_keys=True)
+        os.replace(temp_path, self.path)
+
+class ResourceClass:
+    """One kind of resource (browser slots, API scrapes, CPU, local I/O, DB): its limit, queue and executor"""
+
+    def __init__(self, name, limit, controller=None):
+        self.name = name
+        self.limit = limit
+        self.controller = controller
+        # Blocking calls (Selenium, requests, cleaning, Supabase) run here, off the event loop;
+        # sized for the adaptive ceiling, the limit below decides how many actually run
+        max_workers = controller.max_limit if controller else limit
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self.condition = None
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait_seconds = 0.0
+        self.busy_seconds = 0.0
+
+    async def acquire(self):
+        # Created on first use so it binds to the running loop (Python 3.9)
+        if self.condition is None:
+            self.condition = asyncio.Condition()
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.running < self.limit)
+            self.running += 1
+
+    async def release(self, limit=None):
+        async with self.condition:
+            self.running -= 1
+            if limit is not None and limit != self.limit:
+                self.limit = limit
+                self.condition.notify_all()
+            else:
+                self.condition.notify()
+
+    def stats(self):
+        stats = {
+            'limit': self.limit,
+            'completed': self.completed,
+            'failed': self.failed,
+            'wait_seconds': round(self.wait_seconds, 2),
+            'busy_seconds': round(self.busy_seconds, 2)
+        }
+        if self.controller:
+            stats['decisions'] = self.controller.decisions
+        return stats
+
+class PipelineOrchestrator:
+    """Runs blocking pipeline steps from asyncio, each gated by its own resource class
+
+    A step only waits for free capacity in its own class, so a cheap API call or an upload
+    never queues behind a slow browser job the way it does in one shared thread pool.
+    """
+
+    def __init__(self, limits=None, adaptive=False, limit_store=None):
+        self.limits = dict(DEFAULT_LIMITS, **(limits or {}))
+        self.resources = {}
+
+        # Adaptive mode starts each class from the limit it settled on last run (explicit limits win)
+        self.adaptive = adaptive
+        self.explicit = set(limits or {})
+        self.limit_store = (limit_store or ConcurrencyLimitStore()) if adaptive else None
+
+    def resource(self, name):
+        if name not in self.resources:
+            if name not in self.limits:
+                raise ValueError(f"Unknown resource class: {name}")
+            limit = self.limits[name]
+            controller = None
+            if self.adaptive:
+                if name not in self.explicit:
+                    limit = min(self.limit_store.get(name, limit), MAX_LIMITS[name])
+                controller = AIMDController(name, limit, max_limit=MAX_LIMITS[name],
+                                            baselines=self.limit_store.get_baselines(name))
+            self.resources[name] = ResourceClass(name, limit, controller)
+        return self.resources[name]
+
+    async def run(self, resource_name, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) on resource_name's executor once a slot is free"""
+        resource = self.resource(resource_name)
+        resource.queued += 1
+        queued_at = time.monotonic()
+        await resource.acquire()
+        resource.queued -= 1
+        started_at = time.monotonic()
+        resource.wait_seconds += started_at - queued_at
+
+        saturated = resource.running >= resource.limit
+        signals = []
+        try:
+            result, signals = await asyncio.get_running_loop().run_in_executor(resource.executor, run_step, fn, args, kwargs)
+            resource.completed += 1
+            return result
+        except Exception as e:
+            resource.failed += 1
+            signals = getattr(e, 'congestion_signals', [])
+            kind = classify_error(e)
+            if kind:
+                signals.append((kind, str(e)))
+            raise
+        finally:
+            seconds = time.monotonic() - started_at
+            resource.busy_seconds += seconds
+            limit = None
+            if resource.controller:
+                limit = resource.controller.observe(step_name(fn, args, kwargs), started_at, seconds, signals, saturated)
+            await resource.release(limit)
+
+    def stats(self):
+        return {name: resource.stats() for name, resource in sorted(self.resources.items())}
+
+    def print_stats(self):
+        for name, stats in self.stats().items():
+            print(f"  {name:<24} limit {stats['limit']:>2}  done {stats['completed']:>3}  failed {stats['failed']:>2}  "
+                  f"queued {stats['wait_seconds']:>8.2f}s  busy {stats['busy_seconds']:>8.2f}s")
+
+    def shutdown(self):
+        for resource in self.resources.values():
+            resource.executor.shutdown(wait=True)
+
+        if self.adaptive:
+            self.limit_store.save({name: resource.limit for name, resource in self.resources.items()},
+                                  {name: resource.controller.baselines() for name, resource in self.resources.items()})
+
+def parse_limits(text):
+    """'browser=2,db=8' -> {'browser': 2, 'db': 8}"""
+    limits = {}
+    for part in filter(None, (text or '').split(',')):
+        name, _, value = part.partition('=')
+        if name not in DEFAULT_LIMITS or not value.isdigit() or int(value) < 1:
+            raise ValueError(f"Invalid resource limit '{part}' (classes: {', '.join(DEFAULT_LIMITS)})")
+        limits[name] = int(value)
+    return limits
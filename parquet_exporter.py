@@ -0,0 +1,109 @@
+import json
+import os
+import pyarrow as pa
+import pyarrow.parquet as pq
+from clean_data import FoodDataCleaner
+from university_config import UniversityConfig
+
+class NutritionParquetExporter:
+    """Export cleaned nutrition data to Parquet partitioned by university/date/meal"""
+
+    MEAL_TYPES = ['breakfast', 'lunch', 'dinner']
+
+    def __init__(self, output_dir='data/parquet'):
+        self.output_dir = output_dir
+        self.nutrient_columns = ['calories'] + list(FoodDataCleaner.NUTRIENT_PATTERNS.keys())
+        self.schema = self.build_schema()
+
+    def build_schema(self):
+        """Typed columns: one float per nutrient plus a "less than" flag column"""
+        fields = [
+            pa.field('dining_hall', pa.dictionary(pa.int32(), pa.string())),
+            pa.field('station_name', pa.dictionary(pa.int32(), pa.string())),
+            pa.field('food_name', pa.dictionary(pa.int32(), pa.string())),
+            pa.field('serving_size', pa.string()),
+        ]
+        for nutrient in self.nutrient_columns:
+            fields.append(pa.field(nutrient, pa.float64()))
+            fields.append(pa.field(f'{nutrient}_lt', pa.bool_()))
+        fields.append(pa.field('allergens', pa.list_(pa.string())))
+        fields.append(pa.field('ingredients', pa.string()))
+        return pa.schema(fields)
+
+    def partition_path(self, university_key, date, meal_type):
+        """Hive-style partition directory so pyarrow.dataset can discover the keys"""
+        return os.path.join(
+            self.output_dir,
+            f'university={university_key}',
+            f'date={date}',
+            f'meal={meal_type}'
+        )
+
+    def items_to_table(self, items):
+        """Convert a list of cleaned items into a columnar Arrow table"""
+        columns = {field.name: [] for field in self.schema}
+
+        for item in items:
+            nutrition = item.get('nutrition') or {}
+            columns['dining_hall'].append(item.get('dining_hall'))
+            columns['station_name'].append(item.get('station_name'))
+            columns['food_name'].append(item.get('food_name'))
+            columns['serving_size'].append(nutrition.get('serving_size'))
+
+            for nutrient in self.nutrient_columns:
+                value, less_than = FoodDataCleaner.split_nutrient_value(nutrition.get(nutrient))
+                columns[nutrient].append(value)
+                columns[f'{nutrient}_lt'].append(less_than)
+
+            columns['allergens'].append(list(nutrition.get('allergens') or []))
+            columns['ingredients'].append(nutrition.get('ingredients'))
+
+        arrays = []
+        for field in self.schema:
+            if pa.types.is_dictionary(field.type):
+                arrays.append(pa.array(columns[field.name], type=pa.string()).dictionary_encode())
+            else:
+                arrays.append(pa.array(columns[field.name], type=field.type))
+
+        return pa.Table.from_arrays(arrays, schema=self.schema)
+
+    def export_items(self, items, university_key, date, meal_type, dining_hall=None):
+        """Write one meal's cleaned items to its partition (overwrites on rerun, one file per hall)"""
+        partition_dir = self.partition_path(university_key, date, meal_type)
+        os.makedirs(partition_dir, exist_ok=True)
+
+        file_name = 'part-0.parquet' if UniversityConfig.is_primary_hall(university_key, dining_hall) else f'part-{dining_hall}.parquet'
+        output_path = os.path.join(partition_dir, file_name)
+        table = self.items_to_table(items)
+        pq.write_table(table, output_path, compression='zstd')
+
+        print(f"Exported {table.num_rows} {meal_type} items to {output_path}")
+        return output_path
+
+    def export_university(self, university_key, date, cleaned_files, dining_hall=None):
+        """Export a university's (or hall's) per-meal files cleaned for date
+
+        Cleaned files are not dated, so only the ones this run wrote (clean_food_data's return
+        value) are passed in - a leftover meal file from another day must not land under date.
+        """
+        exported = []
+        meal_files = {f'food_items_{meal_type}.json': meal_type for meal_type in self.MEAL_TYPES}
+
+        for file_path in cleaned_files:
+            meal_type = meal_files.get(os.path.basename(file_path))
+            if meal_type is None:
+                continue
+
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    items = json.load(f)
+                if items:
+                    exported.append(self.export_items(items, university_key, date, meal_type, dining_hall))
+            except Exception as e:
+                print(f"Error exporting {file_path} to parquet: {str(e)}")
+
+        return exported
+
+    def load(self, filters=None, columns=None):
+        """Load the partitioned dataset, e.g. filters=[('university', '=', 'umassd')]"""
+        return pq.read_table(self.output_dir, filters=filters, columns=columns, partitioning='hive')
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+PostgREST Stand-in
+In-memory imitation of the few PostgREST calls the uploader and the mirror make, so both can be
+exercised without a Supabase project. Not a database: tables live in memory and vanish on exit.
+
+Usage:
+    python postgrest_standin.py [--port 54321]
+    SUPABASE_URL=http://127.0.0.1:54321 SUPABASE_ANON_KEY=local.standin.key python main.py
+
+Supported: GET/POST/PATCH/DELETE on /rest/v1/<table> with select, eq/gt/gte/lt/lte/in filters
+(also inside or=(...) and and(...)), order, limit/offset (or a Range header), and
+Prefer: return=representation. Rows get created_at and updated_at like the Supabase tables.
+"""
+
+import argparse
+import json
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+RESERVED_PARAMS = ('select', 'order', 'limit', 'offset', 'columns', 'on_conflict')
+
+def parse_value(value):
+    if len(value) > 1 and value[0] == value[-1] == '"':
+        return value[1:-1]
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+def split_terms(text):
+    """Top-level comma-separated terms of an or=(...) / and(...) list"""
+    terms, depth, start = [], 0, 0
+    for i, char in enumerate(text):
+        depth += {'(': 1, ')': -1}.get(char, 0)
+        if char == ',' and depth == 0:
+            terms.append(text[start:i])
+            start = i + 1
+    terms.append(text[start:])
+    return [term for term in terms if term]
+
+def parse_logic(text):
+    """'a.gt.1,and(b.eq.2,c.lt.3)' -> [('a', ('gt', '1')), ('and', [...])]"""
+    filters = []
+    for term in split_terms(text):
+        if term.startswith(('and(', 'or(')):
+            name, _, rest = term.partition('(')
+            filters.append((name, parse_logic(rest[:-1])))
+        else:
+            column, operator, value = term.split('.', 2)
+            filters.append((column, (operator, value)))
+    return filters
+
+def row_matches(row, filters):
+    for column, condition in filters:
+        if column in ('or', 'and'):
+            if column == 'or' and not any(row_matches(row, [term]) for term in condition):
+                return False
+            if column == 'and' and not row_matches(row, condition):
+                return False
+            continue
+        operator, value = condition
+        field = row.get(column)
+        if operator == 'in':
+            if field not in [parse_value(v) for v in value.strip('()').split(',') if v]:
+                return False
+            continue
+        value = parse_value(value)
+        if field is None:
+            return False
+        if operator == 'eq' and not field == value:
+            return False
+        if operator == 'gt' and not field > value:
+            return False
+        if operator == 'gte' and not field >= value:
+            return False
+        if operator == 'lt' and not field < value:
+            return False
+        if operator == 'lte' and not field <= value:
+            return False
+    return True
+
+class StandinStore:
+    def __init__(self):
+        self.tables = {}
+        self.next_ids = {}
+        self.lock = threading.Lock()
+
+    def insert(self, table, records):
+        with self.lock:
+            rows = self.tables.setdefault(table, {})
+            inserted = []
+            for record in records:
+                row_id = self.next_ids.get(table, 1)
+                self.next_ids[table] = row_id + 1
+                now = datetime.now(timezone.utc).isoformat(timespec='microseconds')
+                row = dict(record, id=row_id, created_at=now, updated_at=now)
+                rows[row_id] = row
+                inserted.append(row)
+            return inserted
+
+    def select(self, table, filters):
+        with self.lock:
+            return [dict(row) for row in self.tables.get(table, {}).values() if row_matches(row, filters)]
+
+    def update(self, table, filters, values):
+        with self.lock:
+            updated = []
+            for row in self.tables.get(table, {}).values():
+                if row_matches(row, filters):
+                    row.update(values, updated_at=datetime.now(timezone.utc).isoformat(timespec='microseconds'))
+                    updated.append(dict(row))
+            return updated
+
+    def delete(self, table, filters):
+        with self.lock:
+            rows = self.tables.get(table, {})
+            deleted = [rows.pop(row_id) for row_id, row in list(rows.items()) if row_matches(row, filters)]
+            return deleted
+
+class StandinRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    store = None
+
+    def parse_request_url(self):
+        # supabase-py sends a JSON body even on GET/DELETE; it has to be drained for keep-alive
+        self.body = self.read_body()
+        url = urlsplit(self.path)
+        if not url.path.startswith('/rest/v1/'):
+            return None, None, None
+        table = url.path[len('/rest/v1/'):].strip('/')
+        params = parse_qsl(url.query)
+        filters = [(column, parse_logic(value[1:-1]) if column in ('or', 'and') else tuple(value.split('.', 1)))
+                   for column, value in params if column not in RESERVED_PARAMS]
+        return table, dict(params), filters
+
+    def read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length)) if length else None
+
+    def send_rows(self, rows, status=200):
+        body = json.dumps(rows).encode('utf-8') if rows is not None else b''
+        self.send_response(status if rows is not None else 204)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def wants_rows(self):
+        return 'return=representation' in (self.headers.get('Prefer') or '')
+
+    def do_GET(self):
+        table, params, filters = self.parse_request_url()
+        if table is None:
+            return self.send_rows({'message': 'not found'}, 404)
+
+        rows = self.store.select(table, filters)
+        for order in reversed(params.get('order', '').split(',')):
+            if order:
+                column, _, direction = order.partition('.')
+                rows.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=direction.startswith('desc'))
+
+        offset = int(params.get('offset', 0))
+        limit = int(params['limit']) if 'limit' in params else None
+        if self.headers.get('Range'):
+            start, _, end = self.headers['Range'].partition('-')
+            offset, limit = int(start), int(end) - int(start) + 1
+        rows = rows[offset:offset + limit if limit is not None else None]
+
+        columns = params.get('select', '*')
+        if columns != '*':
+            rows = [{column: row.get(column) for column in columns.split(',')} for row in rows]
+        self.send_rows(rows)
+
+    def do_POST(self):
+        table, _, _ = self.parse_request_url()
+        body = self.body
+        rows = self.store.insert(table, body if isinstance(body, list) else [body])
+        self.send_rows(rows if self.wants_rows() else None, 201)
+
+    def do_PATCH(self):
+        table, _, filters = self.parse_request_url()
+        rows = self.store.update(table, filters, self.body or {})
+        self.send_rows(rows if self.wants_rows() else None)
+
+    def do_DELETE(self):
+        table, _, filters = self.parse_request_url()
+        rows = self.store.delete(table, filters)
+        self.send_rows(rows if self.wants_rows() else None)
+
+    def log_message(self, format, *args):
+        pass
+
+def make_server(host='127.0.0.1', port=54321, store=None):
+    handler = type('Handler', (StandinRequestHandler,), {'store': store or StandinStore()})
+    return ThreadingHTTPServer((host, port), handler)
+
+def main():
+    parser = argparse.ArgumentParser(description="In-memory PostgREST stand-in for local upload/mirror runs")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=54321)
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port)
+    print(f"PostgREST stand-in on http://{args.host}:{server.server_address[1]}/rest/v1/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Menu Query Service
+Read-only local HTTP service over the cleaned output. Everything is indexed in memory when a run
+finishes and swapped in atomically, so a query is a few numpy mask operations plus a join of
+pre-serialized rows.
+
+Usage: python query_service.py [--port 8080] [--cleaned-dir data/cleaned_data] [--poll 30]
+
+    GET /items?university=umassd&meal=lunch&max_calories=500&min_protein_g=20&exclude=peanuts,milk&require=vegetarian&limit=50&offset=0
+    GET /stats
+    GET /healthz
+"""
+
+import argparse
+import glob
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date as date_cls
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+import numpy as np
+import orjson
+from allergen_index import BITS, encode_item
+from food_item import load_items
+from nutrient_matrix import NutrientMatrix
+from run_manifest import RunManifest
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+class MenuSnapshot:
+    """Immutable in-memory index of one set of cleaned files"""
+
+    # Query parameter -> NutrientMatrix group key
+    GROUP_PARAMS = {'university': 'university', 'date': 'date', 'meal': 'meal', 'station': 'station'}
+
+    def __init__(self, items, version):
+        self.version = version
+        self.loaded_at = time.time()
+        self.matrix = NutrientMatrix.from_items(items)
+        self.allergen_masks = np.array([encode_item(item) for item in items], dtype=np.uint32)
+
+        halls = sorted({item.get('dining_hall') or '' for item in items})
+        hall_codes = {hall: code for code, hall in enumerate(halls)}
+        self.hall_labels = halls
+        self.hall_codes = np.array([hall_codes[item.get('dining_hall') or ''] for item in items], dtype=np.int32)
+
+        # Rows are serialized once here, so responses only join bytes
+        self.rows = [orjson.dumps(dict(item, item_id=i)) for i, item in enumerate(items)]
+
+        # Response cache for this snapshot only - a swap starts a fresh one
+        self.cache = OrderedDict()
+        self.cache_lock = threading.Lock()
+
+    @classmethod
+    def load(cls, cleaned_dir='data/cleaned_data', run_manifest=None):
+        """Every university's combined cleaned file, dated from its run manifest entry"""
+        run_manifest = run_manifest or RunManifest()
+        items = []
+        digests = []
+
+        for file_path in sorted(glob.glob(os.path.join(cleaned_dir, '**', 'all_food_items_cleaned.json'), recursive=True)):
+            relative = os.path.relpath(os.path.dirname(file_path), cleaned_dir).split(os.sep)
+            university_key = relative[0]
+
+            with open(file_path, 'rb') as f:
+                data = f.read()
+            digest = hashlib.sha256(data).hexdigest()
+            digests.append(digest)
+
+            # The manifest entry with this file's checksum says which date it holds
+            file_date = None
+            for date in reversed(run_manifest.dates(university_key)):
+                if any(entry['sha256'] == digest for entry in run_manifest.entries(university_key, date, 'cleaned')):
+                    file_date = date
+                    break
+            file_date = file_date or date_cls.fromtimestamp(os.path.getmtime(file_path)).isoformat()
+
+            for item in load_items(file_path):
+                record = item.to_dict()
+                record.setdefault('university', university_key)
+                record.setdefault('date', file_date)
+                items.append(record)
+
+        version = hashlib.blake2b(''.join(digests).encode('utf-8'), digest_size=8).hexdigest()
+        return cls(items, version)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def select(self, params):
+        """Item ids matching the query params, in file order"""
+        mask = np.ones(len(self), dtype=bool)
+
+        for param, key in self.GROUP_PARAMS.items():
+            if param in params:
+                mask &= self.matrix.group_mask(key, *params[param].split(','))
+
+        if 'dining_hall' in params:
+            wanted = [code for code, hall in enumerate(self.hall_labels) if hall in params['dining_hall'].split(',')]
+            mask &= np.isin(self.hall_codes, wanted)
+
+        ranges = {}
+        for param, value in params.items():
+            bound, _, nutrient = param.partition('_')
+            if bound in ('min', 'max') and nutrient in self.matrix.column_index:
+                low, high = ranges.get(nutrient, (None, None))
+                ranges[nutrient] = (float(value), high) if bound == 'min' else (low, float(value))
+        if ranges:
+            mask = self.matrix.filter(mask, **ranges)
+
+        exclude_mask = require_mask = 0
+        for name in filter(None, params.get('exclude', '').split(',')):
+            if name not in BITS:
+                raise ValueError(f"Unknown allergen or dietary flag: {name}")
+            exclude_mask |= BITS[name]
+        for name in filter(None, params.get('require', '').split(',')):
+            if name not in BITS:
+                raise ValueError(f"Unknown allergen or dietary flag: {name}")
+            require_mask |= BITS[name]
+        if exclude_mask:
+            mask &= (self.allergen_masks & exclude_mask) == 0
+        if require_mask:
+            mask &= (self.allergen_masks & require_mask) == require_mask
+
+        return np.flatnonzero(mask)
+
+    def query(self, query_string, cache_size=1024):
+        """(etag, body) for a query; identical queries against this snapshot are served from cache"""
+        params = dict(parse_qsl(query_string))
+        key = '&'.join(f'{k}={v}' for k, v in sorted(params.items()))
+
+        with self.cache_lock:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.cache.move_to_end(key)
+                return cached
+
+        limit = min(int(params.pop('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+        offset = int(params.pop('offset', 0))
+        if limit < 0 or offset < 0:
+            raise ValueError("limit and offset must not be negative")
+
+        item_ids = self.select(params)
+        page = item_ids[offset:offset + limit]
+        next_offset = offset + limit if offset + limit < len(item_ids) else None
+
+        body = b''.join([
+            b'{"version":"', self.version.encode(), b'","total":', str(len(item_ids)).encode(),
+            b',"offset":', str(offset).encode(), b',"limit":', str(limit).encode(),
+            b',"next_offset":', orjson.dumps(next_offset), b',"items":[',
+            b','.join(self.rows[i] for i in page), b']}'
+        ])
+        etag = '"' + hashlib.blake2b(f'{self.version}|{key}'.encode('utf-8'), digest_size=12).hexdigest() + '"'
+
+        with self.cache_lock:
+            self.cache[key] = (etag, body)
+            if len(self.cache) > cache_size:
+                self.cache.popitem(last=False)
+        return etag, body
+
+class MenuQueryService:
+    """Holds the current snapshot and swaps in a new one when the cleaned files change"""
+
+    def __init__(self, cleaned_dir='data/cleaned_data', poll_seconds=30):
+        self.cleaned_dir = cleaned_dir
+        self.poll_seconds = poll_seconds
+        self.signature = self.files_signature()
+        self.snapshot = MenuSnapshot.load(cleaned_dir)
+        self.stop_event = threading.Event()
+        print(f"Loaded {len(self.snapshot)} items (version {self.snapshot.version})")
+
+    def files_signature(self):
+        """Cheap change check: path, size and mtime of every combined cleaned file"""
+        signature = []
+        for file_path in sorted(glob.glob(os.path.join(self.cleaned_dir, '**', 'all_food_items_cleaned.json'), recursive=True)):
+            stat = os.stat(file_path)
+            signature.append((file_path, stat.st_size, stat.st_mtime_ns))
+        return signature
+
+    def reload(self):
+        """Build the new index off to the side, then swap it in with one reference assignment"""
+        snapshot = MenuSnapshot.load(self.cleaned_dir)
+        previous = self.snapshot
+        self.snapshot = snapshot
+        print(f"Swapped index {previous.version} -> {snapshot.version} ({len(snapshot)} items)")
+        return snapshot
+
+    def watch(self):
+        while not self.stop_event.wait(self.poll_seconds):
+            try:
+                signature = self.files_signature()
+                if signature != self.signature:
+                    # Files can still be mid-write; wait for one quiet interval before reloading
+                    time.sleep(1)
+                    if self.files_signature() == signature:
+                        self.reload()
+                        self.signature = signature
+            except Exception as e:
+                print(f"Index reload failed, keeping the current one: {str(e)}")
+
+    def start_watcher(self):
+        thread = threading.Thread(target=self.watch, daemon=True)
+        thread.start()
+        return thread
+
+    def make_server(self, host='127.0.0.1', port=8080):
+        handler = type('Handler', (QueryRequestHandler,), {'service': self})
+        return ThreadingHTTPServer((host, port), handler)
+
+class QueryRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out as separate writes; with Nagle on, keep-alive clients stall on delayed ACKs
+    disable_nagle_algorithm = True
+    service = None
+
+    def send_body(self, status, body, etag=None, content_type='application/json'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if etag:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        # One read of the reference, so a request never mixes two snapshots
+        snapshot = self.service.snapshot
+
+        try:
+            if url.path == '/items':
+                etag, body = snapshot.query(url.query)
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self.send_body(200, body, etag)
+            elif url.path == '/stats':
+                self.send_body(200, orjson.dumps({
+                    'version': snapshot.version,
+                    'items': len(snapshot),
+                    'loaded_at': snapshot.loaded_at,
+                    'universities': snapshot.matrix.labels['university'],
+                    'dates': snapshot.matrix.labels['date']
+                }))
+            elif url.path == '/healthz':
+                self.send_body(200, b'ok', content_type='text/plain')
+            else:
+                self.send_body(404, orjson.dumps({'error': f'Unknown path {url.path}'}))
+        except ValueError as e:
+            self.send_body(400, orjson.dumps({'error': str(e)}))
+
+    def log_message(self, format, *args):
+        # Per-request logging would dominate the latency budget
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description="Read-only menu query service over the cleaned data")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--cleaned-dir', default='data/cleaned_data')
+    parser.add_argument('--poll', type=int, default=30, help="Seconds between checks for a finished run")
+    args = parser.parse_args()
+
+    service = MenuQueryService(args.cleaned_dir, args.poll)
+    service.start_watcher()
+    server = service.make_server(args.host, args.port)
+    print(f"Serving menu queries on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop_event.set()
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
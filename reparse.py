@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Offline Re-parse Script
+Rebuilds cleaned data for a date range from the raw snapshot archive - no network needed
+"""
+
+import argparse
+import concurrent.futures
+import os
+import time
+from clean_data import FoodDataCleaner
+from food_identity import FoodIdentityIndex
+from food_item import save_items as write_items
+from history_store import MenuHistoryStore
+from snapshot_archive import SnapshotArchive
+
+def reparse_manifest(archive_dir, manifest_path):
+    """Rebuild one meal's cleaned items from its manifest - runs in a worker process"""
+    archive = SnapshotArchive(archive_dir)
+    manifest = archive.read_manifest(manifest_path)
+    meal_type = manifest['meal_type']
+
+    if manifest['source'] == 'harvard_api':
+        from harvard_api_scraper import HarvardAPIScraper
+        harvard = HarvardAPIScraper(manifest['date'])
+        cleaned_items = [
+            harvard.build_item(archive.get_json(digest), recipe_id, meal_type, manifest.get('location'))
+            for recipe_id, digest in manifest['recipes'].items()
+        ]
+    else:
+        cleaned_items = []
+        for row in manifest['rows']:
+            scraped_item = {
+                'station_name': row['station_name'],
+                'food_name': row['food_name'],
+                'nutritional_info': archive.get_text(row['modal'])
+            }
+            cleaned_items.append(FoodDataCleaner.clean_item(scraped_item, meal_type))
+
+    return manifest['university'], manifest['date'], meal_type, manifest.get('dining_hall'), cleaned_items
+
+def save_items(output_dir, university_key, date, file_name, items, dining_hall=None):
+    day_dir = os.path.join(output_dir, university_key, date, dining_hall or '')
+    os.makedirs(day_dir, exist_ok=True)
+    return write_items(os.path.join(day_dir, file_name), items)
+
+def reparse(start_date, end_date=None, university_keys=None, archive_dir='data/archive',
+            output_dir='data/reparsed_data', workers=None, record_history=False):
+    """Re-clean every archived meal in the range across worker processes"""
+    start_time = time.time()
+    archive = SnapshotArchive(archive_dir)
+    manifest_paths = archive.find_manifests(start_date, end_date, university_keys)
+    print(f"Found {len(manifest_paths)} archived meals between {start_date} and {end_date or start_date}")
+
+    if not manifest_paths:
+        return {}
+
+    identity_index = FoodIdentityIndex.load()
+    history_store = MenuHistoryStore() if record_history else None
+    combined = {}
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(reparse_manifest, archive_dir, path): path
+            for path in manifest_paths
+        }
+
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                university_key, date, meal_type, dining_hall, items = future.result()
+            except Exception as e:
+                print(f"Error re-parsing {futures[future]}: {str(e)}")
+                continue
+
+            # Identity tagging needs the shared index, so it happens here rather than in the workers
+            identity_index.tag_items(items)
+            output_path = save_items(output_dir, university_key, date, f'food_items_{meal_type}.json', items, dining_hall)
+            print(f"Re-parsed {len(items)} {meal_type} items: {output_path}")
+
+            combined.setdefault((university_key, date, dining_hall), {})[meal_type] = items
+            if history_store:
+                history_store.append_meal(university_key, date, meal_type, items, dining_hall)
+
+    meal_order = ['breakfast', 'lunch', 'dinner']
+    for (university_key, date, dining_hall), meals in combined.items():
+        all_items = []
+        for meal_type in sorted(meals, key=lambda m: meal_order.index(m) if m in meal_order else len(meal_order)):
+            all_items.extend(meals[meal_type])
+        save_items(output_dir, university_key, date, 'all_food_items_cleaned.json', all_items, dining_hall)
+
+    identity_index.save()
+    print(f"Re-parsed {len(manifest_paths)} meals in {time.time() - start_time:.2f} seconds")
+    return combined
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild cleaned data from archived raw snapshots")
+    parser.add_argument('start_date', help="First date to re-parse (YYYY-MM-DD)")
+    parser.add_argument('end_date', nargs='?', help="Last date to re-parse (defaults to start_date)")
+    parser.add_argument('--universities', help="Comma-separated university keys (default: all archived)")
+    parser.add_argument('--archive-dir', default='data/archive')
+    parser.add_argument('--output-dir', default='data/reparsed_data')
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--history', action='store_true', help="Also append the results to the menu history store")
+    args = parser.parse_args()
+
+    university_keys = args.universities.split(',') if args.universities else None
+    reparse(args.start_date, args.end_date, university_keys, args.archive_dir,
+            args.output_dir, args.workers, args.history)
+
+if __name__ == "__main__":
+    main()
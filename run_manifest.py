@@ -0,0 +1,89 @@
+import glob
+import hashlib
+import json
+import os
+import time
+from food_item import NUTRIENT_KEYS
+
+NUTRIENTS = ('calories',) + NUTRIENT_KEYS
+
+def summarize(items, meal_type=None):
+    """Per-meal item, station and nutrient counts for a list of items
+
+    Counts rather than ratios are stored so entries can be summed across halls and dates.
+    Scraped items have no nutrition yet, so their coverage is whether the modal text was captured.
+    """
+    meals = {}
+    for item in items:
+        meal = meals.setdefault(item.get('meal_type') or meal_type or 'unknown', {
+            'items': 0, 'stations': set(), 'nutrients': dict.fromkeys(NUTRIENTS, 0), 'nutritional_info': 0
+        })
+        meal['items'] += 1
+        meal['stations'].add(item.get('station_name'))
+
+        nutrition = item.get('nutrition')
+        if nutrition:
+            for nutrient in NUTRIENTS:
+                if nutrition.get(nutrient) is not None:
+                    meal['nutrients'][nutrient] += 1
+        if item.get('nutritional_info'):
+            meal['nutritional_info'] += 1
+
+    for meal in meals.values():
+        meal['stations'] = len(meal['stations'])
+    return meals
+
+class RunManifest:
+    """Small per-file summaries written next to every save, so health checks never scan the data
+
+    One JSON file per saved data file: <root>/<university>/<date>/<stage>-<hall>-<meal>.json.
+    Writers never share a file, so concurrent scrapers and workers need no locking.
+    """
+
+    def __init__(self, root_dir='data/manifests'):
+        self.root_dir = root_dir
+
+    def entry_path(self, stage, university_key, date, meal_type, dining_hall=None):
+        return os.path.join(self.root_dir, university_key, date, f"{stage}-{dining_hall or 'main'}-{meal_type}.json")
+
+    def record(self, stage, university_key, date, file_path, items, meal_type='all', dining_hall=None):
+        """Summarize a file that was just saved; never fails the save itself"""
+        try:
+            with open(file_path, 'rb') as f:
+                data = f.read()
+
+            entry = {
+                'stage': stage,
+                'university': university_key,
+                'date': date,
+                'dining_hall': dining_hall,
+                'meal_type': meal_type,
+                'file': file_path.replace(os.sep, '/'),
+                'bytes': len(data),
+                'sha256': hashlib.sha256(data).hexdigest(),
+                'meals': summarize(items, None if meal_type == 'all' else meal_type),
+                'written_at': time.time()
+            }
+
+            path = self.entry_path(stage, university_key, date, meal_type, dining_hall)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f'{path}.{os.getpid()}.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, indent=2)
+            os.replace(temp_path, path)
+            return path
+        except Exception as e:
+            print(f"Could not write run manifest for {file_path}: {str(e)}")
+            return None
+
+    def entries(self, university_key, date, stage=None):
+        """Manifest entries for one university and date"""
+        entries = []
+        pattern = f'{stage}-*.json' if stage else '*.json'
+        for path in sorted(glob.glob(os.path.join(self.root_dir, university_key, date, pattern))):
+            with open(path, 'r', encoding='utf-8') as f:
+                entries.append(json.load(f))
+        return entries
+
+    def dates(self, university_key):
+        return sorted(os.path.basename(path) for path in glob.glob(os.path.join(self.root_dir, university_key, '*')))
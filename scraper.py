@@ -6,17 +6,45 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from webdriver_manager.chrome import ChromeDriverManager
 import time
-import json
 import os
 import datetime
 import random
 import requests
+from urllib.parse import urlparse
+from food_item import FoodItem, save_items
+from menu_fingerprint import NO_NUTRITION, READ_MENU_SCRIPT, MenuFingerprintStore, menu_fingerprint, row_key
+from orchestrator import report_congestion
+from run_manifest import RunManifest
+
+CLICKABLE_SELECTOR = "button, [role='button'], span[class*='click'], div[class*='click']"
+
+MODAL_SELECTORS = [
+    "[role='dialog']", ".modal", ".popup",
+    "div[class*='modal']", "div[class*='popup']",
+    "div[class*='nutrition']", "div[class*='detail']"
+]
+
+CLOSE_SELECTORS = [
+    "button[aria-label*='close']", ".close", ".close-button",
+    "button[class*='close']", "[data-dismiss]", "button:last-child"
+]
 
 class Scraper:
-    def __init__(self, date, university_key='umassd'):
+    def __init__(self, date, university_key='umassd', archive=None, session_mode=False, reuse_unchanged=True, modal_tabs=1):
         from university_config import UniversityConfig
 
         self.university_key = university_key
+        self.archive = archive
+
+        # In session mode the app is booted once and later meals/dates are routed in-page
+        self.session_mode = session_mode
+        self.app_loaded = False
+
+        # Same-day reruns reuse the last successful scrape of an unchanged menu
+        self.fingerprints = MenuFingerprintStore() if reuse_unchanged else None
+
+        # With more than one tab, nutrition modals are harvested round-robin across tabs of this browser
+        self.modal_tabs = max(1, modal_tabs)
         self.university_config = UniversityConfig.get_university_config(university_key)
 
         if not self.university_config:
@@ -48,6 +76,12 @@ class Scraper:
         options.add_experimental_option('excludeSwitches', ['enable-logging', 'enable-automation'])
         options.add_experimental_option('useAutomationExtension', False)
 
+        if self.modal_tabs > 1:
+            # Background tabs must keep rendering while another tab is being driven
+            options.add_argument("--disable-background-timer-throttling")
+            options.add_argument("--disable-backgrounding-occluded-windows")
+            options.add_argument("--disable-renderer-backgrounding")
+
         # Set a random user agent
         user_agent = random.choice(self.user_agents)
         options.add_argument(f"--user-agent={user_agent}")
@@ -71,6 +105,188 @@ class Scraper:
         # Creating the directory for scraped data
         os.makedirs(f'data/scraped_data/{self.university_key}', exist_ok=True)
 
+    def load_page(self, url):
+        """Full page load of the app (boots JS bundles and challenge checks)"""
+        self.driver.get(url)
+
+        # Random delay to appear more human-like
+        self.human_delay(8, 18)
+
+        # Check if Cloudflare protection is active
+        if self.check_cloudflare_protection():
+            report_congestion('cloudflare', url)
+            if not self.wait_for_cloudflare():
+                print("Failed to bypass Cloudflare protection, aborting scrape")
+                return False
+
+        self.app_loaded = True
+        return True
+
+    def navigate_in_app(self, url, timeout=20):
+        """Route the already-loaded app to url and wait only for the menu region to re-render"""
+        old_tables = self.driver.find_elements(By.CSS_SELECTOR, 'table')
+        path = urlparse(url).path
+
+        # The app's router listens for popstate, so push the new route and notify it
+        self.driver.execute_script(
+            "window.history.pushState({}, '', arguments[0]);"
+            "window.dispatchEvent(new PopStateEvent('popstate', {state: {}}));",
+            path
+        )
+
+        try:
+            if old_tables:
+                WebDriverWait(self.driver, timeout).until(EC.staleness_of(old_tables[0]))
+        except Exception:
+            print("Menu did not re-render after in-app navigation, falling back to a full load")
+            return self.load_page(url)
+
+        try:
+            WebDriverWait(self.driver, timeout).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, 'table'))
+            )
+        except Exception:
+            # Route changed but no tables - the period has no menu
+            pass
+
+        # Stations render one after another, so wait until the table/row count stops changing
+        deadline = time.time() + timeout
+        previous = None
+        while time.time() < deadline:
+            counts = self.driver.execute_script(
+                "return [document.querySelectorAll('table').length, document.querySelectorAll('table tr').length];"
+            )
+            if counts == previous:
+                break
+            previous = counts
+            time.sleep(1)
+
+        self.human_delay(1, 2)
+        return True
+
+    def open_tab(self, url, timeout=30):
+        """Another tab of this browser on url (it shares cookies and Cloudflare clearance); None on failure"""
+        main_handle = self.driver.current_window_handle
+        try:
+            self.driver.switch_to.new_window('tab')
+            self.driver.get(url)
+            WebDriverWait(self.driver, timeout).until(EC.presence_of_element_located((By.CSS_SELECTOR, 'table')))
+            return self.driver.current_window_handle
+        except Exception as e:
+            print(f"Could not open an extra tab: {e}")
+            try:
+                if self.driver.current_window_handle != main_handle:
+                    self.driver.close()
+            except Exception:
+                pass
+            return None
+        finally:
+            self.driver.switch_to.window(main_handle)
+
+    def open_modal(self, clickable):
+        """Scroll a row's clickable element into view and click it"""
+        self.driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", clickable)
+        self.human_delay(0.5, 1.5)
+
+        try:
+            clickable.click()
+        except:
+            self.driver.execute_script("arguments[0].click();", clickable)
+
+    def read_modal(self):
+        """Text of the open nutrition popup/modal"""
+        for modal_sel in MODAL_SELECTORS:
+            try:
+                wait = WebDriverWait(self.driver, 5)
+                modal = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, modal_sel)))
+                return modal.text
+            except:
+                continue
+        return NO_NUTRITION
+
+    def close_modal(self):
+        for close_sel in CLOSE_SELECTORS:
+            try:
+                close_btn = self.driver.find_element(By.CSS_SELECTOR, close_sel)
+                close_btn.click()
+                return
+            except:
+                continue
+
+    def find_row_clickable(self, table_index, row_index, food_name):
+        """The clickable element of a row, located by position in the current tab and checked by name"""
+        tables = self.driver.find_elements(By.CSS_SELECTOR, 'table')
+        if table_index > len(tables):
+            return None
+        rows = tables[table_index - 1].find_elements(By.CSS_SELECTOR, 'tr')
+        if row_index >= len(rows):
+            return None
+        cells = rows[row_index].find_elements(By.CSS_SELECTOR, 'td')
+        if not cells or cells[0].text.strip() != food_name:
+            print(f"Row for {food_name} moved in this tab, leaving it for a rerun")
+            return None
+        clickable_elements = cells[0].find_elements(By.CSS_SELECTOR, CLICKABLE_SELECTOR)
+        return clickable_elements[0] if clickable_elements else None
+
+    def harvest_modals_in_tabs(self, url, pending):
+        """Modal text for pending (item index, table index, row index, food name) rows, using several tabs
+
+        WebDriver runs one command at a time per browser session, so the tabs are driven round-robin
+        from this thread: while one tab waits for its modal to load, the others are being clicked.
+        Returns {item index: modal text}.
+        """
+        main_handle = self.driver.current_window_handle
+        tabs = [{'handle': main_handle, 'rows': [], 'open': None, 'ready_at': 0}]
+        for _ in range(min(self.modal_tabs, len(pending)) - 1):
+            handle = self.open_tab(url)
+            if handle:
+                tabs.append({'handle': handle, 'rows': [], 'open': None, 'ready_at': 0})
+        print(f"Harvesting {len(pending)} nutrition modals across {len(tabs)} tabs")
+
+        for position, row in enumerate(pending):
+            tabs[position % len(tabs)]['rows'].append(row)
+
+        results = {}
+        try:
+            while any(tab['rows'] or tab['open'] is not None for tab in tabs):
+                for tab in tabs:
+                    if not tab['rows'] and tab['open'] is None:
+                        continue
+                    self.driver.switch_to.window(tab['handle'])
+
+                    if tab['open'] is not None:
+                        # The same post-click wait as a single tab, but spent driving the other tabs
+                        remaining = tab['ready_at'] - time.time()
+                        if remaining > 0:
+                            time.sleep(remaining)
+                        try:
+                            results[tab['open']] = self.read_modal()
+                            self.close_modal()
+                        except Exception as e:
+                            print(f"Could not read nutrition modal in tab: {e}")
+                        tab['open'] = None
+
+                    if tab['rows']:
+                        item_index, table_index, row_index, food_name = tab['rows'].pop(0)
+                        try:
+                            clickable = self.find_row_clickable(table_index, row_index, food_name)
+                            if clickable is not None:
+                                self.open_modal(clickable)
+                                tab['open'] = item_index
+                                tab['ready_at'] = time.time() + random.uniform(2, 4)
+                        except Exception as e:
+                            print(f"Could not get detailed nutrition for {food_name}: {e}")
+        finally:
+            for tab in tabs[1:]:
+                try:
+                    self.driver.switch_to.window(tab['handle'])
+                    self.driver.close()
+                except Exception:
+                    pass
+            self.driver.switch_to.window(main_handle)
+
+        return results
+
     def human_delay(self, min_delay=1, max_delay=3):
         """Add random delay to mimic human behavior"""
         delay = random.uniform(min_delay, max_delay)
@@ -109,13 +325,17 @@ class Scraper:
         print("Failed to bypass Cloudflare protection within timeout")
         return False
 
-    def save_to_file(self, food_data_list, meal_type):
-        """Save scraped food data to local JSON file"""
+    def save_to_file(self, food_data_list, meal_type, dining_hall=None):
+        """Save scraped food data to local JSON file (partitioned by hall for non-primary halls)"""
+        from university_config import UniversityConfig
+
         try:
-            file_path = f'data/scraped_data/{self.university_key}/food_items_{meal_type}.json'
+            data_dir = UniversityConfig.data_dir('scraped_data', self.university_key, dining_hall)
+            os.makedirs(data_dir, exist_ok=True)
+            file_path = f'{data_dir}/food_items_{meal_type}.json'
 
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(food_data_list, f, indent=2, ensure_ascii=False)
+            save_items(file_path, food_data_list)
+            RunManifest().record('scraped', self.university_key, self.date, file_path, food_data_list, meal_type, dining_hall)
             print(f"Saved {len(food_data_list)} {meal_type} items to {file_path}")
             return True
 
@@ -123,26 +343,39 @@ class Scraper:
             print(f"error saving {meal_type} data: {e}")
             return False
 
-    def scrape_meal(self, meal_type):
-        """Generic method to scrape any meal type"""
+    def scrape_meal(self, meal_type, period=None, dining_hall=None):
+        """Generic method to scrape any meal type (period is the URL slug when it differs, e.g. 'brunch')"""
         from university_config import UniversityConfig
 
-        print(f"\nScraping {meal_type} data for {self.university_config['name']} on {self.date}...")
-        url = UniversityConfig.build_url(self.university_key, self.date, meal_type)
+        hall_label = f" ({dining_hall})" if dining_hall else ""
+        print(f"\nScraping {meal_type} data for {self.university_config['name']}{hall_label} on {self.date}...")
+        url = UniversityConfig.build_url(self.university_key, self.date, period or meal_type, dining_hall)
         
         try:
-            self.driver.get(url)
-
-            # Random delay to appear more human-like
-            self.human_delay(8, 18)
+            if self.session_mode and self.app_loaded:
+                loaded = self.navigate_in_app(url)
+            else:
+                loaded = self.load_page(url)
 
-            # Check if Cloudflare protection is active
-            if self.check_cloudflare_protection():
-                if not self.wait_for_cloudflare():
-                    print("Failed to bypass Cloudflare protection, aborting scrape")
-                    return False
+            if not loaded:
+                return False
 
             print(f"Page loaded: {self.driver.title}")
+
+            fingerprint = None
+            known_rows = {}
+            if self.fingerprints:
+                menu = self.driver.execute_script(READ_MENU_SCRIPT) or []
+                fingerprint = menu_fingerprint(menu)
+                previous_fingerprint, previous_items = self.fingerprints.load(self.university_key, self.date, meal_type, dining_hall)
+                known_rows = MenuFingerprintStore.known_rows(previous_items)
+
+                # Unchanged and fully captured last time: no modals to open (that run also wrote the archive)
+                if previous_items and previous_fingerprint == fingerprint and len(known_rows) == len(previous_items):
+                    print(f"{meal_type} menu unchanged since the last scrape today, reusing {len(previous_items)} items")
+                    return self.save_to_file(previous_items, meal_type, dining_hall)
+                if known_rows:
+                    print(f"Menu changed or incomplete, reusing {len(known_rows)} captured rows and clicking the rest")
             
             # Find all tables with menu data
             tables = self.driver.find_elements(By.CSS_SELECTOR, 'table')
@@ -150,6 +383,9 @@ class Scraper:
             
             all_food_items = []
             total_items = 0
+            archived_tables = []
+            seen_rows = {}
+            pending_modals = []
             
             # Process each table (each table represents a menu section/station)
             for table_index, table in enumerate(tables, 1):
@@ -175,11 +411,17 @@ class Scraper:
                             continue
                     
                     print(f"Found station: {station_name}")
+
+                    if self.archive:
+                        archived_tables.append({
+                            'station_name': station_name,
+                            'html': self.archive.put(table.get_attribute('outerHTML') or '')
+                        })
                     
                     # Get all rows from this table
                     rows = table.find_elements(By.CSS_SELECTOR, 'tr')
                     
-                    for row in rows:
+                    for row_index, row in enumerate(rows):
                         try:
                             # Get all cells in this row
                             cells = row.find_elements(By.CSS_SELECTOR, 'td')
@@ -196,68 +438,38 @@ class Scraper:
                             
                             print(f" -> Processing: {food_name}")
                             
-                            # Try to click for nutrition info
-                            nutrition_info = "Nutrition info not available"
+                            # Try to click for nutrition info, unless an earlier run today already captured it
+                            key = row_key(station_name, food_name, seen_rows)
+                            nutrition_info = known_rows.get(key, NO_NUTRITION)
                             
                             try:
-                                # Look for clickable element in first cell
-                                clickable_elements = first_cell.find_elements(By.CSS_SELECTOR, "button, [role='button'], span[class*='click'], div[class*='click']")
-                                
-                                if clickable_elements:
-                                    clickable = clickable_elements[0]
-                                    
-                                    # Scroll into view and click
-                                    self.driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", clickable)
-                                    self.human_delay(0.5, 1.5)
-
-                                    try:
-                                        clickable.click()
-                                    except:
-                                        self.driver.execute_script("arguments[0].click();", clickable)
-
-                                    self.human_delay(2, 4)
-                                    
-                                    # Look for popup/modal with nutrition info
-                                    modal_selectors = [
-                                        "[role='dialog']", ".modal", ".popup", 
-                                        "div[class*='modal']", "div[class*='popup']",
-                                        "div[class*='nutrition']", "div[class*='detail']"
-                                    ]
-                                    
-                                    for modal_sel in modal_selectors:
-                                        try:
-                                            wait = WebDriverWait(self.driver, 5)
-                                            modal = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, modal_sel)))
-                                            nutrition_info = modal.text
-                                            break
-                                        except:
-                                            continue
-                                    
-                                    # Close modal
-                                    close_selectors = [
-                                        "button[aria-label*='close']", ".close", ".close-button",
-                                        "button[class*='close']", "[data-dismiss]", "button:last-child"
-                                    ]
-                                    
-                                    for close_sel in close_selectors:
-                                        try:
-                                            close_btn = self.driver.find_element(By.CSS_SELECTOR, close_sel)
-                                            close_btn.click()
-                                            break
-                                        except:
-                                            continue
-
-                                    self.human_delay(0.5, 1.5)
+                                if key in known_rows:
+                                    pass
+                                elif self.modal_tabs > 1:
+                                    # Clicked later, spread across tabs
+                                    pending_modals.append((len(all_food_items), table_index, row_index, food_name))
+                                else:
+                                    # Look for clickable element in first cell
+                                    clickable_elements = first_cell.find_elements(By.CSS_SELECTOR, CLICKABLE_SELECTOR)
+
+                                    if clickable_elements:
+                                        self.open_modal(clickable_elements[0])
+                                        self.human_delay(2, 4)
+
+                                        # Look for popup/modal with nutrition info, then close it
+                                        nutrition_info = self.read_modal()
+                                        self.close_modal()
+                                        self.human_delay(0.5, 1.5)
                                     
                             except Exception as click_error:
                                 print(f"Could not get detailed nutrition for {food_name}: {click_error}")
                             
                             # Create food data object
-                            food_data = {
-                                'station_name': station_name,
-                                'food_name': food_name,
-                                'nutritional_info': nutrition_info,
-                            }
+                            food_data = FoodItem(
+                                station_name=station_name,
+                                food_name=food_name,
+                                nutritional_info=nutrition_info
+                            )
                             
                             all_food_items.append(food_data)
                             total_items += 1
@@ -270,9 +482,28 @@ class Scraper:
                     print(f"Error processing table {table_index}: {e}")
                     continue
             
+            if pending_modals:
+                for item_index, text in self.harvest_modals_in_tabs(url, pending_modals).items():
+                    all_food_items[item_index]['nutritional_info'] = text
+
+            if self.archive and all_food_items:
+                archived_rows = [{
+                    'station_name': item['station_name'],
+                    'food_name': item['food_name'],
+                    'modal': self.archive.put(item['nutritional_info'])
+                } for item in all_food_items]
+                self.archive.write_manifest(self.university_key, self.date, meal_type, {
+                    'source': 'dineoncampus',
+                    'url': url,
+                    'tables': archived_tables,
+                    'rows': archived_rows
+                }, dining_hall=None if UniversityConfig.is_primary_hall(self.university_key, dining_hall) else dining_hall)
+
             # Save all items to file
             if all_food_items:
-                success = self.save_to_file(all_food_items, meal_type)
+                success = self.save_to_file(all_food_items, meal_type, dining_hall)
+                if success and fingerprint:
+                    self.fingerprints.save(self.university_key, self.date, meal_type, fingerprint, all_food_items, dining_hall)
                 print(f"Total {meal_type} items scraped: {total_items}")
                 return success
             else:
@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from university_config import UniversityConfig
+
+MEAL_TYPES = ['breakfast', 'lunch', 'dinner']
+
+# API-based universities scrape every hall and meal in one task
+ALL = 'all'
+
+# Seconds assumed for a task that has never been timed
+DEFAULT_COSTS = {'web': 180.0, 'api': 60.0}
+
+def task_key(university_key, dining_hall, meal_type):
+    return f'{university_key}|{dining_hall}|{meal_type}'
+
+def parse_shard(text):
+    """'1/4' -> (1, 4); shards are numbered from 0"""
+    try:
+        index, count = (int(part) for part in text.split('/'))
+    except ValueError:
+        raise ValueError(f"Shard must look like i/N, got {text!r}")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Shard index must be in 0..{count - 1}, got {text!r}")
+    return index, count
+
+def plan_tasks(university_keys=None):
+    """Every university x hall x meal task, independent of what discovery finds on the day
+
+    The plan only depends on the config so every runner computes the same one; meals a hall
+    doesn't serve are skipped at scrape time and recorded with a zero-second timing.
+    """
+    tasks = []
+    for university_key in university_keys or UniversityConfig.get_all_universities():
+        config = UniversityConfig.get_university_config(university_key)
+        if config.get('api_based', False):
+            tasks.append({'key': task_key(university_key, ALL, ALL), 'university': university_key,
+                          'dining_hall': ALL, 'meal_type': ALL, 'kind': 'api'})
+            continue
+
+        for dining_hall in UniversityConfig.get_dining_halls(university_key):
+            for meal_type in MEAL_TYPES:
+                tasks.append({'key': task_key(university_key, dining_hall, meal_type), 'university': university_key,
+                              'dining_hall': dining_hall, 'meal_type': meal_type, 'kind': 'web'})
+    return tasks
+
+class TaskCostTable:
+    """Smoothed historical seconds per task, used to balance shards by cost rather than count"""
+
+    def __init__(self, file_path='data/indexes/task_costs.json', alpha=0.5):
+        self.file_path = file_path
+        self.alpha = alpha
+        self.costs = {}
+        if os.path.exists(file_path):
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    self.costs = json.load(f)
+            except Exception as e:
+                print(f"Could not load task costs, using defaults: {str(e)}")
+
+    def cost(self, task):
+        return self.costs.get(task['key'], DEFAULT_COSTS[task['kind']])
+
+    def update(self, key, seconds):
+        previous = self.costs.get(key)
+        self.costs[key] = round(seconds if previous is None else self.alpha * seconds + (1 - self.alpha) * previous, 2)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+        temp_path = self.file_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.costs, f, indent=2, sort_keys=True)
+        os.replace(temp_path, self.file_path)
+
+def assign_shards(tasks, shard_count, cost_table):
+    """Longest-processing-time-first: costliest task to the least loaded shard
+
+    Ties break on the task key and then the lowest shard, so the assignment is fully
+    deterministic for a given plan and cost table.
+    """
+    loads = [0.0] * shard_count
+    assignment = {}
+    for task in sorted(tasks, key=lambda t: (-cost_table.cost(t), t['key'])):
+        shard = min(range(shard_count), key=lambda s: (loads[s], s))
+        assignment[task['key']] = shard
+        loads[shard] += cost_table.cost(task)
+    return assignment, loads
+
+def file_digest(path):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+class ShardManifest:
+    """Per-shard record of assigned tasks, timings and staged output files"""
+
+    def __init__(self, shard_dir, date, shard_index, shard_count):
+        self.date = date
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        self.day_dir = os.path.join(shard_dir, date)
+        self.staging_dir = os.path.join(self.day_dir, f'shard-{shard_index}')
+        self.path = os.path.join(self.day_dir, f'shard-{shard_index}-of-{shard_count}.json')
+
+    def write(self, assigned_keys, timings, output_files):
+        """Copy this shard's outputs into its staging dir and record them with their hashes"""
+        files = {}
+        for path in sorted(set(output_files)):
+            if not os.path.exists(path):
+                continue
+            staged_path = os.path.join(self.staging_dir, path)
+            os.makedirs(os.path.dirname(staged_path), exist_ok=True)
+            shutil.copy2(path, staged_path)
+            files[path.replace(os.sep, '/')] = file_digest(path)
+
+        os.makedirs(self.day_dir, exist_ok=True)
+        manifest = {
+            'date': self.date,
+            'shard': self.shard_index,
+            'shard_count': self.shard_count,
+            'assigned': sorted(assigned_keys),
+            'timings': timings,
+            'files': files,
+            'written_at': time.time()
+        }
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        print(f"Wrote shard manifest {self.path} ({len(files)} files)")
+        return self.path
+
+def merge_shards(shard_dir, date, shard_count, university_keys=None):
+    """Verify every shard's manifest and files, then restore the outputs into the data tree
+
+    Fails when a shard is missing, a task was assigned to no shard or to two, or a staged
+    file doesn't match its recorded hash. Returns the manifests on success, None otherwise.
+    """
+    manifests = []
+    problems = []
+    for shard_index in range(shard_count):
+        manifest = ShardManifest(shard_dir, date, shard_index, shard_count)
+        if not os.path.exists(manifest.path):
+            problems.append(f"missing manifest for shard {shard_index}/{shard_count}")
+            continue
+        with open(manifest.path, 'r', encoding='utf-8') as f:
+            manifests.append((manifest, json.load(f)))
+
+    planned = {task['key'] for task in plan_tasks(university_keys)}
+    owners = {}
+    for manifest, data in manifests:
+        for key in data['assigned']:
+            owners.setdefault(key, []).append(data['shard'])
+    for key in sorted(planned):
+        if len(owners.get(key, [])) != 1:
+            problems.append(f"task {key} assigned to shards {owners.get(key, [])}")
+
+    for manifest, data in manifests:
+        for path, digest in data['files'].items():
+            staged_path = os.path.join(manifest.staging_dir, path)
+            if not os.path.exists(staged_path):
+                problems.append(f"shard {data['shard']} is missing staged file {path}")
+            elif file_digest(staged_path) != digest:
+                problems.append(f"shard {data['shard']} file {path} does not match its manifest hash")
+
+    if problems:
+        print(f"Shard merge failed for {date}:")
+        for problem in problems:
+            print(f"  {problem}")
+        return None
+
+    restored = 0
+    for manifest, data in manifests:
+        for path in data['files']:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            shutil.copy2(os.path.join(manifest.staging_dir, path), path)
+            restored += 1
+
+    print(f"Merged {shard_count} shards for {date}: {len(planned)} tasks, {restored} files restored")
+    return [data for _, data in manifests]
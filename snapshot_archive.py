@@ -0,0 +1,95 @@
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import zstandard
+
+class SnapshotArchive:
+    """Content-addressed, zstd-compressed store of raw scraped pages and API responses"""
+
+    def __init__(self, root_dir='data/archive', level=10):
+        self.root_dir = root_dir
+        self.object_dir = os.path.join(root_dir, 'objects')
+        self.manifest_dir = os.path.join(root_dir, 'manifests')
+        self.level = level
+        os.makedirs(self.object_dir, exist_ok=True)
+        os.makedirs(self.manifest_dir, exist_ok=True)
+
+    def object_path(self, digest):
+        return os.path.join(self.object_dir, digest[:2], f'{digest}.zst')
+
+    def put(self, data):
+        """Store bytes/text once and return its sha256 - identical bodies share one object"""
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.object_path(digest)
+        if os.path.exists(path):
+            return digest
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        compressed = zstandard.ZstdCompressor(level=self.level).compress(data)
+
+        # Write-then-rename so concurrent scrapers never see a partial object; the temp name is
+        # unique per call because scraper threads of one process often archive identical bodies
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(compressed)
+            os.replace(temp_path, path)
+        except OSError:
+            # Another writer got there first (Windows refuses to replace a file in use) - same content
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            if not os.path.exists(path):
+                raise
+        return digest
+
+    def get(self, digest):
+        """Raw bytes for a stored object"""
+        with open(self.object_path(digest), 'rb') as f:
+            return zstandard.ZstdDecompressor().decompress(f.read())
+
+    def get_text(self, digest):
+        return self.get(digest).decode('utf-8')
+
+    def get_json(self, digest):
+        return json.loads(self.get(digest))
+
+    def manifest_path(self, university_key, date, meal_type, dining_hall=None):
+        name = f'{meal_type}@{dining_hall}' if dining_hall else meal_type
+        return os.path.join(self.manifest_dir, university_key, date, f'{name}.json')
+
+    def write_manifest(self, university_key, date, meal_type, manifest, dining_hall=None):
+        """Record which objects make up one scraped meal (dining_hall only for non-primary halls)"""
+        path = self.manifest_path(university_key, date, meal_type, dining_hall)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        manifest = dict(manifest, university=university_key, date=date, meal_type=meal_type, dining_hall=dining_hall)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        print(f"Archived {meal_type} snapshot manifest: {path}")
+        return path
+
+    def read_manifest(self, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def find_manifests(self, start_date, end_date=None, university_keys=None):
+        """Manifest paths for a date range (inclusive), sorted by university/date/meal"""
+        end_date = end_date or start_date
+        paths = []
+
+        for path in glob.glob(os.path.join(self.manifest_dir, '*', '*', '*.json')):
+            meal_dir = os.path.dirname(path)
+            date = os.path.basename(meal_dir)
+            university_key = os.path.basename(os.path.dirname(meal_dir))
+
+            if university_keys and university_key not in university_keys:
+                continue
+            if start_date <= date <= end_date:
+                paths.append(path)
+
+        return sorted(paths)
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Data Stats
+Item, station and nutrient-coverage counts per university/date/meal, read from the run manifests
+written at save time. Only when a manifest is missing does it fall back to the menu history or
+the data files themselves.
+
+Usage: python stats.py [start_date] [end_date] [--universities umassd,harvard] [--stage cleaned|scraped] [--json]
+"""
+
+import argparse
+import glob
+import json
+import os
+from datetime import date as date_cls, datetime, timedelta
+from run_manifest import NUTRIENTS, RunManifest, summarize
+from university_config import UniversityConfig
+
+MEAL_ORDER = ['breakfast', 'lunch', 'dinner']
+
+def date_range(start_date, end_date):
+    start = datetime.strptime(start_date, '%Y-%m-%d').date()
+    end = datetime.strptime(end_date, '%Y-%m-%d').date()
+    return [(start + timedelta(days=offset)).isoformat() for offset in range((end - start).days + 1)]
+
+def add_meals(totals, meals, file_bytes=0):
+    """Sum per-meal summaries into totals"""
+    for meal_type, meal in meals.items():
+        total = totals.setdefault(meal_type, {
+            'items': 0, 'stations': 0, 'nutrients': dict.fromkeys(NUTRIENTS, 0), 'nutritional_info': 0, 'bytes': 0
+        })
+        total['items'] += meal['items']
+        total['stations'] += meal['stations']
+        total['nutritional_info'] += meal.get('nutritional_info', 0)
+        for nutrient, count in meal['nutrients'].items():
+            total['nutrients'][nutrient] = total['nutrients'].get(nutrient, 0) + count
+    if len(meals) == 1:
+        totals[next(iter(meals))]['bytes'] += file_bytes
+
+def from_manifest(run_manifest, university_key, date, stage):
+    """Per-meal totals from manifest entries; combined files only count when there are no per-meal files"""
+    entries = run_manifest.entries(university_key, date, stage)
+    per_meal = [entry for entry in entries if entry['meal_type'] != 'all']
+    totals = {}
+    for entry in per_meal or entries:
+        add_meals(totals, entry['meals'], entry['bytes'])
+    return totals
+
+def from_history(history_store, university_key, date):
+    """Per-meal totals from the menu history, for dates cleaned before manifests existed"""
+    totals = {}
+    prefix = f'{university_key}|{date}|'
+    for batch_key in history_store.batches:
+        if not batch_key.startswith(prefix):
+            continue
+        parts = batch_key.split('|')
+        items = history_store.load_meal(university_key, date, parts[2], parts[3] if len(parts) > 3 else None)
+        add_meals(totals, summarize(items))
+    return totals
+
+def from_files(university_key, date, stage):
+    """Per-meal totals from the data files, one file at a time, if they were written on that date"""
+    totals = {}
+    root = UniversityConfig.data_dir(f'{stage}_data', university_key)
+    for file_path in glob.glob(os.path.join(root, '**', 'food_items_*.json'), recursive=True):
+        if date_cls.fromtimestamp(os.path.getmtime(file_path)).isoformat() != date:
+            continue
+        meal_type = os.path.basename(file_path)[len('food_items_'):-len('.json')]
+        with open(file_path, 'r', encoding='utf-8') as f:
+            items = json.load(f)
+        add_meals(totals, summarize(items, meal_type), os.path.getsize(file_path))
+    return totals
+
+def collect(start_date, end_date=None, university_keys=None, stage='cleaned', run_manifest=None):
+    """{(university, date): (source, per-meal totals)} for every university/date with data"""
+    run_manifest = run_manifest or RunManifest()
+    history_store = None
+    if stage == 'cleaned' and os.path.exists(os.path.join('data', 'history', 'index.bin')):
+        from history_store import MenuHistoryStore
+        history_store = MenuHistoryStore()
+
+    results = {}
+    for university_key in university_keys or UniversityConfig.get_all_universities():
+        for date in date_range(start_date, end_date or start_date):
+            source, totals = 'manifest', from_manifest(run_manifest, university_key, date, stage)
+            if not totals and history_store:
+                source, totals = 'history', from_history(history_store, university_key, date)
+            if not totals:
+                source, totals = 'files', from_files(university_key, date, stage)
+            if totals:
+                results[(university_key, date)] = (source, totals)
+    return results
+
+def coverage(meal, stage):
+    """Share of items with nutrition captured: mean over nutrients when cleaned, modal text when scraped"""
+    if not meal['items']:
+        return 0.0
+    if stage == 'scraped':
+        return meal['nutritional_info'] / meal['items']
+    return sum(meal['nutrients'].values()) / (len(meal['nutrients']) * meal['items'])
+
+def main():
+    parser = argparse.ArgumentParser(description="Item/station/coverage stats from the run manifests")
+    parser.add_argument('start_date', nargs='?', default=date_cls.today().isoformat())
+    parser.add_argument('end_date', nargs='?')
+    parser.add_argument('--universities', help="Comma-separated university keys (default: all configured)")
+    parser.add_argument('--stage', choices=['cleaned', 'scraped'], default='cleaned')
+    parser.add_argument('--json', action='store_true', help="Print the raw totals as JSON")
+    args = parser.parse_args()
+
+    university_keys = args.universities.split(',') if args.universities else None
+    results = collect(args.start_date, args.end_date, university_keys, args.stage)
+
+    if args.json:
+        print(json.dumps({f'{university_key}|{date}': {'source': source, 'meals': totals}
+                          for (university_key, date), (source, totals) in results.items()}, indent=2))
+        return
+
+    if not results:
+        print(f"No {args.stage} data between {args.start_date} and {args.end_date or args.start_date}")
+        return
+
+    print(f"{'university':<14} {'date':<10} {'meal':<10} {'items':>6} {'stations':>8} {'coverage':>8} {'bytes':>9}  source")
+    grand_total = 0
+    for (university_key, date), (source, totals) in sorted(results.items()):
+        for meal_type in sorted(totals, key=lambda m: MEAL_ORDER.index(m) if m in MEAL_ORDER else len(MEAL_ORDER)):
+            meal = totals[meal_type]
+            grand_total += meal['items']
+            print(f"{university_key:<14} {date:<10} {meal_type:<10} {meal['items']:>6} {meal['stations']:>8} "
+                  f"{coverage(meal, args.stage):>8.0%} {meal['bytes']:>9}  {source}")
+    print(f"Total items: {grand_total}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Supabase Mirror
+Local SQLite copy of the uploaded Supabase tables. Uploads write through to it, and sync pulls
+rows inserted or updated remotely since the last sync, so lookups and ad-hoc queries stay local.
+The uploader's dedup state is its snapshot files, not the mirror: rows pulled from other writers
+carry no upload file label.
+
+Sync follows each table's updated_at column (see `schema`); a table without it is synced by id,
+which misses rows updated in place.
+
+Usage:
+    python supabase_mirror.py schema [--tables cleaned_data]
+    python supabase_mirror.py sync [--tables cleaned_data,harvard_cleaned_data] [--prune]
+    python supabase_mirror.py query "SELECT university, date, COUNT(*) FROM cleaned_data GROUP BY 1, 2"
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+# Run once per table in the Supabase SQL editor so sync also sees updated rows
+UPDATED_AT_SQL = """
+ALTER TABLE {table} ADD COLUMN IF NOT EXISTS updated_at timestamptz NOT NULL DEFAULT now();
+CREATE INDEX IF NOT EXISTS {table}_updated_at ON {table} (updated_at, id);
+CREATE OR REPLACE FUNCTION set_updated_at() RETURNS trigger AS $$
+BEGIN NEW.updated_at = now(); RETURN NEW; END $$ LANGUAGE plpgsql;
+DROP TRIGGER IF EXISTS {table}_updated_at ON {table};
+CREATE TRIGGER {table}_updated_at BEFORE UPDATE ON {table} FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+"""
+
+_shared_mirror = None
+_mirror_lock = threading.Lock()
+
+def get_shared_mirror():
+    """Process-wide mirror, or None when SUPABASE_MIRROR_PATH is set to an empty string"""
+    global _shared_mirror
+
+    with _mirror_lock:
+        if _shared_mirror is None:
+            db_path = os.getenv('SUPABASE_MIRROR_PATH', 'data/mirror/supabase_mirror.db')
+            if not db_path:
+                return None
+            _shared_mirror = SupabaseMirror(db_path)
+        return _shared_mirror
+
+class SupabaseMirror:
+    """One local table per remote table: the raw row plus JSON1 generated columns for lookups"""
+
+    def __init__(self, db_path='data/mirror/supabase_mirror.db'):
+        self.db_path = db_path
+        self.tables = set()
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+
+        with closing(self.connect()) as connection, connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    table_name TEXT PRIMARY KEY,
+                    watermark INTEGER NOT NULL,
+                    synced_at REAL NOT NULL
+                )
+            """)
+            # updated_at watermark, added after the id-only sync; older mirrors get the column here
+            columns = [row['name'] for row in connection.execute("PRAGMA table_info(sync_state)")]
+            if 'updated_at' not in columns:
+                connection.execute("ALTER TABLE sync_state ADD COLUMN updated_at TEXT")
+
+    def connect(self):
+        connection = sqlite3.connect(self.db_path, timeout=30)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    @staticmethod
+    def check_name(table):
+        if not re.fullmatch(r'[a-z_][a-z0-9_]*', table):
+            raise ValueError(f"Invalid table name: {table}")
+        return table
+
+    def ensure_table(self, table):
+        """Create the mirror table on first use"""
+        table = self.check_name(table)
+        if table in self.tables:
+            return table
+
+        with self.lock, closing(self.connect()) as connection, connection:
+            # source_* columns come from write-through uploads; the JSON wins when the item carries its own
+            connection.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    id INTEGER PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    created_at TEXT,
+                    source_university TEXT,
+                    source_date TEXT,
+                    label TEXT,
+                    row_key TEXT,
+                    content_hash TEXT,
+                    synced_at REAL NOT NULL,
+                    university TEXT GENERATED ALWAYS AS (coalesce(json_extract(data, '$.university'), source_university)) VIRTUAL,
+                    date TEXT GENERATED ALWAYS AS (coalesce(json_extract(data, '$.date'), source_date)) VIRTUAL,
+                    meal_type TEXT GENERATED ALWAYS AS (json_extract(data, '$.meal_type')) VIRTUAL,
+                    food_id TEXT GENERATED ALWAYS AS (coalesce(json_extract(data, '$.food_id'), json_extract(data, '$.food_name'))) VIRTUAL
+                )
+            """)
+            connection.execute(f"CREATE INDEX IF NOT EXISTS {table}_university_date_meal ON {table} (university, date, meal_type)")
+            connection.execute(f"CREATE INDEX IF NOT EXISTS {table}_food ON {table} (food_id)")
+            connection.execute(f"CREATE INDEX IF NOT EXISTS {table}_upload ON {table} (source_university, source_date, label)")
+            self.tables.add(table)
+        return table
+
+    def write_rows(self, table, rows, university_key=None, date=None, label=None):
+        """Upsert uploaded rows: dicts with 'id' and 'data', plus 'row_key'/'content_hash' from the uploader"""
+        table = self.ensure_table(table)
+        now = time.time()
+        records = [(
+            row['id'],
+            json.dumps(row['data'], ensure_ascii=False) if not isinstance(row['data'], str) else row['data'],
+            row.get('created_at'),
+            university_key, date, label,
+            row.get('row_key'), row.get('content_hash'),
+            now
+        ) for row in rows]
+
+        with closing(self.connect()) as connection, connection:
+            connection.executemany(f"""
+                INSERT INTO {table} (id, data, created_at, source_university, source_date, label, row_key, content_hash, synced_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    data = excluded.data,
+                    created_at = coalesce(excluded.created_at, {table}.created_at),
+                    source_university = coalesce(excluded.source_university, {table}.source_university),
+                    source_date = coalesce(excluded.source_date, {table}.source_date),
+                    label = coalesce(excluded.label, {table}.label),
+                    row_key = coalesce(excluded.row_key, {table}.row_key),
+                    content_hash = coalesce(excluded.content_hash, {table}.content_hash),
+                    synced_at = excluded.synced_at
+            """, records)
+        return len(records)
+
+    def delete_rows(self, table, ids):
+        table = self.ensure_table(table)
+        ids = list(ids)
+        with closing(self.connect()) as connection, connection:
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                connection.execute(f"DELETE FROM {table} WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+        return len(ids)
+
+    def watermark(self, table):
+        """(updated_at, id) of the last pulled row; (None, 0) before the first sync"""
+        with closing(self.connect()) as connection:
+            row = connection.execute("SELECT watermark, updated_at FROM sync_state WHERE table_name = ?", (table,)).fetchone()
+            # First sync starts from 0: other writers (CI runners) may hold ids below the ones written through here
+            return (row['updated_at'], row['watermark']) if row else (None, 0)
+
+    def save_watermark(self, table, updated_at, row_id):
+        with closing(self.connect()) as connection, connection:
+            connection.execute(
+                "INSERT INTO sync_state (table_name, watermark, updated_at, synced_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(table_name) DO UPDATE SET watermark = excluded.watermark, "
+                "updated_at = excluded.updated_at, synced_at = excluded.synced_at",
+                (table, row_id, updated_at, time.time())
+            )
+
+    def fetch_page(self, client, table, updated_at, row_id, page_size):
+        """Next page in (updated_at, id) order after the watermark"""
+        query = client.table(table).select('*')
+        if updated_at is not None:
+            # Keyset on both columns: one batch insert gives hundreds of rows the same updated_at
+            query = query.or_(f'updated_at.gt."{updated_at}",and(updated_at.eq."{updated_at}",id.gt.{row_id})')
+        return query.order('updated_at').order('id').limit(page_size).execute().data or []
+
+    def sync(self, client, table, page_size=1000, prune=False):
+        """Pull remote rows inserted or updated since the last sync; prune=True also drops rows deleted remotely"""
+        table = self.ensure_table(table)
+        updated_at, watermark = self.watermark(table)
+        pulled = 0
+        by_updated_at = True
+
+        while True:
+            if by_updated_at:
+                try:
+                    rows = self.fetch_page(client, table, updated_at, watermark, page_size)
+                except Exception as e:
+                    print(f"Cannot sync {table} by updated_at ({str(e)}), falling back to ids - updated rows are missed. "
+                          f"Add the column with: python supabase_mirror.py schema --tables {table}")
+                    by_updated_at = False
+                    continue
+            else:
+                rows = client.table(table).select('*').gt('id', watermark).order('id').limit(page_size).execute().data or []
+            if not rows:
+                break
+            self.write_rows(table, rows)
+            pulled += len(rows)
+            updated_at = rows[-1].get('updated_at') if by_updated_at else updated_at
+            watermark = rows[-1]['id']
+            self.save_watermark(table, updated_at, watermark)
+            if len(rows) < page_size:
+                break
+
+        pruned = 0
+        if prune:
+            remote_ids = set()
+            offset = 0
+            while True:
+                result = client.table(table).select('id').order('id').range(offset, offset + page_size - 1).execute()
+                rows = result.data or []
+                remote_ids.update(row['id'] for row in rows)
+                if len(rows) < page_size:
+                    break
+                offset += page_size
+            with closing(self.connect()) as connection:
+                local_ids = [row[0] for row in connection.execute(f"SELECT id FROM {table}")]
+            pruned = self.delete_rows(table, [row_id for row_id in local_ids if row_id not in remote_ids])
+
+        print(f"Synced {table}: {pulled} rows pulled, {pruned} pruned, watermark {updated_at or '-'} / id {watermark}")
+        return {'pulled': pulled, 'pruned': pruned, 'watermark': watermark, 'updated_at': updated_at}
+
+    def query(self, sql, params=()):
+        """Ad-hoc read-only query, rows as dicts"""
+        with closing(self.connect()) as connection:
+            return [dict(row) for row in connection.execute(sql, params)]
+
+def main():
+    from database import get_shared_client
+    from university_config import UniversityConfig
+
+    parser = argparse.ArgumentParser(description="Local SQLite mirror of the Supabase tables")
+    parser.add_argument('--db', default=os.getenv('SUPABASE_MIRROR_PATH') or 'data/mirror/supabase_mirror.db')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    schema_parser = subparsers.add_parser('schema', help="Print the SQL that adds updated_at to the Supabase tables")
+    schema_parser.add_argument('--tables', help="Comma-separated tables (default: every configured university's table)")
+
+    sync_parser = subparsers.add_parser('sync', help="Pull new and updated rows from Supabase")
+    sync_parser.add_argument('--tables', help="Comma-separated tables (default: every configured university's table)")
+    sync_parser.add_argument('--prune', action='store_true', help="Also drop local rows deleted remotely")
+
+    query_parser = subparsers.add_parser('query', help="Run a SQL query against the mirror")
+    query_parser.add_argument('sql')
+    args = parser.parse_args()
+
+    tables = None
+    if args.command in ('schema', 'sync'):
+        tables = args.tables.split(',') if args.tables else sorted({
+            UniversityConfig.get_database_name(key) for key in UniversityConfig.get_all_universities()
+        })
+
+    if args.command == 'schema':
+        for table in tables:
+            print(UPDATED_AT_SQL.format(table=SupabaseMirror.check_name(table)))
+        return
+
+    mirror = SupabaseMirror(args.db)
+
+    if args.command == 'sync':
+        client = get_shared_client()
+        for table in tables:
+            mirror.sync(client, table, prune=args.prune)
+
+    elif args.command == 'query':
+        for row in mirror.query(args.sql):
+            print(json.dumps(row, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
@@ -11,7 +11,8 @@ class UniversityConfig:
             'requires_date': True,
             'requires_meal_type': True,
             'database_name': 'cleaned_data',  # Keep existing for backward compatibility
-            'dining_hall': 'the-grove'
+            'dining_hall': 'the-grove',
+            'dining_halls': ['the-grove']  # Every hall to scrape; the first shares one browser session with the rest
          }, 
         # 'wpi': {
         #     'name': 'Worcester Polytechnic Institute',
@@ -84,6 +85,7 @@ class UniversityConfig:
             'requires_meal_type': False,  # Handled by API
             'database_name': 'harvard_cleaned_data',
             'dining_hall': 'annenberg-hall',
+            'dining_halls': 'all',  # Location list comes from the API
             'api_based': True  # Special flag for API-based scraping
         }
     }
@@ -99,7 +101,33 @@ class UniversityConfig:
         return cls.UNIVERSITIES
 
     @classmethod
-    def build_url(cls, university_key, date=None, meal_type=None):
+    def get_dining_halls(cls, university_key):
+        """Dining halls to scrape for a university (primary hall first)"""
+        config = cls.get_university_config(university_key)
+        if not config:
+            raise ValueError(f"Unknown university: {university_key}")
+
+        halls = config.get('dining_halls') or [config['dining_hall']]
+        if halls == 'all':
+            return halls
+        return [config['dining_hall']] + [hall for hall in halls if hall != config['dining_hall']]
+
+    @classmethod
+    def is_primary_hall(cls, university_key, dining_hall):
+        if dining_hall is None:
+            return True
+        config = cls.get_university_config(university_key) or {}
+        return dining_hall == config.get('dining_hall')
+
+    @classmethod
+    def data_dir(cls, stage, university_key, dining_hall=None):
+        """Data directory for a hall - the primary hall keeps the original per-university path"""
+        if cls.is_primary_hall(university_key, dining_hall):
+            return f'data/{stage}/{university_key}'
+        return f'data/{stage}/{university_key}/{dining_hall}'
+
+    @classmethod
+    def build_url(cls, university_key, date=None, meal_type=None, dining_hall=None):
         """Build the complete URL for a university's dining menu"""
         config = cls.get_university_config(university_key)
         if not config:
@@ -107,6 +135,10 @@ class UniversityConfig:
 
         url = config['base_url']
 
+        # Other halls share the base URL with the hall slug swapped
+        if not cls.is_primary_hall(university_key, dining_hall):
+            url = url[:url.rstrip('/').rfind('/') + 1] + dining_hall
+
         # Add date if required
         if config['requires_date'] and date:
             url += f"/{date}"
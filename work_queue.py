@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+Work Queue
+SQLite-backed queue of university x date x meal scrape tasks with leases, heartbeats and retries.
+Any number of worker processes - on one machine, or on several hosts sharing the data directory -
+pull tasks from the same file. A worker that dies stops heartbeating and its lease is reclaimed.
+
+Scraped files are not dated, so workers drain one date at a time and --process cleans and uploads
+each date before the next date's tasks start; without it only the last date's files are left.
+A date with failed tasks is not processed - retry them, then run the workers again.
+
+Usage:
+    python work_queue.py enqueue 2025-01-06 [2025-01-07 ...] [--universities umassd,harvard]
+    python work_queue.py work [--workers 4] [--process]
+    python work_queue.py status
+"""
+
+import argparse
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from datetime import datetime
+from university_config import UniversityConfig
+
+# API-based universities fetch every meal in one pass, so they get a single task
+ALL_MEALS = 'all'
+
+class WorkQueue:
+    """Leased task queue in one SQLite file - every state change is a single short transaction"""
+
+    def __init__(self, db_path='data/queue/work_queue.db', lease_seconds=300, max_attempts=3, journal_mode='WAL'):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        # WAL is fastest on a local disk; use journal_mode='DELETE' when hosts share the file over a network mount
+        self.journal_mode = journal_mode
+        self.create_tables()
+
+    def connect(self):
+        # Autocommit mode - transactions are opened explicitly with BEGIN IMMEDIATE
+        connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        connection.execute(f'PRAGMA journal_mode={self.journal_mode}')
+        return connection
+
+    def create_tables(self):
+        with closing(self.connect()) as connection:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS tasks (
+                    id INTEGER PRIMARY KEY,
+                    university TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    meal_type TEXT NOT NULL,
+                    period TEXT,
+                    dining_hall TEXT NOT NULL DEFAULT '',
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    worker TEXT,
+                    lease_expires REAL,
+                    last_error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    UNIQUE (university, date, meal_type, dining_hall)
+                )
+            """)
+            connection.execute("CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, lease_expires)")
+
+    def enqueue(self, university_key, date, meal_type, period=None, dining_hall=None):
+        """Add one task; re-enqueueing an existing task is a no-op. Returns True if it was new"""
+        now = time.time()
+        with closing(self.connect()) as connection:
+            cursor = connection.execute(
+                """INSERT OR IGNORE INTO tasks (university, date, meal_type, period, dining_hall, created_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                (university_key, date, meal_type, period or meal_type, dining_hall or '', now, now)
+            )
+            return cursor.rowcount == 1
+
+    def enqueue_day(self, date, university_keys=None, meal_discovery=None):
+        """Fan a date out into one task per university x hall x served meal"""
+        from meal_discovery import MealPeriodDiscovery
+
+        meal_discovery = meal_discovery or MealPeriodDiscovery()
+        added = 0
+
+        for university_key in university_keys or UniversityConfig.get_all_universities():
+            config = UniversityConfig.get_university_config(university_key)
+            if config.get('api_based', False):
+                added += self.enqueue(university_key, date, ALL_MEALS)
+                continue
+
+            for dining_hall in UniversityConfig.get_dining_halls(university_key):
+                hall = None if UniversityConfig.is_primary_hall(university_key, dining_hall) else dining_hall
+                # Cached or API-discovered periods; without either, the weekday/weekend defaults
+                for period, meal_type in meal_discovery.periods_for(university_key, date, dining_hall=dining_hall):
+                    added += self.enqueue(university_key, date, meal_type, period, hall)
+
+        print(f"Enqueued {added} new tasks for {date}")
+        return added
+
+    def lease(self, worker_id, date=None):
+        """Claim the next pending task (or one whose lease expired), or None when nothing is runnable
+
+        With a date, only that date's tasks are considered.
+        """
+        now = time.time()
+        connection = self.connect()
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+
+            # Expired leases that already used every attempt are given up on
+            connection.execute(
+                """UPDATE tasks SET status = 'failed', worker = NULL, updated_at = ?,
+                          last_error = COALESCE(last_error, 'lease expired')
+                   WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?""",
+                (now, now, self.max_attempts)
+            )
+
+            row = connection.execute(
+                """SELECT * FROM tasks
+                   WHERE (status = 'pending' OR (status = 'leased' AND lease_expires < ?)) AND attempts < ?
+                         AND (? IS NULL OR date = ?)
+                   ORDER BY attempts, date, university, id LIMIT 1""",
+                (now, self.max_attempts, date, date)
+            ).fetchone()
+
+            if row is None:
+                connection.execute('COMMIT')
+                return None
+
+            if row['status'] == 'leased':
+                print(f"Reclaiming task {row['id']} from {row['worker']} (lease expired)")
+
+            connection.execute(
+                """UPDATE tasks SET status = 'leased', worker = ?, attempts = attempts + 1,
+                          lease_expires = ?, updated_at = ?
+                   WHERE id = ?""",
+                (worker_id, now + self.lease_seconds, now, row['id'])
+            )
+            connection.execute('COMMIT')
+
+            task = dict(row)
+            task['attempts'] += 1
+            task['worker'] = worker_id
+            return task
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        finally:
+            connection.close()
+
+    def heartbeat(self, task_id, worker_id):
+        """Extend a held lease; False means the lease was lost to another worker"""
+        now = time.time()
+        with closing(self.connect()) as connection:
+            cursor = connection.execute(
+                """UPDATE tasks SET lease_expires = ?, updated_at = ?
+                   WHERE id = ? AND worker = ? AND status = 'leased'""",
+                (now + self.lease_seconds, now, task_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, task_id, worker_id):
+        with closing(self.connect()) as connection:
+            cursor = connection.execute(
+                """UPDATE tasks SET status = 'done', lease_expires = NULL, last_error = NULL, updated_at = ?
+                   WHERE id = ? AND worker = ? AND status = 'leased'""",
+                (time.time(), task_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, task_id, worker_id, error):
+        """Release a task for retry, or mark it failed once it has used every attempt"""
+        with closing(self.connect()) as connection:
+            cursor = connection.execute(
+                """UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                          worker = NULL, lease_expires = NULL, last_error = ?, updated_at = ?
+                   WHERE id = ? AND worker = ? AND status = 'leased'""",
+                (self.max_attempts, str(error), time.time(), task_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def retry_failed(self, date=None):
+        """Give failed tasks a fresh set of attempts"""
+        with closing(self.connect()) as connection:
+            query = "UPDATE tasks SET status = 'pending', attempts = 0, updated_at = ? WHERE status = 'failed'"
+            params = [time.time()]
+            if date:
+                query += " AND date = ?"
+                params.append(date)
+            return connection.execute(query, params).rowcount
+
+    def stats(self, date=None):
+        """Task counts by status"""
+        with closing(self.connect()) as connection:
+            query = "SELECT status, COUNT(*) AS count FROM tasks"
+            params = []
+            if date:
+                query += " WHERE date = ?"
+                params.append(date)
+            rows = connection.execute(query + " GROUP BY status", params).fetchall()
+        counts = {'pending': 0, 'leased': 0, 'done': 0, 'failed': 0}
+        counts.update({row['status']: row['count'] for row in rows})
+        return counts
+
+    def failures(self):
+        with closing(self.connect()) as connection:
+            return [dict(row) for row in connection.execute(
+                "SELECT university, date, meal_type, dining_hall, attempts, last_error FROM tasks WHERE status = 'failed'"
+            )]
+
+    def in_flight(self, date=None):
+        """Number of leased tasks - other workers may still finish or give them back"""
+        return self.stats(date)['leased']
+
+    def open_dates(self):
+        """Dates that still have pending or leased tasks, oldest first"""
+        with closing(self.connect()) as connection:
+            return [row['date'] for row in connection.execute(
+                "SELECT DISTINCT date FROM tasks WHERE status IN ('pending', 'leased') ORDER BY date"
+            )]
+
+class QueueWorker:
+    """Pulls tasks until the queue is drained, keeping one browser per university across tasks"""
+
+    def __init__(self, queue, worker_id=None, idle_timeout=0, date=None, session_mode=False):
+        self.queue = queue
+        self.date = date
+        self.session_mode = session_mode
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        # Seconds to keep polling an empty queue, for workers started before the enqueue finishes
+        self.idle_timeout = idle_timeout
+        self.scrapers = {}
+        self.archive = None
+
+        archive_dir = os.getenv('SNAPSHOT_ARCHIVE_DIR')
+        if archive_dir:
+            from snapshot_archive import SnapshotArchive
+            self.archive = SnapshotArchive(archive_dir)
+
+    def scraper_for(self, university_key, date):
+        """Reuse this worker's browser session for the university, moving it to the task's date"""
+        from scraper import Scraper
+
+        scraper = self.scrapers.get(university_key)
+        if scraper is None:
+            scraper = Scraper(date, university_key, archive=self.archive, session_mode=self.session_mode)
+            self.scrapers[university_key] = scraper
+        scraper.date = date
+        return scraper
+
+    def run_task(self, task):
+        config = UniversityConfig.get_university_config(task['university'])
+        if config.get('api_based', False):
+            from harvard_api_scraper import scrape_harvard
+            return scrape_harvard(task['date'], archive=self.archive)
+
+        scraper = self.scraper_for(task['university'], task['date'])
+        return scraper.scrape_meal(task['meal_type'], task['period'], task['dining_hall'] or None)
+
+    def heartbeat_loop(self, task, stop):
+        """Keep the lease alive while the task runs in this process"""
+        while not stop.wait(self.queue.lease_seconds / 3):
+            if not self.queue.heartbeat(task['id'], self.worker_id):
+                print(f"[{self.worker_id}] Lost lease on task {task['id']}")
+                return
+
+    def run(self):
+        print(f"[{self.worker_id}] Worker started")
+        completed = 0
+        idle_since = None
+
+        try:
+            while True:
+                task = self.queue.lease(self.worker_id, self.date)
+                if task is None:
+                    # A leased task can still come back (failed attempt or expired lease), so keep
+                    # polling until none is left rather than leaving it to a single worker
+                    if self.queue.in_flight(self.date):
+                        idle_since = None
+                        time.sleep(5)
+                        continue
+                    idle_since = idle_since or time.time()
+                    if time.time() - idle_since >= self.idle_timeout:
+                        break
+                    time.sleep(min(5, self.idle_timeout))
+                    continue
+                idle_since = None
+
+                label = f"{task['university']} {task['date']} {task['meal_type']}{' @ ' + task['dining_hall'] if task['dining_hall'] else ''}"
+                print(f"[{self.worker_id}] Running {label} (attempt {task['attempts']}/{self.queue.max_attempts})")
+
+                stop = threading.Event()
+                heartbeat = threading.Thread(target=self.heartbeat_loop, args=(task, stop), daemon=True)
+                heartbeat.start()
+                try:
+                    success = self.run_task(task)
+                    error = None if success else 'scrape returned no data'
+                except Exception as e:
+                    error = str(e)
+                finally:
+                    stop.set()
+                    heartbeat.join()
+
+                if error is None:
+                    self.queue.complete(task['id'], self.worker_id)
+                    completed += 1
+                else:
+                    print(f"[{self.worker_id}] Task failed: {label}: {error}")
+                    self.queue.fail(task['id'], self.worker_id, error)
+        finally:
+            for scraper in self.scrapers.values():
+                try:
+                    scraper.close()
+                except Exception:
+                    pass
+
+        print(f"[{self.worker_id}] Queue drained, {completed} tasks completed")
+        return completed
+
+def run_worker(db_path, idle_timeout=0, date=None, session_mode=False):
+    """Worker process entry point - module-level so it can be spawned"""
+    return QueueWorker(WorkQueue(db_path), idle_timeout=idle_timeout, date=date, session_mode=session_mode).run()
+
+def run_workers(db_path, workers=1, idle_timeout=0, date=None, session_mode=False):
+    """Start worker processes and wait for them to drain the queue (or one date of it)"""
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=run_worker, args=(db_path, idle_timeout, date, session_mode))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+def process_date(date):
+    """Clean and upload every university for a drained date - before the next date overwrites its files"""
+    from multi_university_scraper import MultiUniversityScraper
+
+    MultiUniversityScraper(date).run_parallel_processing()
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite work queue for scrape tasks")
+    parser.add_argument('--db', default='data/queue/work_queue.db')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    enqueue_parser = subparsers.add_parser('enqueue', help="Add tasks for one or more dates")
+    enqueue_parser.add_argument('dates', nargs='*', help="Dates to enqueue (YYYY-MM-DD, default: today)")
+    enqueue_parser.add_argument('--universities', help="Comma-separated university keys (default: all)")
+
+    work_parser = subparsers.add_parser('work', help="Run worker processes until the queue is drained")
+    work_parser.add_argument('--workers', type=int, default=1)
+    work_parser.add_argument('--idle-timeout', type=int, default=0, help="Seconds to wait on an empty queue before exiting")
+    work_parser.add_argument('--process', action='store_true', help="Clean and upload each date once it is drained")
+    work_parser.add_argument('--session-mode', action='store_true', help="Route each loaded app between tasks instead of a full page load each")
+
+    retry_parser = subparsers.add_parser('retry', help="Reset failed tasks")
+    retry_parser.add_argument('date', nargs='?')
+
+    subparsers.add_parser('status', help="Show task counts and failures")
+    args = parser.parse_args()
+
+    queue = WorkQueue(args.db)
+
+    if args.command == 'enqueue':
+        university_keys = args.universities.split(',') if args.universities else None
+        for date in args.dates or [datetime.today().strftime('%Y-%m-%d')]:
+            queue.enqueue_day(date, university_keys)
+
+    elif args.command == 'work':
+        start_time = time.time()
+        processed = set()
+        # One date at a time: every date's tasks write the same undated scraped_data files
+        while True:
+            dates = [date for date in queue.open_dates() if date not in processed]
+            if not dates:
+                break
+            date = dates[0]
+            processed.add(date)
+            run_workers(args.db, args.workers, args.idle_timeout, date, args.session_mode)
+            counts = queue.stats(date)
+            print(f"Workers finished {date}: {counts}")
+            if not args.process:
+                continue
+            if counts['pending'] or counts['leased'] or counts['failed']:
+                # Processing now would clean and upload a partial day
+                print(f"Not processing {date}: {counts['failed']} failed, "
+                      f"{counts['pending'] + counts['leased']} unfinished tasks")
+                continue
+            process_date(date)
+        print(f"Queue drained in {time.time() - start_time:.2f} seconds: {queue.stats()}")
+
+    elif args.command == 'retry':
+        print(f"Reset {queue.retry_failed(args.date)} failed tasks")
+
+    elif args.command == 'status':
+        print(queue.stats())
+        for failure in queue.failures():
+            print(f"  FAILED {failure['university']} {failure['date']} {failure['meal_type']} "
+                  f"{failure['dining_hall']} after {failure['attempts']} attempts: {failure['last_error']}")
+
+if __name__ == "__main__":
+    main()